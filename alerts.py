@@ -0,0 +1,415 @@
+# alerts.py - Dashboard'dan bağımsız, olay güdümlü GAP alarm motoru
+#
+# Ingest içinde (python ingest.py, ALERT_ENGINE=1) ya da tek başına (python alerts.py)
+# çalışır. Her board / trade mesajından sonra YALNIZCA o kontrat değerlendirilir:
+#     Son Eşleşme GAP = son işlem fiyatı - PTF (board mcp)
+# Kontrat açıksa ve |GAP| >= ALERT_GAP_THRESHOLD ise, kontrat başına ALERT_INTERVAL_MIN
+# cooldown ile alarm üretilir. Cooldown (alert_state) ve geçmiş (alert_history)
+# gip_live.db'de tutulur; süreç yeniden başlarsa cooldown kaldığı yerden devam eder.
+# Çalışan motor alert_state'e ALERT_HEARTBEAT_SEC'te bir kalp atışı yazar; dashboard
+# Telegram'ı yalnızca bu atış tazeyken motora bırakır (bkz. engine_alive).
+import os
+import sys
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+import notify
+from contracts import get_contract
+from dbwriter import get_writer
+
+ROOT = Path(__file__).resolve().parent
+load_dotenv(ROOT / ".env")
+
+DB_PATH = os.getenv("DB_PATH", str(ROOT / "data" / "gip_live.db"))
+# Ingest alarm motorunu çalıştırsın mı? Dashboard bu ayara değil kalp atışına bakar
+ALERT_ENGINE = os.getenv("ALERT_ENGINE", "1").strip() == "1"
+ALERT_HEARTBEAT_SEC = float(os.getenv("ALERT_HEARTBEAT_SEC", "30"))
+# engine_alive() DB'ye en fazla bu aralıkla bakar (dashboard her saniye sorar)
+ALERT_ALIVE_CACHE_SEC = float(os.getenv("ALERT_ALIVE_CACHE_SEC", "5"))
+ALERT_GAP_THRESHOLD = float(os.getenv("ALERT_GAP_THRESHOLD", "5.0"))
+ALERT_INTERVAL_MIN = float(os.getenv("ALERT_INTERVAL_MIN", "30"))
+
+RULE_LAST_GAP = "last_gap"
+# alert_state'te motorun kalp atışı satırı (contractName, rule)
+HEARTBEAT_KEY = ("*", "heartbeat")
+
+# ------------ SCHEMA ------------
+ALERTS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS alert_state (
+      contractName TEXT NOT NULL,
+      rule TEXT NOT NULL,
+      last_sent REAL NOT NULL,     -- epoch sn
+      last_value REAL,
+      PRIMARY KEY(contractName, rule)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS alert_history (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      time TEXT NOT NULL,          -- ISO localtime
+      contractName TEXT NOT NULL,
+      rule TEXT NOT NULL,
+      severity TEXT,
+      gap REAL,
+      last_price REAL,
+      ptf REAL,
+      aof REAL,
+      threshold REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_alert_history_time ON alert_history(time)",
+]
+UPSERT_STATE_SQL = """
+INSERT INTO alert_state (contractName, rule, last_sent, last_value) VALUES (?, ?, ?, ?)
+ON CONFLICT(contractName, rule) DO UPDATE SET
+  last_sent = excluded.last_sent,
+  last_value = excluded.last_value
+"""
+INSERT_HISTORY_SQL = """
+INSERT INTO alert_history (time, contractName, rule, severity, gap, last_price, ptf, aof, threshold)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def apply_schema(con):
+    for ddl in ALERTS_DDL:
+        con.execute(ddl)
+
+
+class Alert:
+    __slots__ = ("contract", "rule", "severity", "gap", "last_price", "ptf", "aof",
+                 "threshold", "interval_min", "at")
+
+    def __init__(self, contract, rule, severity, gap, last_price, ptf, aof, threshold,
+                 interval_min, at: datetime):
+        self.contract = contract
+        self.rule = rule
+        self.severity = severity
+        self.gap = gap
+        self.last_price = last_price
+        self.ptf = ptf
+        self.aof = aof
+        self.threshold = threshold
+        self.interval_min = interval_min
+        self.at = at
+
+    def history_row(self) -> tuple:
+        return (self.at.isoformat(timespec="seconds"), self.contract, self.rule, self.severity,
+                self.gap, self.last_price, self.ptf, self.aof, self.threshold)
+
+    def text(self) -> str:
+        """Dashboard'daki Telegram metniyle aynı biçim."""
+        sign = "+" if self.gap >= 0 else ""
+        aof_line = f"AOF: {self.aof:.2f} TL" if self.aof is not None else "AOF: N/A"
+        return (
+            "🚨 GİP GAP ALARMI 🚨\n\n"
+            f"📊 Kontrat: {self.contract}\n"
+            f"Son Eşleşme GAP: {sign}{self.gap:.2f} TL\n"
+            f"{aof_line}\n"
+            f"PTF: {self.ptf:.2f} TL\n\n"
+            f"⏰ {self.at.strftime('%d/%m/%Y %H:%M:%S')}\n"
+            f"🎯 Eşik: {self.threshold} TL\n"
+            f"⏱️ Sonraki bildirim: {self.interval_min:g} dk sonra"
+        )
+
+
+def _num(v):
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return v if v == v else None
+
+
+# ------------ ENGINE ------------
+class AlertEngine:
+    """
+    Kontrat başına son PTF / AOF / son eşleşme durumunu tutar; her olayda sadece ilgili
+    kontratı değerlendirir. Alarm kaydı arka plan yazıcısına bırakılır (bkz. dbwriter),
+    teslimat SINKS üzerinden yapılır.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, threshold: float = ALERT_GAP_THRESHOLD,
+                 interval_min: float = ALERT_INTERVAL_MIN):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.interval_min = interval_min
+        self.quotes = {}        # {kontrat: {"ptf", "aof", "board_last", "trade_last"}}
+        self.last_sent = {}     # {(kontrat, kural): epoch}
+        self.sinks = []
+        self.fired = 0
+        self._lock = threading.Lock()
+
+    def _writer(self):
+        return get_writer(self.db_path, init=apply_schema)
+
+    def load(self):
+        """Önceki çalışmadan kalan cooldown'lar + son işlem fiyatları (yeniden başlatmada tekrar alarm yok)."""
+        con = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            apply_schema(con)
+            con.commit()
+            for cn, rule, ts in con.execute("SELECT contractName, rule, last_sent FROM alert_state"):
+                if (cn, rule) != HEARTBEAT_KEY:
+                    self.last_sent[(cn, rule)] = ts
+            since = datetime.now().date().isoformat()
+            try:
+                rows = con.execute(
+                    "SELECT contractName, last_price, MAX(last_trade) FROM contract_stats "
+                    "WHERE day >= ? GROUP BY contractName", (since,)).fetchall()
+            except sqlite3.Error:
+                rows = []
+            for cn, price, _ in rows:
+                self.quotes.setdefault(cn, {})["trade_last"] = _num(price)
+        finally:
+            con.close()
+
+    # -- olaylar --
+    def on_board(self, contract: str, mcp, average_price, last_price):
+        with self._lock:
+            q = self.quotes.setdefault(contract, {})
+            q["ptf"] = _num(mcp)
+            q["aof"] = _num(average_price)
+            q["board_last"] = _num(last_price)
+        return self.evaluate(contract)
+
+    def on_trade(self, contract: str, price):
+        with self._lock:
+            self.quotes.setdefault(contract, {})["trade_last"] = _num(price)
+        return self.evaluate(contract)
+
+    # -- kural --
+    def evaluate(self, contract: str, now: float = None):
+        """Kontrat için alarm üretirse Alert döndürür, yoksa None."""
+        c = get_contract(contract)
+        if c is None or not c.is_open():
+            return None
+        q = self.quotes.get(contract) or {}
+        ptf = q.get("ptf")
+        last = q.get("trade_last")
+        if last is None:
+            last = q.get("board_last")  # dashboard gibi: işlem yoksa board son fiyatı
+        if ptf is None or last is None:
+            return None
+        gap = last - ptf
+        if abs(gap) < self.threshold:
+            return None
+
+        now = now if now is not None else time.time()
+        key = (contract, RULE_LAST_GAP)
+        with self._lock:
+            if now - self.last_sent.get(key, 0) < self.interval_min * 60:
+                return None
+            self.last_sent[key] = now
+            self.fired += 1
+        alert = Alert(contract, RULE_LAST_GAP,
+                      "high" if abs(gap) >= self.threshold * 2 else "medium",
+                      gap, last, ptf, q.get("aof"), self.threshold, self.interval_min,
+                      datetime.fromtimestamp(now))
+        w = self._writer()
+        w.submit(UPSERT_STATE_SQL, (contract, RULE_LAST_GAP, now, gap))
+        w.submit(INSERT_HISTORY_SQL, alert.history_row())
+        logging.warning(f"[ALARM] {contract} GAP {gap:+.2f} TL (PTF {ptf:.2f}, son {last:.2f})")
+        for sink in self.sinks:
+            try:
+                sink(alert)
+            except Exception as e:
+                logging.error(f"Alarm teslim hatası: {e}")
+        return alert
+
+    def heartbeat(self, now: float = None):
+        self._writer().submit(UPSERT_STATE_SQL, (*HEARTBEAT_KEY, now if now is not None else time.time(), None))
+
+    def start_heartbeat(self, interval: float = ALERT_HEARTBEAT_SEC):
+        """Piyasa sakinken de (mesaj yokken) canlı görünmesi için ayrı thread."""
+        def run():
+            while True:
+                try:
+                    self.heartbeat()
+                except Exception as e:
+                    logging.error(f"Alarm kalp atışı yazılamadı: {e}")
+                time.sleep(interval)
+        threading.Thread(target=run, name="alerts-heartbeat", daemon=True).start()
+
+    # -- ingest listener'ları (ham WS mesajı) --
+    def handle_board(self, data: dict):
+        body = data.get("body") or {}
+        board = body.get("boardInformation")
+        if not board or not body.get("name"):
+            return None
+        return self.on_board(body["name"], board.get("mcp"), board.get("averagePrice"),
+                             board.get("lastPrice"))
+
+    def handle_trade(self, data: dict):
+        body = data.get("body") or {}
+        if not body.get("contractName"):
+            return None
+        return self.on_trade(body["contractName"], body.get("price"))
+
+
+# ------------ DASHBOARD ÇERÇEVESİ ------------
+def gap_alarms(frame, threshold: float, now: datetime = None, last_sent: dict = None,
+               cooldown_sec: float = 0.0) -> list:
+    """
+    Dashboard çerçevesi (contractName, last_gap, mcp, averagePrice, last_effective) için
+    aynı GAP kuralı, tek geçişte kolon maskeleriyle: açık kontrat & PTF var & |last_gap| >= eşik.
+    last_sent {kontrat: epoch} verilirse her kayda cooldown'u geçti mi bilgisi ('due') eklenir.
+    """
+    import numpy as np
+    import pandas as pd
+    from render import contract_cutoffs
+    if frame.empty or not {"last_gap", "mcp", "averagePrice"}.issubset(frame.columns):
+        return []
+    now = now or datetime.now()
+    name_list = [str(n) for n in frame["contractName"].tolist()]
+    hours = np.array([getattr(get_contract(n), "hour", None) for n in name_list], dtype=float)
+    closure = contract_cutoffs(name_list)
+    is_open = ~np.isnat(closure) & ~np.isnan(hours) & (np.datetime64(now, "ns") <= closure)
+
+    gap = pd.to_numeric(frame["last_gap"], errors="coerce").to_numpy(dtype=float)
+    ptf = pd.to_numeric(frame["mcp"], errors="coerce").to_numpy(dtype=float)
+    aof = pd.to_numeric(frame["averagePrice"], errors="coerce").to_numpy(dtype=float)
+    if "last_effective" in frame.columns:
+        last = pd.to_numeric(frame["last_effective"], errors="coerce").to_numpy(dtype=float)
+    else:
+        last = np.zeros(len(frame))
+    gap_abs = np.abs(gap)
+    hit = is_open & ~np.isnan(gap) & ~np.isnan(ptf) & (gap_abs >= threshold)
+    if not hit.any():
+        return []
+    high = gap_abs >= threshold * 2
+    if last_sent is not None:
+        # dict -> dizi (pyarrow string kolonunda Series.map bundan yavaş)
+        sent_at = np.fromiter((last_sent.get(n, 0) for n in name_list), dtype=float, count=len(name_list))
+        due = (now.timestamp() - sent_at) >= cooldown_sec
+    else:
+        due = np.ones(len(frame), dtype=bool)
+
+    def _opt(v):
+        return None if v != v else v
+    out = []
+    for i in np.flatnonzero(hit).tolist():
+        cn = name_list[i]
+        g = float(gap[i])
+        out.append({
+            'type': 'gap_alert',
+            'contract': cn,
+            'message': f"{'🔺' if g > 0 else '🔻'} {cn} (AÇIK-S{int(hours[i])})",
+            'severity': 'high' if high[i] else 'medium',
+            'gap_value': float(gap_abs[i]),
+            'gap_signed': g,
+            'last_effective': _opt(float(last[i])),
+            'ptf': float(ptf[i]),
+            'aof': _opt(float(aof[i])),
+            'contract_hour': int(hours[i]),
+            'due': bool(due[i]),
+        })
+    return out
+
+
+# ------------ TESLİMAT ------------
+def telegram_sink(alert: Alert):
+    """Bildirim kuyruğuna bırak (bkz. notify.py); aynı penceredeki alarmlar tek mesajda gider."""
+    notify.enqueue(alert.text(), key=alert.contract)
+
+
+_ENGINE = {"engine": None}
+_ENGINE_LOCK = threading.Lock()
+
+def get_engine() -> AlertEngine:
+    with _ENGINE_LOCK:
+        if _ENGINE["engine"] is None:
+            engine = AlertEngine()
+            try:
+                engine.load()
+            except Exception as e:
+                logging.error(f"Alarm durumu yüklenemedi: {e}")
+            engine.sinks.append(telegram_sink)
+            engine.start_heartbeat()
+            _ENGINE["engine"] = engine
+        return _ENGINE["engine"]
+
+def _read_heartbeat(db_path: str):
+    try:
+        con = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=5)
+    except sqlite3.Error:
+        return None
+    try:
+        row = con.execute("SELECT last_sent FROM alert_state WHERE contractName = ? AND rule = ?",
+                          HEARTBEAT_KEY).fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        con.close()
+    return row[0] if row is not None else None
+
+# {db_path: (monotonic okuma zamanı, son kalp atışı epoch | None)} -- süreç geneli
+_HEARTBEATS = {}
+_HEARTBEATS_LOCK = threading.Lock()
+
+def engine_alive(db_path: str = DB_PATH, max_age: float = None,
+                 cache_sec: float = ALERT_ALIVE_CACHE_SEC) -> bool:
+    """
+    Bir alarm motoru son `max_age` sn (varsayılan 3 kalp atışı) içinde atış yazdı mı?
+    Okunan atış zamanı `cache_sec` boyunca tüm oturumlarca paylaşılır.
+    """
+    max_age = max_age if max_age is not None else ALERT_HEARTBEAT_SEC * 3
+    now = time.monotonic()
+    with _HEARTBEATS_LOCK:
+        hit = _HEARTBEATS.get(db_path)
+    if hit is not None and now - hit[0] < cache_sec:
+        beat = hit[1]
+    else:
+        beat = _read_heartbeat(db_path)
+        with _HEARTBEATS_LOCK:
+            _HEARTBEATS[db_path] = (now, beat)
+    return beat is not None and time.time() - beat <= max_age
+
+def install():
+    """Motoru ingest dispatch'ine bağla: her board / trade mesajından sonra çağrılır."""
+    from ingest import register_listener
+    engine = get_engine()
+    register_listener("ContractBoardMessage", engine.handle_board)
+    register_listener("TradeHistoryChannel", engine.handle_trade)
+    logging.info(f"Alarm motoru aktif: eşik {engine.threshold} TL, aralık {engine.interval_min:g} dk")
+    return engine
+
+def recent_history(db_path: str = DB_PATH, limit: int = 20) -> list:
+    con = sqlite3.connect(db_path, timeout=30)
+    try:
+        return con.execute(
+            "SELECT time, contractName, severity, gap, last_price, ptf FROM alert_history "
+            "ORDER BY time DESC LIMIT ?", (int(limit),)).fetchall()
+    except sqlite3.Error:
+        return []
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    # python alerts.py           -> sadece alarm için WS dinle (ingest'i ALERT_ENGINE=0 ile çalıştırın)
+    # python alerts.py history   -> son alarmlar
+    # python alerts.py status    -> çalışan motor var mı (kalp atışı)
+    if sys.argv[1:] == ["status"]:
+        alive = engine_alive(cache_sec=0)
+        print("Alarm motoru çalışıyor" if alive else "Alarm motoru çalışmıyor (dashboard Telegram gönderir)")
+        sys.exit(0 if alive else 1)
+    if sys.argv[1:] == ["history"]:
+        for row in recent_history():
+            print("  ".join("-" if v is None else f"{v:.2f}" if isinstance(v, float) else str(v)
+                            for v in row))
+        sys.exit(0)
+    from ingest import register_handler, run_forever
+    from utils import setup_logger
+    setup_logger(str(ROOT / "alerts_ws.log"))
+    engine = get_engine()
+    register_handler("ContractBoardMessage", engine.handle_board)
+    register_handler("TradeHistoryChannel", engine.handle_trade)
+    print(f"GİP alarm motoru: eşik {engine.threshold} TL, aralık {engine.interval_min:g} dk")
+    run_forever()
@@ -0,0 +1,227 @@
+# api.py - GİP verisi için salt okunur HTTP API (Flask)
+#
+#   GET /contracts[?open=1]                          -> dashboard tablosunun sayıları (PTF/AOF/son eşleşme/GAP)
+#   GET /contracts/<cn>/trades?since=&limit=&cursor= -> kontrat işlemleri, yeniden eskiye, imleçli sayfa
+#   GET /aof?window=5m|15m|1h|day                    -> kontrat başına AOF
+#
+# Sayılar dashboard'la aynı koddan gelir: /contracts paylaşılan Snapshot'ın dash çerçevesi
+# (bkz. snapshot.py), diğerleri queries.py. Yanıtlar veri sürümüne göre önbelleklenir
+# (Snapshot.version / data_fingerprint); ETag + If-None-Match ile 304, istemci kabul
+# ediyorsa gzip. ?format=arrow ya da Accept: application/vnd.apache.arrow.stream ile
+# Arrow IPC akışı (pyarrow kuruluysa), aksi halde JSON.
+#
+#   python api.py    -> API_HOST:API_PORT
+#
+# Kimlik doğrulama yoktur: varsayılan olarak yalnızca 127.0.0.1'i dinler. Başka
+# makinelerden erişim için API_HOST=0.0.0.0 verin ve önüne kimlik doğrulamalı bir
+# reverse proxy koyun.
+import os
+import gzip
+import json
+import base64
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+from flask import Flask, Response, abort, request
+
+import queries
+from contracts import contract_frame
+from rolling import WINDOWS
+from snapshot import DB_PATH, data_fingerprint, get_service
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8766"))
+API_CACHE_MAX = int(os.getenv("API_CACHE_MAX", "256"))
+API_PAGE_MAX = int(os.getenv("API_PAGE_MAX", "5000"))
+API_GZIP_MIN_BYTES = int(os.getenv("API_GZIP_MIN_BYTES", "1024"))
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+
+# dash kolonu -> API alanı
+CONTRACT_COLUMNS = {
+    "contractName": "contract",
+    "kontrat_saat": "hour",
+    "PTF_show": "ptf",
+    "aof_show": "aof",
+    "gap": "aof_gap",
+    "last_effective": "last",
+    "last_gap": "last_gap",
+    "minPrice": "min_price",
+    "maxPrice": "max_price",
+}
+
+app = Flask(__name__)
+
+
+# ------------ ÖNBELLEK ------------
+class Cached:
+    __slots__ = ("etag", "body", "mimetype", "headers", "_gz")
+
+    def __init__(self, body: bytes, mimetype: str, headers: dict = None):
+        self.body = body
+        self.mimetype = mimetype
+        self.headers = headers or {}
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self._gz = None
+
+    def gzipped(self) -> bytes:
+        if self._gz is None:
+            self._gz = gzip.compress(self.body, compresslevel=5)
+        return self._gz
+
+
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+def cached(key: tuple, build):
+    """key veri sürümünü içerir; sürüm değişince eski girdiler LRU ile düşer."""
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            return hit
+    entry = build()
+    with _CACHE_LOCK:
+        _CACHE[key] = entry
+        if len(_CACHE) > API_CACHE_MAX:
+            _CACHE.popitem(last=False)
+    return entry
+
+
+# ------------ SERİLEŞTİRME ------------
+def wants_arrow() -> bool:
+    fmt = request.args.get("format")
+    if fmt:
+        return fmt == "arrow"
+    return ARROW_MIME in request.headers.get("Accept", "")
+
+def encode(df: pd.DataFrame, arrow: bool, meta: dict) -> Cached:
+    """meta JSON gövdesine, Arrow'da X- başlıklarına yazılır."""
+    if arrow:
+        try:
+            import pyarrow as pa
+        except ImportError:
+            abort(406, description="Arrow çıktısı için pyarrow gerekli")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        headers = {f"X-{k.replace('_', '-').title()}": str(v) for k, v in meta.items() if v is not None}
+        return Cached(sink.getvalue().to_pybytes(), ARROW_MIME, headers)
+    parts = [f'"{k}":{json.dumps(v, ensure_ascii=False, default=str)}' for k, v in meta.items()]
+    parts.append('"data":' + df.to_json(orient="records", date_format="iso", force_ascii=False))
+    return Cached(("{" + ",".join(parts) + "}").encode("utf-8"), "application/json")
+
+def respond(entry: Cached) -> Response:
+    etag = entry.etag
+    # gzip'li gövdenin ETag'i "-gz" ekli; ikisi de aynı içeriği doğrular
+    tags = {t.strip().replace('-gz"', '"') for t in request.headers.get("If-None-Match", "").split(",")}
+    if etag in tags or "*" in tags:
+        resp = Response(status=304)
+        resp.headers["ETag"] = etag
+        return resp
+    body = entry.body
+    headers = dict(entry.headers)
+    if len(body) >= API_GZIP_MIN_BYTES and "gzip" in request.headers.get("Accept-Encoding", ""):
+        body = entry.gzipped()
+        headers["Content-Encoding"] = "gzip"
+        etag = etag[:-1] + '-gz"'
+    resp = Response(body, mimetype=entry.mimetype, headers=headers)
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["Vary"] = "Accept, Accept-Encoding"
+    return resp
+
+def _connect():
+    """İstek başına salt okunur bağlantı; closing() ile kapatılır."""
+    return sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, timeout=30)
+
+
+# ------------ İMLEÇ ------------
+def encode_cursor(time_iso: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{time_iso}|{row_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        t, i = raw.rsplit("|", 1)
+        return t, int(i)
+    except (ValueError, UnicodeDecodeError):
+        abort(400, description="Geçersiz cursor")
+
+
+# ------------ UÇLAR ------------
+@app.get("/contracts")
+def contracts():
+    snap = get_service(DB_PATH).current()
+    only_open = request.args.get("open") == "1"
+    arrow = wants_arrow()
+
+    def build():
+        dash = snap.dash
+        if dash.empty:
+            df = pd.DataFrame(columns=list(CONTRACT_COLUMNS.values()) + ["gate_closure", "is_open"])
+        else:
+            cols = [c for c in CONTRACT_COLUMNS if c in dash.columns]
+            df = dash[cols].rename(columns=CONTRACT_COLUMNS)
+            cf = contract_frame(df["contract"].tolist())[["contractName", "gate_closure", "is_open"]]
+            df = df.merge(cf.rename(columns={"contractName": "contract"}), on="contract", how="left")
+            if only_open:
+                df = df[df["is_open"]]
+        return encode(df.reset_index(drop=True), arrow,
+                      {"version": snap.version, "built_at": snap.built_at.isoformat(timespec="seconds")})
+
+    minute = datetime.now().strftime("%H%M")  # is_open dakikada bir değişebilir
+    return respond(cached(("contracts", snap.version, only_open, arrow, minute), build))
+
+@app.get("/contracts/<cn>/trades")
+def trades(cn):
+    since = request.args.get("since") or datetime.now().date().isoformat()
+    try:
+        limit = min(API_PAGE_MAX, max(1, int(request.args.get("limit", "500"))))
+    except ValueError:
+        abort(400, description="limit sayı olmalı")
+    cursor = request.args.get("cursor")
+    before = decode_cursor(cursor) if cursor else queries.FIRST_PAGE
+    arrow = wants_arrow()
+
+    def build():
+        with closing(_connect()) as con:
+            df = queries.contract_trades(con, cn, since, before, limit + 1)
+        next_cursor = None
+        if len(df) > limit:
+            df = df.iloc[:limit]
+            last = df.iloc[-1]
+            next_cursor = encode_cursor(last["time"], int(last["id"]))
+        return encode(df, arrow, {"contract": cn, "since": since, "next_cursor": next_cursor})
+
+    key = ("trades", data_fingerprint(DB_PATH), cn, since, before, limit, arrow)
+    return respond(cached(key, build))
+
+@app.get("/aof")
+def aof():
+    window = request.args.get("window", "day")
+    if window not in WINDOWS:
+        abort(400, description=f"window: {', '.join(WINDOWS)}")
+    seconds = WINDOWS[window]
+    arrow = wants_arrow()
+    now = datetime.now().replace(microsecond=0)
+
+    def build():
+        with closing(_connect()) as con:
+            df = queries.aof_window(con, seconds, now)
+        return encode(df, arrow, {"window": window, "as_of": now.isoformat()})
+
+    # Kayan pencere veri değişmese de kayar: saniye başına bir sürüm
+    version = data_fingerprint(DB_PATH) if seconds is None else (data_fingerprint(DB_PATH), now)
+    return respond(cached(("aof", window, version, now.date() if seconds is None else None, arrow), build))
+
+
+if __name__ == "__main__":
+    print(f"GİP API: http://{API_HOST}:{API_PORT}  (DB: {DB_PATH})")
+    app.run(host=API_HOST, port=API_PORT, threaded=True)
@@ -0,0 +1,145 @@
+# backfill.py - WS kesintilerinde kaçan işlemleri şeffaflık REST API'sinden tamamlama
+#
+# ingest yeniden bağlandığında kesinti penceresini ws_gaps tablosuna yazar ve
+# schedule()'ı çağırır. Bekleyen her pencere için işlemler toplu çekilir, trades
+# tablosunun UNIQUE anahtarı ile yinelenenler elenir ve tek transaction'da yazılır.
+import os
+import sys
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from tradehistory import DB_PATH, INSERT_TRADE_SQL
+from utils import get_cached_tgt, mark_gap_backfilled, pending_gaps
+
+BACKFILL_TRADES_URL = os.getenv(
+    "BACKFILL_TRADES_URL",
+    "https://seffaflik.epias.com.tr/electricity-service/v1/markets/gip/data/trades")
+# Pencere kenarlarında kaçırılmış olabilecek işlemler için pay
+BACKFILL_PAD_SEC = int(os.getenv("BACKFILL_PAD_SEC", "5"))
+
+TR_TZ = timezone(timedelta(hours=3))
+TRADE_CHANNEL = "TradeHistoryChannel"
+
+HEADERS = {
+    "Accept": "application/json",
+    "Connection": "keep-alive",
+}
+
+# ------------ FETCH ------------
+def _to_local_iso(value):
+    """API zamanını WS ile aynı biçime getir: saat dilimsiz yerel ISO, saniye hassasiyeti."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(TR_TZ).replace(tzinfo=None)
+    return dt.isoformat(timespec="seconds")
+
+def _normalize(item: dict):
+    cn = item.get("contractName") or item.get("contract")
+    t = _to_local_iso(item.get("date") or item.get("time"))
+    try:
+        price = float(item.get("price"))
+        qty = float(item.get("quantity"))
+    except (TypeError, ValueError):
+        return None
+    if not cn or not t:
+        return None
+    return {"contractName": cn, "time": t, "price": price, "quantity": qty,
+            "region": item.get("region")}
+
+def fetch_trades(start: datetime, end: datetime, session=None) -> list:
+    """[start, end] aralığındaki işlemleri tek istekte çek ve normalize et."""
+    http = session or requests
+    headers = dict(HEADERS)
+    tgt = get_cached_tgt()
+    if tgt:
+        headers["TGT"] = tgt
+    params = {
+        "startDate": start.replace(tzinfo=TR_TZ).isoformat(timespec="seconds"),
+        "endDate": end.replace(tzinfo=TR_TZ).isoformat(timespec="seconds"),
+    }
+    resp = http.get(BACKFILL_TRADES_URL, params=params, headers=headers, timeout=30)
+    resp.raise_for_status()
+    data = resp.json() or {}
+    items = data.get("items") or data.get("body", {}).get("content", {}).get("items") or []
+
+    lo = start.isoformat(timespec="seconds")
+    hi = end.isoformat(timespec="seconds")
+    rows = []
+    for item in items:
+        tr = _normalize(item)
+        # Uç nokta pencereyi yok sayarsa yine de yalnızca kesinti aralığını al
+        if tr and lo <= tr["time"] <= hi:
+            rows.append(tr)
+    return rows
+
+# ------------ WRITE ------------
+def insert_trades(rows: list) -> int:
+    """Tek transaction; UNIQUE(contractName, time, price, quantity) yinelenenleri yutar."""
+    if not rows:
+        return 0
+    snapshot_ts = datetime.now().isoformat(timespec="seconds")
+    params = [(r["contractName"], r["time"], r["price"], r["quantity"], r.get("region"),
+               snapshot_ts, None) for r in rows]
+    con = sqlite3.connect(DB_PATH, timeout=60)
+    try:
+        before = con.total_changes
+        with con:
+            con.executemany(INSERT_TRADE_SQL, params)
+        return con.total_changes - before
+    finally:
+        con.close()
+
+def backfill_window(start_iso: str, end_iso: str) -> int:
+    start = datetime.fromisoformat(start_iso) - timedelta(seconds=BACKFILL_PAD_SEC)
+    end = datetime.fromisoformat(end_iso) + timedelta(seconds=BACKFILL_PAD_SEC)
+    rows = fetch_trades(start, end)
+    added = insert_trades(rows)
+    logging.info(f"Backfill {start_iso} - {end_iso}: {len(rows)} işlem çekildi, {added} yeni")
+    return added
+
+def backfill_pending() -> int:
+    total = 0
+    for gap_id, channels, start_iso, end_iso in pending_gaps():
+        if channels and TRADE_CHANNEL not in channels.split(","):
+            # Trade kanalı dinlenmiyordu; doldurulacak bir şey yok
+            mark_gap_backfilled(gap_id)
+            continue
+        try:
+            total += backfill_window(start_iso, end_iso)
+            mark_gap_backfilled(gap_id)
+        except Exception as e:
+            # Bir sonraki yeniden bağlanmada tekrar denenir
+            logging.error(f"Backfill hatası ({start_iso} - {end_iso}): {e}")
+    return total
+
+# --- Arka planda tek seferde bir backfill (WS thread'ini bekletmemek için) ---
+_RUN_LOCK = threading.Lock()
+
+def schedule():
+    if not _RUN_LOCK.acquire(blocking=False):
+        return  # zaten çalışıyor; yeni kesinti bir sonraki turda alınır
+
+    def _run():
+        try:
+            backfill_pending()
+        finally:
+            _RUN_LOCK.release()
+
+    threading.Thread(target=_run, name="backfill", daemon=True).start()
+
+if __name__ == "__main__":
+    # python backfill.py                      -> bekleyen kesintileri doldur
+    # python backfill.py 2025-08-22T15:00:00 2025-08-22T15:10:00
+    if len(sys.argv) == 3:
+        print(backfill_window(sys.argv[1], sys.argv[2]))
+    else:
+        print(backfill_pending())
@@ -0,0 +1,248 @@
+# bench.py - Sıcak yollar için mikro benchmark'lar (test değil; elle çalıştırılır)
+#
+#   python bench.py            -> hepsi
+#   python bench.py trades     -> sadece işlem ingest yolu
+#
+# Her benchmark I/O'yu (CSV/DB) dışarıda bırakır; yalnızca CPU yolunu ölçer.
+import sys
+import time
+import random
+
+BENCHES = {}
+
+
+def bench(name):
+    def deco(fn):
+        BENCHES[name] = fn
+        return fn
+    return deco
+
+
+def _timeit(fn, repeat: int = 3) -> float:
+    """En iyi süre (sn)."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+# ------------ TRADES ------------
+def _sample_trades(n: int, contracts: int = 24, seed: int = 42) -> list:
+    """WS TradeHistoryChannel gövdelerine benzer örnek işlemler (saniyede birkaç işlem)."""
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        sec = i // 3
+        out.append({
+            "contractName": f"PH250822{rnd.randrange(contracts):02d}",
+            "time": f"2025-08-22T{8 + sec // 3600:02d}:{sec // 60 % 60:02d}:{sec % 60:02d}",
+            "price": f"{rnd.uniform(1000, 3400):.2f}",
+            "quantity": f"{rnd.uniform(0.1, 50):.1f}",
+            "region": "TR1",
+        })
+    return out
+
+
+def _legacy_trade_path(bodies: list):
+    """Eski yol: pd.to_datetime + pd.Timestamp listeleri, her işlemde pencereyi baştan topla."""
+    import pandas as pd
+    history = {}
+    for body in bodies:
+        trade = dict(body)
+        trade["price"] = float(trade["price"])
+        trade["quantity"] = float(trade["quantity"])
+        ts = pd.to_datetime(trade["time"], errors="coerce")
+        trade["time"] = ts.isoformat(timespec="seconds")
+        arr = history.get(trade["contractName"], [])
+        arr.append((ts, trade["price"], trade["quantity"]))
+        cutoff = ts - pd.Timedelta(hours=1)
+        arr = [(t, p, q) for (t, p, q) in arr if t >= cutoff]
+        history[trade["contractName"]] = arr
+        tot_q = sum(q for (_, _, q) in arr)
+        _ = (sum(p * q for (_, p, q) in arr) / tot_q) if tot_q else trade["price"]
+
+
+def _fast_trade_path(bodies: list):
+    """Yeni yol: tradeparse.Trade (önbellekli ISO parse) + rolling.RollingStats."""
+    from rolling import RollingStats
+    from tradeparse import Trade, parse_time
+    parse_time.cache_clear()
+    stats = RollingStats()
+    for body in bodies:
+        tr = Trade.from_message(body)
+        _ = stats.add(tr.contractName, tr.ts, tr.price, tr.quantity).aof("1h")
+
+
+@bench("trades")
+def bench_trades(n: int = 20000):
+    bodies = _sample_trades(n)
+    t_old = _timeit(lambda: _legacy_trade_path(bodies), repeat=1)
+    t_new = _timeit(lambda: _fast_trade_path(bodies))
+    print(f"[trades] n={n}  eski: {n / t_old:,.0f} işlem/sn  yeni: {n / t_new:,.0f} işlem/sn  "
+          f"(x{t_old / t_new:.1f})")
+
+
+# ------------ MIN/MAX FİYAT ------------
+def _sample_board(contracts: int, rows: int, seed: int = 7):
+    """boardinfo_history.csv'ye benzer tipli board çerçevesi (arada bant dışı ve boş değerler)."""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    names = np.array([f"PH250822{h:02d}" if h < 24 else f"PH250823{h - 24:02d}" for h in range(contracts)])
+    df = pd.DataFrame({
+        "contractName": names[rng.integers(0, contracts, rows)],
+        "mcp": rng.uniform(1500, 3500, rows),
+        "averagePrice": rng.uniform(0, 6000, rows),
+        "lastPrice": rng.uniform(50, 5200, rows),
+        "minPrice": rng.uniform(1000, 2000, rows),
+        "maxPrice": rng.uniform(2000, 3000, rows),
+    })
+    df.loc[rng.random(rows) < 0.05, "lastPrice"] = np.nan
+    return df
+
+
+def _legacy_minmax(dash, df_board):
+    """Eski dashboard döngüsü: kontrat başına maske + kolon başına liste + dash.loc yazımı."""
+    import pandas as pd
+    dash = dash.copy()
+    reasonable_price_cols = ['mcp', 'averagePrice', 'lastPrice']
+    for contract in dash['contractName'].unique():
+        contract_board_data = df_board[df_board['contractName'] == contract]
+        if not contract_board_data.empty:
+            all_prices = []
+            for col in reasonable_price_cols:
+                if col in contract_board_data.columns:
+                    prices = pd.to_numeric(contract_board_data[col], errors='coerce').dropna()
+                    reasonable_prices = prices[(prices > 100) & (prices < 5000)]
+                    all_prices.extend(reasonable_prices.tolist())
+            if all_prices:
+                dash.loc[dash['contractName'] == contract, 'minPrice'] = min(all_prices)
+                dash.loc[dash['contractName'] == contract, 'maxPrice'] = max(all_prices)
+    return dash
+
+
+def _vector_minmax(dash, df_board):
+    from boardstore import price_range
+    out = dash.merge(price_range(df_board), on='contractName', how='left', suffixes=('', '_band'))
+    out['minPrice'] = out['minPrice_band'].fillna(out['minPrice'])
+    out['maxPrice'] = out['maxPrice_band'].fillna(out['maxPrice'])
+    return out.drop(columns=['minPrice_band', 'maxPrice_band'])
+
+
+@bench("minmax")
+def bench_minmax():
+    for contracts, rows in ((24, 1000), (48, 1000), (48, 5000)):
+        board = _sample_board(contracts, rows)
+        dash = board.groupby('contractName').last().reset_index()
+        old = _legacy_minmax(dash, board)
+        new = _vector_minmax(dash, board)
+        assert (old[['minPrice', 'maxPrice']].to_numpy() == new[['minPrice', 'maxPrice']].to_numpy()).all()
+        t_old = _timeit(lambda: _legacy_minmax(dash, board))
+        t_new = _timeit(lambda: _vector_minmax(dash, board))
+        print(f"[minmax] {contracts} kontrat x {rows} satır  eski: {t_old * 1000:.1f} ms  "
+              f"yeni: {t_new * 1000:.1f} ms  (x{t_old / t_new:.1f})")
+
+
+# ------------ GAP ALARMLARI ------------
+def _sample_dash(days: int = 1, seed: int = 11):
+    """Dashboard çerçevesi: `days` günün tüm saatlik kontratları, bugünden başlayarak (açık/kapalı karışık)."""
+    import numpy as np
+    import pandas as pd
+    from datetime import datetime, timedelta
+    rng = np.random.default_rng(seed)
+    today = datetime.now().date()
+    names = [f"PH{today + timedelta(days=d):%y%m%d}{h:02d}" for d in range(days) for h in range(24)]
+    n = len(names)
+    mcp = rng.uniform(1500, 3500, n)
+    last = mcp + rng.normal(0, 8, n)
+    df = pd.DataFrame({"contractName": names, "mcp": mcp, "averagePrice": mcp + rng.normal(0, 4, n),
+                       "last_effective": last, "last_gap": last - mcp})
+    df.loc[rng.random(n) < 0.05, "mcp"] = np.nan
+    return df
+
+
+def _legacy_alarms(current_data, alarm_settings):
+    """Eski dashboard döngüsü: iterrows + satır başına pd.to_numeric / datetime.now()."""
+    import pandas as pd
+    from datetime import datetime
+    from contracts import get_contract
+    alarms = []
+    
+    if not alarm_settings['enabled'] or current_data.empty:
+        return alarms
+    
+    open_contracts_count = 0
+    processed_contracts = 0
+    
+    for _, current_row in current_data.iterrows():
+        contract_name = current_row['contractName']
+        processed_contracts += 1
+        
+        # Kontrat saati ve kapanışı kayıttan (her ad süreç başına bir kez çözülür)
+        contract = get_contract(contract_name)
+        if contract is None or contract.hour is None:
+            continue
+        contract_hour = contract.hour
+        
+        # Sadece açık kontratlar için alarm ver (kapalı kontratlar için alarm yok)
+        cutoff_time = contract.gate_closure
+        if cutoff_time is None:
+            continue  # Geçersiz kontrat formatı
+        
+        current_time = datetime.now()
+        if current_time > cutoff_time:
+            continue  # Kontrat kapanmış, alarm verme
+        
+        open_contracts_count += 1
+        
+        # GAP kontrolü (Son Eşleşme - PTF; mutlak eşik, mesajda AOF/PTF göster)
+        if 'last_gap' in current_row and 'mcp' in current_row and 'averagePrice' in current_row:
+            last_gap_signed = pd.to_numeric(current_row['last_gap'], errors='coerce')
+            ptf_price = pd.to_numeric(current_row['mcp'], errors='coerce')
+            aof_price = pd.to_numeric(current_row['averagePrice'], errors='coerce')
+            
+            if pd.notna(last_gap_signed) and pd.notna(ptf_price):
+                gap = abs(last_gap_signed)
+                gap_threshold = alarm_settings.get('gap_threshold', 5.0)
+                
+                # GAP kontrolü (sadece eşik aşımında alarm üret)
+                if gap >= gap_threshold:
+                    direction = "🔺" if last_gap_signed > 0 else "🔻"
+                    # Alarm yapısına ham değerleri ekle (telegram formatı için)
+                    alarms.append({
+                        'type': 'gap_alert',
+                        'contract': contract_name,
+                        'message': f"{direction} {contract_name} (AÇIK-S{contract_hour})",
+                        'severity': 'high' if gap >= gap_threshold * 2 else 'medium',
+                        'gap_value': float(gap),              # mutlak GAP
+                        'gap_signed': float(last_gap_signed), # işaretli GAP
+                        'last_effective': float(current_row.get('last_effective', 0)) if pd.notna(current_row.get('last_effective', 0)) else None,
+                        'ptf': float(ptf_price) if pd.notna(ptf_price) else None,
+                        'aof': float(aof_price) if pd.notna(aof_price) else None,
+                        'contract_hour': int(contract_hour) if pd.notna(contract_hour) else None
+                    })
+    
+    return alarms
+
+
+@bench("alarms")
+def bench_alarms():
+    from alerts import gap_alarms
+    settings = {"enabled": True, "gap_threshold": 5.0}
+    for days in (1, 2):
+        dash = _sample_dash(days)
+        old = _legacy_alarms(dash, settings)
+        new = [{k: v for k, v in a.items() if k != "due"} for a in gap_alarms(dash, 5.0)]
+        assert old == new, (old[:2], new[:2])
+        t_old = _timeit(lambda: _legacy_alarms(dash, settings), repeat=5)
+        t_new = _timeit(lambda: gap_alarms(dash, 5.0, last_sent={}, cooldown_sec=1800), repeat=5)
+        print(f"[alarms] {len(dash)} kontrat ({len(old)} alarm)  eski: {t_old * 1000:.2f} ms  "
+              f"yeni: {t_new * 1000:.2f} ms  (x{t_old / t_new:.1f})")
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHES)
+    for name in names:
+        BENCHES[name]()
@@ -0,0 +1,128 @@
+# boardstore.py - Board (ContractBoardMessage) verisi için depolama katmanı
+#
+# BOARDINFO_BACKEND=csv    -> boardinfo_history.csv'ye satır ekle / kuyruktan oku (eski davranış)
+# BOARDINFO_BACKEND=sqlite -> utils.boardinfo tablosu (tipli kolonlar, PK(contractName, time))
+#
+# sqlite modunda `time` kolonu mesajın alındığı an (ISO-8601, ms) olarak tutulur; böylece
+# her kontrat için snapshot geçmişi birikir. Teslim saati kontrat adından türetilir.
+import csv
+import os
+import sqlite3
+import logging
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from contracts import get_contract
+from csvtail import get_csv_tail
+from utils import (BOARDINFO_BACKEND, BOARDINFO_CSV, BOARDINFO_CSV_EXPORT,
+                   get_db_path, upsert_boardinfo)
+
+BOARD_COLUMNS = [
+    "contractName", "time", "averagePrice", "minPrice", "maxPrice",
+    "mcp", "lastPrice", "total", "volume", "bestBuyPrice", "bestSellPrice"
+]
+NUMERIC_COLUMNS = ['mcp', 'averagePrice', 'lastPrice', 'total', 'volume',
+                   'bestBuyPrice', 'bestSellPrice', 'minPrice', 'maxPrice']
+
+# ------------ WRITE ------------
+def append_board_csv(row: list):
+    file_exists = os.path.isfile(BOARDINFO_CSV)
+    with open(BOARDINFO_CSV, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if not file_exists:
+            writer.writerow(BOARD_COLUMNS)
+        writer.writerow(row)
+
+def board_row_from_message(data: dict):
+    """WS mesajından BOARD_COLUMNS sırasında satır üretir; board yoksa None."""
+    body = data.get("body", {})
+    board = body.get("boardInformation", None)
+    if not board:
+        return None
+    return [
+        body.get("name"),
+        body.get("deliveryDateStart", data.get("time", "")),
+        board.get("averagePrice"),
+        board.get("minPrice"),
+        board.get("maxPrice"),
+        board.get("mcp"),
+        board.get("lastPrice"),
+        board.get("total"),
+        board.get("volume"),
+        body.get("bestBuyPrice"),
+        body.get("bestSellPrice"),
+    ]
+
+def write_board_row(row: list):
+    """Seçili depoya yaz; sqlite modunda istenirse CSV'ye de kopyala."""
+    if BOARDINFO_BACKEND == "sqlite":
+        snap = list(row)
+        snap[1] = datetime.now().isoformat(timespec="milliseconds")
+        upsert_boardinfo(*snap)
+        if BOARDINFO_CSV_EXPORT:
+            append_board_csv(row)
+    else:
+        append_board_csv(row)
+
+# ------------ READ ------------
+def extract_hour(contract_name):
+    # Kontrat adı süreç başına bir kez çözülür (bkz. contracts.py)
+    c = get_contract(contract_name)
+    return c.hour if c is not None else None
+
+def prepare_board_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Yeni okunan board parçasını tiplendir (her satır için yalnızca bir kez çalışır)"""
+    if "time" in df.columns:
+        df["time"] = pd.to_datetime(df["time"], errors='coerce', format="ISO8601")
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    if 'contractName' in df.columns:
+        df['kontrat_saat'] = df['contractName'].apply(extract_hour)
+    return df
+
+def _load_board_sqlite(max_rows: int) -> pd.DataFrame:
+    # ix_boardinfo_time üzerinden geriye doğru tarama; son N snapshot
+    sql = f"""
+        SELECT {", ".join(BOARD_COLUMNS)} FROM (
+            SELECT * FROM boardinfo ORDER BY time DESC LIMIT ?
+        ) ORDER BY time
+    """
+    try:
+        with closing(sqlite3.connect(get_db_path(), timeout=10)) as con:
+            df = pd.read_sql_query(sql, con, params=(int(max_rows),))
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        # Tablo henüz oluşmadıysa (ingester hiç yazmadıysa) boş dön
+        logging.warning(f"boardinfo okunamadı: {e}")
+        return pd.DataFrame(columns=BOARD_COLUMNS)
+    return prepare_board_frame(df)
+
+def load_board(max_rows: int = 1000) -> pd.DataFrame:
+    """Son `max_rows` board satırını tipli DataFrame olarak döndür."""
+    if BOARDINFO_BACKEND == "sqlite":
+        return _load_board_sqlite(max_rows)
+    return get_csv_tail(BOARDINFO_CSV, max_rows=max_rows, prepare=prepare_board_frame).frame()
+
+# Min/Max Fiyat: yalnızca makul fiyat kolonları ve elektrik için makul bant (TL)
+PRICE_RANGE_COLUMNS = ['mcp', 'averagePrice', 'lastPrice']
+PRICE_BAND = (100, 5000)
+
+def price_range(df_board: pd.DataFrame) -> pd.DataFrame:
+    """
+    Kontrat başına bant içindeki (100 < fiyat < 5000) fiyatların min/max'ı.
+    Kolonlar tek seferde uzun biçime açılıp (melt) tek groupby ile indirgenir.
+    Dönen kolonlar: contractName, minPrice, maxPrice (bant içi fiyatı olmayan kontrat yok)
+    """
+    cols = [c for c in PRICE_RANGE_COLUMNS if c in df_board.columns]
+    if df_board.empty or not cols or 'contractName' not in df_board.columns:
+        return pd.DataFrame(columns=['contractName', 'minPrice', 'maxPrice'])
+    long = df_board[['contractName'] + cols].melt(id_vars='contractName', value_name='price')
+    prices = pd.to_numeric(long['price'], errors='coerce')
+    lo, hi = PRICE_BAND
+    mask = (prices > lo) & (prices < hi)
+    return (pd.DataFrame({'contractName': long['contractName'][mask], 'price': prices[mask]})
+            .groupby('contractName', sort=False)['price']
+            .agg(minPrice='min', maxPrice='max')
+            .reset_index())
@@ -0,0 +1,144 @@
+# contracts.py - Kontrat adı (PHyymmddhh) çözümlemesi için süreç genelinde kayıt
+#
+# Her kontrat adı süreç başına bir kez çözülür: teslim günü, saat, teslim başlangıcı
+# ve kapı kapanışı (teslim saati - 1). Ingest tarafı register() ile yeni adları
+# ayrıca `contracts` tablosuna yazar (persist_to ile hedef DB verildiyse);
+# dashboard ve alarm kodu get_contract() / contract_frame() ile aynı alanları okur.
+import threading
+from datetime import date, datetime
+
+from dbwriter import get_writer
+
+CONTRACTS_DDL = """
+CREATE TABLE IF NOT EXISTS contracts (
+  contractName TEXT PRIMARY KEY,
+  delivery_day TEXT,           -- YYYY-MM-DD
+  hour INTEGER,                -- teslim saati (kontrat_saat)
+  delivery_start TEXT,         -- ISO localtime
+  gate_closure TEXT,           -- ISO localtime (teslim saati - 1, en erken 00:00)
+  first_seen TEXT NOT NULL     -- ingest'in adı ilk gördüğü an
+);
+"""
+INSERT_CONTRACT_SQL = """
+INSERT OR IGNORE INTO contracts
+(contractName, delivery_day, hour, delivery_start, gate_closure, first_seen)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+class Contract:
+    """Çözülmüş kontrat adı; saat dışındaki alanlar yalnızca PH (saatlik) kontratlarda dolu."""
+    __slots__ = ("name", "hour", "delivery_day", "delivery_start", "gate_closure")
+
+    def __init__(self, name: str, hour, delivery_day, delivery_start, gate_closure):
+        self.name = name
+        self.hour = hour
+        self.delivery_day = delivery_day
+        self.delivery_start = delivery_start
+        self.gate_closure = gate_closure
+
+    def is_open(self, now: datetime = None) -> bool:
+        return self.gate_closure is not None and (now or datetime.now()) <= self.gate_closure
+
+    def row(self, first_seen: str) -> tuple:
+        return (
+            self.name,
+            self.delivery_day.isoformat() if self.delivery_day else None,
+            self.hour,
+            self.delivery_start.isoformat(timespec="seconds") if self.delivery_start else None,
+            self.gate_closure.isoformat(timespec="seconds") if self.gate_closure else None,
+            first_seen,
+        )
+
+    def __repr__(self):
+        return f"Contract({self.name!r}, hour={self.hour}, gate_closure={self.gate_closure})"
+
+
+def parse_contract(name):
+    """Kontrat adını çöz; 10 karakterden kısa ya da str olmayan ad için None."""
+    if not isinstance(name, str) or len(name) < 10:
+        return None
+    try:
+        hour = int(name[8:10])
+    except ValueError:
+        hour = None
+    day = start = closure = None
+    if name.startswith("PH") and name[2:10].isdigit():
+        try:
+            day = date(2000 + int(name[2:4]), int(name[4:6]), int(name[6:8]))
+            start = datetime(day.year, day.month, day.day, hour)
+            closure = datetime(day.year, day.month, day.day, max(0, hour - 1))
+        except ValueError:
+            day = start = closure = None
+    return Contract(name, hour, day, start, closure)
+
+
+# ------------ REGISTRY ------------
+_REGISTRY = {}          # {ad: Contract | None}
+_REGISTRY_LOCK = threading.Lock()
+_PERSIST = {"db_path": None, "init": None, "seen": set()}
+
+
+def get_contract(name):
+    """Önbellekli parse_contract."""
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        pass
+    except TypeError:   # hashlenemeyen değer
+        return None
+    c = parse_contract(name)
+    with _REGISTRY_LOCK:
+        _REGISTRY.setdefault(name, c)
+    return c
+
+
+def apply_schema(con):
+    con.execute(CONTRACTS_DDL)
+
+
+def persist_to(db_path: str, init=None):
+    """register() ile görülen yeni adları bu DB'nin contracts tablosuna yaz (ingest tarafı)."""
+    def _init(con):
+        if init is not None:
+            init(con)
+        apply_schema(con)
+    _PERSIST["db_path"] = db_path
+    _PERSIST["init"] = _init
+
+
+def register(name):
+    """Ingest: adı kaydet; süreçte ilk kez görülüyorsa contracts tablosuna da bırak."""
+    c = get_contract(name)
+    db_path = _PERSIST["db_path"]
+    if c is None or db_path is None or name in _PERSIST["seen"]:
+        return c
+    with _REGISTRY_LOCK:
+        if name in _PERSIST["seen"]:
+            return c
+        _PERSIST["seen"].add(name)
+    get_writer(db_path, init=_PERSIST["init"]).submit(
+        INSERT_CONTRACT_SQL, c.row(datetime.now().isoformat(timespec="seconds")))
+    return c
+
+
+def contract_frame(names):
+    """
+    Kontrat boyutu: contractName, kontrat_saat, delivery_day, gate_closure (datetime64), is_open.
+    Dashboard/alarm çerçevelerine contractName üzerinden merge edilir.
+    """
+    import pandas as pd  # ingest tarafı pandas yüklemesin
+    now = datetime.now()
+    uniq = list(dict.fromkeys(names))
+    rows = []
+    for n in uniq:
+        c = get_contract(n)
+        rows.append((n,
+                     c.hour if c else None,
+                     c.delivery_day if c else None,
+                     c.gate_closure if c else None,
+                     bool(c is not None and c.is_open(now))))
+    df = pd.DataFrame(rows, columns=["contractName", "kontrat_saat", "delivery_day",
+                                     "gate_closure", "is_open"])
+    df["gate_closure"] = pd.to_datetime(df["gate_closure"])
+    return df
@@ -0,0 +1,131 @@
+# csvtail.py - Büyüyen CSV dosyaları için bayt-ofset tabanlı kuyruk okuyucu
+import io
+import os
+import threading
+from typing import Callable, Optional
+
+import pandas as pd
+
+_BLOCK_SIZE = 64 * 1024
+
+
+def read_last_lines(f, n: int, start: int = 0):
+    """
+    İkili (rb) açılmış dosyada EOF'tan geriye doğru bloklar halinde okuyup
+    son n tam satırı döndürür. `start` öncesine (örn. başlık satırı) inilmez.
+    Dönüş: (satır baytları, son tam satırın bittiği ofset)
+    """
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    pos = end
+    buf = b""
+    while pos > start and buf.count(b"\n") <= n:
+        step = min(_BLOCK_SIZE, pos - start)
+        pos -= step
+        f.seek(pos)
+        buf = f.read(step) + buf
+
+    # Yarım kalmış son satırı (yazar henüz '\n' basmadıysa) sonraki okumaya bırak
+    cut = buf.rfind(b"\n")
+    if cut < 0:
+        return b"", pos
+    complete = buf[:cut + 1]
+    lines = complete.splitlines(keepends=True)
+    if pos > start and lines:
+        lines = lines[1:]  # blok sınırında bölünmüş ilk satır
+    return b"".join(lines[-n:]), pos + cut + 1
+
+
+class CsvTail:
+    """
+    CSV dosyasının son `max_rows` satırını DataFrame olarak tutar.
+
+    İlk okumada dosya sonundan geriye doğru aranır; sonraki çağrılarda yalnızca
+    son ofsetten sonra eklenen baytlar parse edilir. Dosya küçülürse (truncate)
+    veya inode değişirse (rotate) baştan yüklenir.
+    """
+
+    def __init__(self, path: str, max_rows: int = 1000,
+                 prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None):
+        self.path = str(path)
+        self.max_rows = int(max_rows)
+        self.prepare = prepare
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ident = None
+        self._offset = 0
+        self._header = b""
+        self._frame = pd.DataFrame()
+
+    def _parse(self, data: bytes) -> pd.DataFrame:
+        if not data.strip():
+            return pd.DataFrame()
+        df = pd.read_csv(io.BytesIO(self._header + data), on_bad_lines="skip", encoding="utf-8")
+        df.columns = df.columns.str.strip()
+        if self.prepare is not None:
+            df = self.prepare(df)
+        return df
+
+    def _load_tail(self, f):
+        self._header = f.readline()
+        if not self._header.endswith(b"\n"):
+            # Başlık bile tamamlanmamış; sonra tekrar dene
+            self._header = b""
+            return
+        data, self._offset = read_last_lines(f, self.max_rows, start=len(self._header))
+        self._offset = max(self._offset, len(self._header))
+        self._frame = self._parse(data)
+
+    def _load_appended(self, f, size: int):
+        f.seek(self._offset)
+        data = f.read(size - self._offset)
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            return
+        data = data[:cut + 1]
+        self._offset += len(data)
+        new = self._parse(data)
+        if new.empty:
+            return
+        frame = pd.concat([self._frame, new], ignore_index=True) if not self._frame.empty else new
+        self._frame = frame.iloc[-self.max_rows:].reset_index(drop=True)
+
+    def refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+
+        ident = (st.st_dev, st.st_ino)
+        if ident != self._ident or st.st_size < self._offset or not self._header:
+            # İlk okuma, rotate ya da truncate
+            self._reset()
+            self._ident = ident
+            with open(self.path, "rb") as f:
+                self._load_tail(f)
+        elif st.st_size > self._offset:
+            with open(self.path, "rb") as f:
+                self._load_appended(f, st.st_size)
+
+    def frame(self) -> pd.DataFrame:
+        """Güncel son N satırın kopyasını döndür (paylaşılan durum değişmesin diye)."""
+        with self._lock:
+            self.refresh()
+            return self._frame.copy()
+
+
+# --- Süreç genelinde paylaşılan okuyucular (tüm Streamlit oturumları aynı nesneyi kullanır) ---
+_TAILS = {}
+_TAILS_LOCK = threading.Lock()
+
+def get_csv_tail(path: str, max_rows: int = 1000, prepare=None) -> CsvTail:
+    key = (os.path.abspath(str(path)), int(max_rows))
+    with _TAILS_LOCK:
+        tail = _TAILS.get(key)
+        if tail is None:
+            tail = CsvTail(path, max_rows=max_rows, prepare=prepare)
+            _TAILS[key] = tail
+        return tail
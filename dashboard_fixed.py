@@ -2,7 +2,6 @@
 import os
 import math
 import time
-import sqlite3
 import io
 from pathlib import Path
 from datetime import datetime
@@ -18,7 +17,8 @@ except ImportError:
 # Kimlik doğrulama
 from auth import (
     authenticate_user, get_user_permissions, 
-    approve_user, get_pending_users, create_user_by_admin
+    approve_user, get_pending_users, create_user_by_admin,
+    create_session, get_session, delete_session
 )
 
 # Veri işleme
@@ -32,18 +32,19 @@ import xlsxwriter
 # Görselleştirme
 import plotly.express as px
 
-# Web/API
-import requests
-
 import streamlit as st
 import time
 # Otomatik yenileme import kaldırıldı
 
+from alerts import ALERT_GAP_THRESHOLD, ALERT_INTERVAL_MIN, engine_alive as alert_engine_alive, gap_alarms
+from notify import enqueue as notify_enqueue
+from render import open_mask, render_contract_table
+from snapshot import get_service as get_snapshot_service
+
 # ======================== .env / Dosya Yolları ========================
 ROOT = Path(__file__).resolve().parent
 
 DB_PATH = os.getenv("DB_PATH", str(ROOT / "data" / "gip_live.db"))
-BOARDINFO_CSV = os.getenv("BOARDINFO_CSV", str(ROOT / "boardinfo_history.csv"))
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
 TELEGRAM_CHAT_IDS = [int(x) for x in os.getenv("TELEGRAM_CHAT_IDS", "").split(",") if x.strip()]
@@ -101,8 +102,14 @@ st.set_page_config(page_title="GİP Trade Dashboard", page_icon="🚦", layout="
 # --- Otomatik Yenileme (stabil yol) ---
 from streamlit_autorefresh import st_autorefresh
 
-# Her 1000 ms'de (1 sn) bir rerun; sayfayı komple yenilemez, sadece scripti tekrar çalıştırır
-refresh_count = st_autorefresh(interval=1000, limit=None, key="gip_dash_autorefresh")
+# Veri akarken her 1000 ms'de (1 sn) bir rerun; sayfayı komple yenilemez, sadece scripti
+# tekrar çalıştırır. Piyasa sakinken (DASH_IDLE_AFTER_SEC boyunca yeni veri yoksa) aralık açılır.
+DASH_REFRESH_MS = int(os.getenv("DASH_REFRESH_MS", "1000"))
+DASH_IDLE_REFRESH_MS = int(os.getenv("DASH_IDLE_REFRESH_MS", "5000"))
+DASH_IDLE_AFTER_SEC = float(os.getenv("DASH_IDLE_AFTER_SEC", "30"))
+_idle_sec = get_snapshot_service(DB_PATH).idle_seconds()
+refresh_ms = DASH_IDLE_REFRESH_MS if _idle_sec >= DASH_IDLE_AFTER_SEC else DASH_REFRESH_MS
+refresh_count = st_autorefresh(interval=refresh_ms, limit=None, key="gip_dash_autorefresh")
 
 
 # Sağ üstte küçük sayaç/gösterge
@@ -135,14 +142,13 @@ def show_login_page():
                     st.session_state.username = username
                     st.session_state.user_permissions = get_user_permissions(username)
                     
-                    # Session dosyasını oluştur
-                    session_file = ROOT / "data" / "dashboard_session.txt"
+                    # Oturum token'ı: sayfa yenilense de URL'deki sid ile geri yüklenir
                     try:
-                        session_file.parent.mkdir(exist_ok=True)
-                        with open(session_file, 'w') as f:
-                            f.write(f"{username}\n{time.time()}")
+                        token = create_session(username)
+                        st.session_state.session_token = token
+                        st.query_params["sid"] = token
                         st.success(f"✅ {message} (Session kaydedildi)")
-                    except:
+                    except Exception:
                         st.success(f"✅ {message}")
                     
                     st.rerun()
@@ -201,32 +207,21 @@ def show_admin_panel():
         else:
             st.sidebar.success("✅ Bekleyen kullanıcı yok")
 
-# Check authentication - dosya tabanlı session backup
+# Check authentication - SQLite oturum tablosu (bkz. auth.py)
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 
-# Dosya tabanlı session restore
+# Oturum token'ı ile geri yükleme (tarayıcı yenilemesi / yeni sekme): tek indeksli okuma
 if not st.session_state.authenticated:
-    session_file = ROOT / "data" / "dashboard_session.txt"
+    token = st.query_params.get("sid")
     try:
-        if session_file.exists():
-            with open(session_file, 'r') as f:
-                lines = f.read().strip().split('\n')
-                if len(lines) >= 2:
-                    username = lines[0]
-                    timestamp = float(lines[1])
-                    
-                    # 24 saat kontrolü
-                    if time.time() - timestamp < 24 * 60 * 60:
-                        st.session_state.authenticated = True
-                        st.session_state.username = username
-                        from auth import get_user_permissions
-                        st.session_state.user_permissions = get_user_permissions(username)
-                    else:
-                        # Eski session dosyasını sil
-                        session_file.unlink()
-    except:
-        pass
+        restored = get_session(token)
+    except Exception:
+        restored = None
+    if restored is not None:
+        st.session_state.authenticated = True
+        st.session_state.username, st.session_state.user_permissions = restored
+        st.session_state.session_token = token
 
 if not st.session_state.get('authenticated', False):
     show_login_page()
@@ -241,15 +236,14 @@ st.sidebar.info(f"**Rol:** {role}")
 # Show admin panel
 show_admin_panel()
 
-# Logout button - session dosyasını sil
+# Logout button - oturum token'ını sil
 if st.sidebar.button("🚪 Çıkış Yap", use_container_width=True):
-    # Session dosyasını sil
-    session_file = ROOT / "data" / "dashboard_session.txt"
     try:
-        if session_file.exists():
-            session_file.unlink()
-    except:
+        delete_session(st.session_state.get("session_token"))
+    except Exception:
         pass
+    st.query_params.pop("sid", None)
+    st.session_state.session_token = None
     
     st.session_state.authenticated = False
     st.session_state.username = None
@@ -352,13 +346,17 @@ if not show_analytics:
 # Alarm Settings - Permission based
 st.sidebar.markdown("### 🚨 Fiyat Alarmları")
 user_permissions = st.session_state.get('user_permissions', {})
+# Ingest/alerts.py içinde çalışan bir alarm motoru varsa (taze kalp atışı) Telegram'ı o gönderir
+alert_engine_live = alert_engine_alive(DB_PATH)
 
 if user_permissions.get('visual_alarms', False):
     alarm_enabled = st.sidebar.checkbox("Alarm Sistemi Aktif", value=False, key="alarm_enabled")
     
     if alarm_enabled:
         st.sidebar.info("🔔 Görsel alarmlar aktif")
-        if user_permissions.get('telegram', False):
+        if alert_engine_live:
+            st.sidebar.info(f"📱 Telegram: ingest alarm motoru ({ALERT_GAP_THRESHOLD} TL / {ALERT_INTERVAL_MIN:g} dk)")
+        elif user_permissions.get('telegram', False):
             st.sidebar.success("📱 Telegram bildirimleri aktif")
         else:
             st.sidebar.info("📱 Telegram bildirimleri: Sadece admin")
@@ -463,94 +461,11 @@ if "telegram_running" not in st.session_state:
 def norm_cn(x) -> str:
     return (str(x).strip().upper()) if pd.notna(x) else ""
 
-def parse_cn_datetime(cn: str):
-    try:
-        if cn.startswith("PH") and len(cn) >= 10 and cn[2:10].isdigit():
-            yy = int(cn[2:4]); mm = int(cn[4:6]); dd = int(cn[6:8]); hh = int(cn[8:10])
-            return datetime(2000+yy, mm, dd), hh
-    except Exception:
-        pass
-    return None, None
-
-def contract_cutoff(cn: str):
-    d, hh = parse_cn_datetime(cn)
-    if d is None: 
-        return None
-    cutoff_hour = max(0, hh - 1)
-    return datetime(d.year, d.month, d.day, cutoff_hour, 0, 0)
-
-def remaining_info(cn: str):
-    now = datetime.now()
-    co = contract_cutoff(cn)
-    if co is None or now >= co:
-        return ("Kapalı", 100, "bar-black")
-    day0 = datetime(co.year, co.month, co.day, 0, 0, 0)
-    total = (co - day0).total_seconds()
-    elapsed = (now - day0).total_seconds()
-    pct = int(np.clip((elapsed/total)*100, 0, 100)) if total > 0 else 0
-    rem = (co - now).total_seconds()
-    hh = int(rem // 3600); mm = int((rem % 3600)//60)
-    lbl = f"{hh}sa {mm}dk kaldı" if hh > 0 else f"{mm}dk kaldı"
-    bar_cls = "bar-green" if rem > 3600 else "bar-orange"
-    return (lbl, pct, bar_cls)
-
-def render_contract_cell(cn: str) -> str:
-    label, pct, barcls = remaining_info(cn)
-    bar = f"<div class='barwrap'><div class='barfill {barcls}' style='width:{pct}%'></div></div>"
-    return f"<div class='cnwrap'><div class='cnhead'><span class='cnname'>{cn}</span><span class='cntimer'>{label}</span></div>{bar}</div>"
-
-def yes_no_html(flag):
-    if flag is None or (isinstance(flag, float) and np.isnan(flag)):
-        return "-"
-    return "<span class='yes'>✅</span>" if flag else "<span class='no'>✖</span>"
-
-def format_aof(val):
-    """AOF değerlerini 2 ondalık basamakla formatla"""
-    if pd.isna(val): 
-        return "-"
-    return f"{val:.2f}"
-
-def color_gap(val):
-    if pd.isna(val): return "-"
-    return f"<span class='gap-pos'>{val:.0f}</span>" if val >= 0 else f"<span class='gap-neg'>{val:.0f}</span>"
-
-def color_ptf(val):
-    """PTF değerlerini kırmızı arkaplan ile göster"""
-    if pd.isna(val): 
-        return "-"
-    return f"<span style='background-color: #dc3545; color: white; padding: 2px 6px; border-radius: 3px; font-weight: bold;'>{val:.2f}</span>"
-
-def format_min_price(val):
-    """Min fiyatları yeşil arkaplan ile göster"""
-    if pd.isna(val) or val == 0: 
-        return "-"
-    return f"<span style='background-color: #28a745; color: white; padding: 2px 6px; border-radius: 3px; font-weight: bold;'>{val:.2f}</span>"
-
-def format_max_price(val):
-    """Max fiyatları turuncu arkaplan ile göster"""
-    if pd.isna(val) or val == 0: 
-        return "-"
-    return f"<span style='background-color: #fd7e14; color: white; padding: 2px 6px; border-radius: 3px; font-weight: bold;'>{val:.2f}</span>"
-
-def send_telegram(text: str) -> bool:
-    """Send telegram notification - only for admin users"""
-    user_permissions = st.session_state.get('user_permissions', {})
-    
-    # TEST: Permission kontrolünü atla
-    # if not user_permissions.get('telegram', False):
-    #     return False
-    
+def send_telegram(text: str, key=None) -> bool:
+    """Telegram bildirimini kuyruğa bırak (bkz. notify.py); render'ı HTTP için bekletmez."""
     if not (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_IDS):
         return False
-    ok = True
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    for chat_id in TELEGRAM_CHAT_IDS:
-        try:
-            r = requests.post(url, data={"chat_id": chat_id, "text": text}, timeout=10)
-            ok = ok and (r.status_code == 200)
-        except Exception:
-            ok = False
-    return ok
+    return notify_enqueue(text, key=key)
 
 def age_str(dt):
     if dt is None or pd.isna(dt):
@@ -609,217 +524,55 @@ def handle_telegram_notifications(dash_df, threshold, interval):
     now_ts = time.time()
     notified = st.session_state.get("last_notify", {})
     
-    for _, r in dash_df.iterrows():
-        cn = str(r["contractName"])
-        chosen = None
-        label = None
-        
-        if pd.notna(r["last_gap"]) and np.isfinite(r["last_gap"]):
-            chosen = float(r["last_gap"])
-            label = "SON EŞLEŞME - PTF GAP"
-        elif pd.notna(r["gap"]) and np.isfinite(r["gap"]):
-            chosen = float(r["gap"])
-            label = "AOF - PTF GAP"
-            
-        if chosen is None:
-            continue
-
-        if abs(chosen) >= float(threshold):
-            key = f"{cn}:{label}"
-            if now_ts - notified.get(key, 0) >= interval:
-                yon = "↑" if chosen > 0 else "↓"
-                msg = f"{cn} kontratında {label} {yon}{int(round(chosen))} TL oldu!"
-                if send_telegram(msg):
-                    notified[key] = now_ts
+    # Son eşleşme GAP'i varsa o, yoksa AOF GAP'i; eşik ve cooldown kolon maskeleriyle
+    last_gap = pd.to_numeric(dash_df["last_gap"], errors="coerce")
+    use_last = np.isfinite(last_gap)
+    chosen = last_gap.where(use_last, pd.to_numeric(dash_df["gap"], errors="coerce"))
+    label = pd.Series(np.where(use_last, "SON EŞLEŞME - PTF GAP", "AOF - PTF GAP"), index=dash_df.index)
+    names = dash_df["contractName"].astype(str)
+    keys = names + ":" + label
+    due = (now_ts - keys.map(notified).fillna(0)) >= interval
+    hit = np.isfinite(chosen) & (chosen.abs() >= float(threshold)) & due
+    
+    for key, cn, lb, val in zip(keys[hit], names[hit], label[hit], chosen[hit]):
+        yon = "↑" if val > 0 else "↓"
+        msg = f"{cn} kontratında {lb} {yon}{int(round(val))} TL oldu!"
+        if send_telegram(msg, key=key):
+            notified[key] = now_ts
     
     st.session_state["last_notify"] = notified
 
 # ======================== Main Logic ========================
 # Auto refresh removed - manual refresh only
 
-# Initialize variables with defaults
-aof_df = pd.DataFrame()
-last_df = pd.DataFrame()
-flow15_df = pd.DataFrame()
-last_min_df = pd.DataFrame()
-last_db_snap = None
-last_csv_time = None
+# Veriler süreç başına tek arka plan thread'inde hazırlanır (bkz. snapshot.py);
+# bu oturum yalnızca paylaşılan anlık görüntüyü filtreleyip çizer.
+snap = get_snapshot_service(DB_PATH).current()
+df_board = snap.df_board
+aof_df = snap.aof_df
+last_df = snap.last_df
+flow15_df = snap.flow15_df
+last_min_df = snap.last_min_df
+last_db_snap = snap.last_db_snap
+last_csv_time = snap.last_csv_time
 
 # Show data update status in sidebar
 st.sidebar.markdown("### 📊 Veri Durumu")
 now = datetime.now()
 
-# Load board info with memory optimization
-df_board = pd.DataFrame()  # Initialize with empty DataFrame
-try:
-    if os.path.exists(BOARDINFO_CSV):
-        # Memory efficient: only read last 1000 lines instead of entire 118MB file
-        try:
-            # Read only last portion of CSV for performance
-            with open(BOARDINFO_CSV, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                
-            # Keep header + last 1000 data lines
-            if len(lines) > 1001:  # header + 1000 data lines
-                header_line = lines[0]  # First line is header
-                recent_data_lines = lines[-1000:]  # Last 1000 data lines
-                recent_lines = [header_line] + recent_data_lines
-            else:
-                recent_lines = lines
-                
-            # Create DataFrame from recent lines
-            from io import StringIO
-            csv_content = ''.join(recent_lines)
-            df_board = pd.read_csv(StringIO(csv_content), on_bad_lines="skip", encoding='utf-8')
-            
-            # Clean column names - remove leading/trailing whitespace
-            df_board.columns = df_board.columns.str.strip()
-            
-            # Parse time column properly - try different formats
-            if "time" in df_board.columns:
-                try:
-                    df_board["time"] = pd.to_datetime(df_board["time"], errors='coerce')
-                    
-                    # Get last CSV time from valid times only
-                    valid_times = df_board["time"].dropna()
-                    if not valid_times.empty:
-                        last_csv_time = valid_times.max()
-                    else:
-                        last_csv_time = None
-                        
-                except Exception as e:
-                    last_csv_time = None
-                    
-        except Exception as e:
-            st.error(f"CSV okuma hatası: {e}")
-            df_board = pd.DataFrame()
-            last_csv_time = None
-            
-            # Add contract hour column FIRST - more robust parsing
-            def extract_hour(contract_name):
-                try:
-                    if isinstance(contract_name, str) and len(contract_name) >= 10:
-                        hour_str = contract_name[8:10]
-                        return int(hour_str)
-                    return None
-                except:
-                    return None
-            
-            df_board['kontrat_saat'] = df_board['contractName'].apply(extract_hour)
-            
-            # Convert numeric columns to float
-            numeric_cols = ['mcp', 'averagePrice', 'lastPrice', 'total', 'volume', 'bestBuyPrice', 'bestSellPrice', 'minPrice', 'maxPrice']
-            for col in numeric_cols:
-                if col in df_board.columns:
-                    df_board[col] = pd.to_numeric(df_board[col], errors='coerce')
-                    
-except Exception as e:
-    st.error(f"Error loading board info: {str(e)}")
-    st.exception(e)  # Show full traceback in the UI
+for err in snap.errors.values():
+    st.error(err)
 
-# Load trades
-try:
-    with sqlite3.connect(DB_PATH) as con:
-        # Load AOF data with better date handling
-        aof_df = pd.read_sql_query("""
-            SELECT 
-                contractName,
-                SUM(price*quantity)/NULLIF(SUM(quantity),0.0) AS aof,
-                COUNT(*) as trade_count,
-                MIN(time) as first_trade,
-                MAX(time) as last_trade
-            FROM trades
-            WHERE date(time) = date('now','localtime')
-            GROUP BY contractName
-        """, con)
-        
-        # Load last trades with more info
-        last_df = pd.read_sql_query("""
-            SELECT 
-                t.contractName, 
-                t.price AS last_trade,
-                t.quantity as last_quantity,
-                t.time as trade_time
-            FROM trades t
-            JOIN (
-                SELECT contractName, MAX(time) mt
-                FROM trades
-                GROUP BY contractName
-            ) x ON x.contractName=t.contractName AND x.mt=t.time
-        """, con)
-        
-        # Load flow data for last 15 minutes
-        flow15_df = pd.read_sql_query("""
-            SELECT 
-                contractName, 
-                SUM(quantity) AS flow_15m,
-                COUNT(*) as trade_count_15m,
-                MIN(price) as min_price_15m,
-                MAX(price) as max_price_15m
-            FROM trades
-            WHERE datetime(time) >= datetime('now','localtime','-15 minutes')
-            GROUP BY contractName
-        """, con)
-        
-        # Load very recent trades
-        last_min_df = pd.read_sql_query("""
-            SELECT 
-                contractName, 
-                time,
-                price, 
-                quantity,
-                aof_1h
-            FROM trades
-            WHERE datetime(time) >= datetime('now','localtime','-60 seconds')
-            ORDER BY datetime(time) DESC
-            LIMIT 200
-        """, con)
-        
-        last_db_snap = datetime.now()
-        
-        # Show data freshness in sidebar
-        if not last_min_df.empty:
-            last_trade_time = pd.to_datetime(last_min_df['time'].iloc[0])
-            trade_age = (now - last_trade_time).total_seconds()
-            st.sidebar.info(f"Son işlem: {int(trade_age)} saniye önce")
-        
-except Exception as e:
-    st.error(f"Error loading trade data: {str(e)}")
-    st.exception(e)
+# Show data freshness in sidebar
+if not last_min_df.empty:
+    last_trade_time = pd.to_datetime(last_min_df['time'].iloc[0])
+    trade_age = (now - last_trade_time).total_seconds()
+    st.sidebar.info(f"Son işlem: {int(trade_age)} saniye önce")
 
-# Initialize dashboard DataFrame with necessary columns
+# Initialize dashboard DataFrame with necessary columns (paylaşılan nesne: kopya üzerinde çalış)
 if df_board.empty:
     st.warning("Veri yok: df_board boş")
-    dash = pd.DataFrame(columns=['contractName'])
-else:
-    # Get latest data for each contract FIRST
-    latest_data = df_board.sort_values('time').groupby('contractName').last().reset_index()
-    
-    dash = latest_data.copy()
-    
-    # Convert main metrics
-    dash['PTF_show'] = pd.to_numeric(dash['mcp'], errors='coerce')
-    
-    # Use real trade data for AOF and last trade instead of board info
-    if not aof_df.empty:
-        aof_dict = aof_df.set_index('contractName')['aof'].to_dict()
-        dash['aof_show'] = dash['contractName'].map(aof_dict).fillna(0)
-    else:
-        dash['aof_show'] = pd.to_numeric(dash['averagePrice'], errors='coerce')  # Fallback to board data
-    
-    if not last_df.empty:
-        last_dict = last_df.set_index('contractName')['last_trade'].to_dict()
-        dash['last_effective'] = dash['contractName'].map(last_dict).fillna(0)
-    else:
-        dash['last_effective'] = pd.to_numeric(dash['lastPrice'], errors='coerce')  # Fallback to board data
-    
-    # Calculate gaps with proper float conversion
-    dash['gap'] = (dash['aof_show'] - dash['PTF_show']).fillna(0)
-    dash['last_gap'] = (dash['last_effective'] - dash['PTF_show']).fillna(0)
-
-    # Calculate comparison indicators safely
-    dash['aof_gt'] = (pd.to_numeric(dash['aof_show'], errors='coerce') > pd.to_numeric(dash['PTF_show'], errors='coerce')).fillna(False)
-    dash['last_gt'] = (pd.to_numeric(dash['last_effective'], errors='coerce') > pd.to_numeric(dash['PTF_show'], errors='coerce')).fillna(False)
+dash = snap.dash.copy()
 
 # Helper function for time filtering
 def time_filter(df: pd.DataFrame) -> pd.DataFrame:
@@ -847,55 +600,28 @@ def time_filter(df: pd.DataFrame) -> pd.DataFrame:
             return df_filtered[(df_filtered["kontrat_saat"] >= a) | (df_filtered["kontrat_saat"] <= b)]
     return df_filtered
 
-# Apply time filters - but only if we have data
-dash = time_filter(dash)
-
-if not show_closed:
-    now = datetime.now()
-    dash = dash[dash["contractName"].apply(lambda cn: (contract_cutoff(cn) is not None) and (now <= contract_cutoff(cn)))]
-
-# Apply visual formatting
-dash["cn_html"] = dash["contractName"].astype(str).apply(render_contract_cell)
-dash["gap_html"] = dash["gap"].apply(color_gap)
-dash["last_gap_html"] = dash["last_gap"].apply(color_gap)
-dash["aof_gt_icon"] = dash["aof_gt"].apply(yes_no_html)
-dash["last_gt_icon"] = dash["last_gt"].apply(yes_no_html)
-dash["ptf_html"] = dash["PTF_show"].apply(color_ptf)
-dash["aof_html"] = dash["aof_show"].apply(format_aof)
-
-# Sort and remove duplicates
-dash = dash.sort_values(["contractName"]).copy()
-dash = dash.loc[:, ~dash.columns.duplicated()]
-
-# Add min/max price formatting if columns exist
-if "minPrice" in dash.columns and "maxPrice" in dash.columns:
-    # Calculate min/max from reasonable price columns only
-    reasonable_price_cols = ['mcp', 'averagePrice', 'lastPrice']
-    
-    for contract in dash['contractName'].unique():
-        contract_board_data = df_board[df_board['contractName'] == contract]
-        
-        if not contract_board_data.empty:
-            # Collect all valid price values for this contract from reasonable columns
-            all_prices = []
-            for col in reasonable_price_cols:
-                if col in contract_board_data.columns:
-                    prices = pd.to_numeric(contract_board_data[col], errors='coerce').dropna()
-                    # Filter out unreasonable values (should be between 100 and 5000 TL for electricity)
-                    reasonable_prices = prices[(prices > 100) & (prices < 5000)]
-                    all_prices.extend(reasonable_prices.tolist())
-            
-            # Calculate min/max from reasonable prices
-            if all_prices:
-                min_price = min(all_prices)
-                max_price = max(all_prices)
-                
-                # Update the dash DataFrame
-                dash.loc[dash['contractName'] == contract, 'minPrice'] = min_price
-                dash.loc[dash['contractName'] == contract, 'maxPrice'] = max_price
-    
-    dash["min_price_html"] = dash["minPrice"].apply(format_min_price)
-    dash["max_price_html"] = dash["maxPrice"].apply(format_max_price)
+# Filtreleme + biçimlendirme + tablo HTML'i yalnızca veri sürümü, filtreler ya da
+# dakika (kalan süre etiketi) değişince yeniden üretilir; aksi halde oturumdaki kopya kullanılır
+view_key = (snap.version, zaman, cs, ce, show_closed, now.strftime("%Y%m%d%H%M"))
+cached_view = st.session_state.get("_dash_view")
+if cached_view is not None and cached_view[0] == view_key:
+    _, dash, table_html = cached_view
+else:
+    # Apply time filters - but only if we have data
+    dash = time_filter(dash)
+
+    if not show_closed:
+        dash = dash[open_mask(dash["contractName"])]
+
+    # Sort and remove duplicates
+    dash = dash.sort_values(["contractName"]).copy()
+    dash = dash.loc[:, ~dash.columns.duplicated()]
+
+    # Tablo HTML'i: kontrat zamanları tek seferde, hücreler şablondan; değişmeyen satırlar
+    # önbellekten (bkz. render.py). Min/Max bant içi değerleri snapshot'ta hesaplanır.
+    table_html = render_contract_table(dash) if not dash.empty else None
+
+    st.session_state["_dash_view"] = (view_key, dash, table_html)
 
 # Display the main table
 st.markdown(f"### 📊 Kontrat Tablosu <span style='color:#00ff00; font-size:0.8em;'>🔴 CANLI: {datetime.now().strftime('%H:%M:%S')}</span>", unsafe_allow_html=True)
@@ -905,49 +631,14 @@ if dash.empty:
     st.warning("⚠️ Gösterilecek veri yok!")
     st.info("Lütfen bekleyin veya filtreleri kontrol edin")
     st.info(f"Board data rows: {len(df_board)}")
-else:
-    # Prepare display columns
-    display_cols = ["cn_html", "ptf_html", "aof_html"]
-    
-    if "gap_html" in dash.columns:
-        display_cols.extend(["aof_gt_icon", "gap_html"])
-    
-    if "last_effective" in dash.columns:
-        display_cols.extend(["last_effective", "last_gap_html", "last_gt_icon"])
-    
-    # Add min/max price columns if available (remove volume)
-    if "min_price_html" in dash.columns:
-        display_cols.append("min_price_html")
-        
-    if "max_price_html" in dash.columns:
-        display_cols.append("max_price_html")
-    
-    # Filter existing columns only
-    available_cols = [col for col in display_cols if col in dash.columns]
+elif table_html is not None:
+    # Display the table
+    st.markdown(table_html, unsafe_allow_html=True)
     
-    if available_cols:
-        df_show = dash[available_cols].copy()
-        
-        # Create appropriate column names
-        col_names = ["Kontrat", "PTF", "AOF"]
-        if "gap_html" in available_cols:
-            col_names.extend(["AOF > PTF", "GAP"])
-        if "last_effective" in available_cols:
-            col_names.extend(["Son Eşleşme", "Son Eşleşme GAP", "Son Eşleşme > PTF"])
-        if "min_price_html" in available_cols:
-            col_names.append("Min Fiyat")
-        if "max_price_html" in available_cols:
-            col_names.append("Max Fiyat")
-        
-        df_show.columns = col_names[:len(df_show.columns)]
-        
-        # Display the table
-        st.markdown(df_show.to_html(escape=False, index=False), unsafe_allow_html=True)
-        
-        # Show data count info
-        st.caption(f"Toplam {len(df_show)} kontrat gösteriliyor")
-    else:
-        st.error("Görüntülenecek sütun bulunamadı")
+    # Show data count info
+    st.caption(f"Toplam {len(dash)} kontrat gösteriliyor")
+else:
+    st.error("Görüntülenecek sütun bulunamadı")
 
 # Display recent trades
 st.markdown("### Son 1 Dakikalık Eşleşmeler")
@@ -1088,75 +779,15 @@ if st.sidebar.button("Excel'e Aktar", use_container_width=True, key="export_btn_
         st.sidebar.error(f"Excel oluşturma hatası: {str(e)}")
 
 # ==================== ALARM SİSTEMİ ====================
-def check_alarms_for_telegram(current_data, alarm_settings):
-    """İlk çalıştırmada tüm alarmları kontrol et, sonrasında sadece yenileri"""
-    alarms = []
-    
+def check_alarms_for_telegram(current_data, alarm_settings, last_sent=None, cooldown_sec=0):
+    """Açık kontratlarda |Son Eşleşme GAP| >= eşik olanlar (kolon maskeleri, bkz. alerts.gap_alarms)"""
     if not alarm_settings['enabled'] or current_data.empty:
-        return alarms
-    
-    open_contracts_count = 0
-    processed_contracts = 0
-    
-    for _, current_row in current_data.iterrows():
-        contract_name = current_row['contractName']
-        processed_contracts += 1
-        
-        # Kontrat saatini çıkar (örn: PTF140814 -> 14)
-        try:
-            if isinstance(contract_name, str) and len(contract_name) >= 10:
-                contract_hour = int(contract_name[8:10])
-            else:
-                continue
-        except:
-            continue
-        
-        # Sadece açık kontratlar için alarm ver (kapalı kontratlar için alarm yok)
-        cutoff_time = contract_cutoff(contract_name)
-        if cutoff_time is None:
-            continue  # Geçersiz kontrat formatı
-        
-        current_time = datetime.now()
-        if current_time > cutoff_time:
-            continue  # Kontrat kapanmış, alarm verme
-        
-        open_contracts_count += 1
-        
-        # GAP kontrolü (Son Eşleşme - PTF; mutlak eşik, mesajda AOF/PTF göster)
-        if 'last_gap' in current_row and 'mcp' in current_row and 'averagePrice' in current_row:
-            last_gap_signed = pd.to_numeric(current_row['last_gap'], errors='coerce')
-            ptf_price = pd.to_numeric(current_row['mcp'], errors='coerce')
-            aof_price = pd.to_numeric(current_row['averagePrice'], errors='coerce')
-            
-            if pd.notna(last_gap_signed) and pd.notna(ptf_price):
-                gap = abs(last_gap_signed)
-                gap_threshold = alarm_settings.get('gap_threshold', 5.0)
-                
-                # GAP kontrolü (sadece eşik aşımında alarm üret)
-                if gap >= gap_threshold:
-                    direction = "🔺" if last_gap_signed > 0 else "🔻"
-                    # Alarm yapısına ham değerleri ekle (telegram formatı için)
-                    alarms.append({
-                        'type': 'gap_alert',
-                        'contract': contract_name,
-                        'message': f"{direction} {contract_name} (AÇIK-S{contract_hour})",
-                        'severity': 'high' if gap >= gap_threshold * 2 else 'medium',
-                        'gap_value': float(gap),              # mutlak GAP
-                        'gap_signed': float(last_gap_signed), # işaretli GAP
-                        'last_effective': float(current_row.get('last_effective', 0)) if pd.notna(current_row.get('last_effective', 0)) else None,
-                        'ptf': float(ptf_price) if pd.notna(ptf_price) else None,
-                        'aof': float(aof_price) if pd.notna(aof_price) else None,
-                        'contract_hour': int(contract_hour) if pd.notna(contract_hour) else None
-                    })
-    
-    return alarms
+        return []
+    return gap_alarms(current_data, alarm_settings.get('gap_threshold', 5.0),
+                      last_sent=last_sent, cooldown_sec=cooldown_sec)
 
 # Alarm sistemi kontrolü
 if alarm_enabled and not df_board.empty:
-    # Session state'te önceki veriyi sakla
-    if 'previous_board_data' not in st.session_state:
-        st.session_state.previous_board_data = df_board.copy()
-    
     # Alarm ayarları - kullanıcı tanımlı ve sabit değerler
     alarm_settings = {
         'enabled': alarm_enabled,
@@ -1167,32 +798,23 @@ if alarm_enabled and not df_board.empty:
     }
     
     # Alarm verisi olarak dash DataFrame'ini kullan (latest_data yerine)
-    # dash zaten filtrelenmiş ve işlenmiş veri, last_gap sütunu da var
-    current_alarm_data = dash.copy()  # İşlenmiş tablo verisi
-    
-    # Önceki veriyi de aynı şekilde işle
-    if 'previous_board_data' in st.session_state:
-        previous_board = st.session_state.previous_board_data
-        # Önceki veriyi de aynı şekilde işle
-        prev_latest = previous_board.sort_values('time').groupby('contractName').last().reset_index()
-        prev_dash = prev_latest.copy()
-        
-        # Aynı hesaplamaları yap
-        prev_dash['PTF_show'] = pd.to_numeric(prev_dash['mcp'], errors='coerce')
-        prev_dash['last_effective'] = pd.to_numeric(prev_dash['lastPrice'], errors='coerce')
-        prev_dash['last_gap'] = (prev_dash['last_effective'] - prev_dash['PTF_show']).fillna(0)
-        
-        previous_alarm_data = prev_dash
-    else:
-        previous_alarm_data = current_alarm_data.copy()
+    # dash zaten filtrelenmiş ve işlenmiş veri, last_gap sütunu da var (salt okunur kullanılır)
+    current_alarm_data = dash
     
     # DEBUG: Kontrol edilen veriler (sadece dev ortamında)
     # st.info(f"🔍 {len(current_alarm_data)} kontrat kontrol ediliyor")
     # if not current_alarm_data.empty:
     #     st.write("📊 İlk 3 kontrat:", current_alarm_data[['contractName', 'last_effective', 'PTF_show', 'last_gap']].head(3))
     
+    # Telegram cooldown'u: kontrat başına son bildirim zamanı (gap_alarms 'due' alanına çevirir)
+    if 'last_telegram_per_contract' not in st.session_state:
+        st.session_state.last_telegram_per_contract = {}
+    alert_interval = st.session_state.get('telegram_alert_interval', 30)  # dakika
+
     # Alarm kontrolü - sadece GAP alarmları için özel fonksiyon kullan
-    alarms = check_alarms_for_telegram(current_alarm_data, alarm_settings)
+    alarms = check_alarms_for_telegram(current_alarm_data, alarm_settings,
+                                       last_sent=st.session_state.last_telegram_per_contract,
+                                       cooldown_sec=alert_interval * 60)
     
     # DEBUG: Üretilen alarmlar (sadece dev ortamında)
     # st.info(f"⚠️ {len(alarms)} alarm üretildi")
@@ -1201,33 +823,18 @@ if alarm_enabled and not df_board.empty:
     #         st.write(f"🚨 {alarm['contract']}: GAP {alarm.get('gap_value', 0):.2f} TL")
     
     # Telegram bildirimi sistem - kontrat bazlı cooldown
-    if alarms and (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_IDS):
+    # Çalışan alarm motoru varken Telegram'ı o gönderir (bkz. alerts.engine_alive)
+    if alarms and (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_IDS) and not alert_engine_live:
         current_time = time.time()
-        alert_interval = st.session_state.get('telegram_alert_interval', 30)  # dakika
-        alert_interval_seconds = alert_interval * 60  # saniyeye çevir
-        
+
         # İlk çalıştırma kontrolü
         is_first_run = not st.session_state.get('first_run_alarms_sent', False)
-        
-        # Session state'te her kontrat için son bildirim zamanını sakla
-        if 'last_telegram_per_contract' not in st.session_state:
-            st.session_state.last_telegram_per_contract = {}
-        
-        alerts_to_send = []
-        
-        for alarm in alarms:
-            if alarm['type'] == 'gap_alert':  # Sadece GAP alarmları
-                contract = alarm['contract']
-                last_sent_time = st.session_state.last_telegram_per_contract.get(contract, 0)
-                time_since_last = current_time - last_sent_time
-                
-                # İlk çalıştırmada veya cooldown süresi geçmişse gönder
-                should_send = is_first_run or (time_since_last >= alert_interval_seconds)
-                
-                if should_send:
-                    alerts_to_send.append(alarm)
-                    st.session_state.last_telegram_per_contract[contract] = current_time
-        
+
+        # İlk çalıştırmada veya cooldown süresi geçmişse gönder
+        alerts_to_send = [a for a in alarms if a['type'] == 'gap_alert' and (is_first_run or a['due'])]
+        for alarm in alerts_to_send:
+            st.session_state.last_telegram_per_contract[alarm['contract']] = current_time
+
         # İlk çalıştırma bayrağını set et
         if is_first_run and alerts_to_send:
             st.session_state.first_run_alarms_sent = True
@@ -1261,10 +868,10 @@ if alarm_enabled and not df_board.empty:
                 f"⏱️ Sonraki bildirim: {alert_interval} dk sonra"
             )
             
-            if send_telegram(telegram_text):
-                st.success(f"📱 Telegram bildirimi gönderildi: {contract} - GAP: {gap_signed:.2f}")
+            if send_telegram(telegram_text, key=contract):
+                st.success(f"📱 Telegram bildirimi kuyruğa alındı: {contract} - GAP: {gap_signed:.2f}")
             else:
-                st.error(f"❌ Telegram bildirimi gönderilemedi: {contract} - Token/Chat ID kontrol et")
+                st.error(f"❌ Telegram bildirimi kuyruğa alınamadı: {contract} - Token/Chat ID kontrol et")
     
     # Sadece görsel alarm gösterimi için geleneksel alarm sistemi (debounce ile)
     current_time = time.time()
@@ -1316,7 +923,7 @@ if alarm_enabled and not df_board.empty:
 # Alarm kapalıysa tüm alarm verilerini temizle ve hiçbir şey gösterme
 else:
     # Alarm verilerini temizle
-    for key in ['alarm_history', 'previous_board_data', 'shown_alarms', 'last_telegram_per_contract', 'first_run_alarms_sent']:
+    for key in ['alarm_history', 'shown_alarms', 'last_telegram_per_contract', 'first_run_alarms_sent']:
         if key in st.session_state:
             del st.session_state[key]
     # Hiçbir alarm bölümü gösterme - tamamen temiz
@@ -0,0 +1,291 @@
+# dbwriter.py - Arka plan SQLite yazıcısı (toplu / group-commit)
+#
+# Ingest thread'leri satırları sınırlı bir kuyruğa bırakır; yazıcı thread her
+# DB_BATCH_MS milisaniyede ya da DB_BATCH_ROWS satırda bir, biriken satırları tek
+# transaction içinde executemany ile yazar. Böylece her işlem için ayrı commit/fsync
+# maliyeti ödenmez ve WebSocket callback'i diske takılmaz.
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+# off: en hızlı, güç kesintisinde son işlemler kaybolabilir
+# normal: WAL ile önerilen (varsayılan)
+# full: her commit'te fsync
+DB_DURABILITY = os.getenv("DB_DURABILITY", "normal").strip().lower()
+DB_BATCH_ROWS = int(os.getenv("DB_BATCH_ROWS", "500"))
+DB_BATCH_MS = int(os.getenv("DB_BATCH_MS", "200"))
+DB_QUEUE_MAX = int(os.getenv("DB_QUEUE_MAX", "50000"))
+
+_SYNC_PRAGMA = {"off": "OFF", "normal": "NORMAL", "full": "FULL"}
+
+_STOP = object()
+
+
+class _Flush:
+    __slots__ = ("event",)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class BatchWriter:
+    """
+    Tek bağlantı + tek thread ile sıralı toplu yazıcı.
+
+    submit(sql, params) satırı kuyruğa ekler. Kuyruk doluysa `block=True` iken
+    çağıran bekler (backpressure), aksi halde satır düşürülür ve sayılır.
+    Yazıcı thread'i durmuşsa (close() ya da DB açılamadı -> `error`) submit False,
+    flush False döner; hiçbiri beklemede kalmaz.
+    """
+
+    def __init__(self, db_path: str, init=None, max_rows: int = DB_BATCH_ROWS,
+                 max_ms: int = DB_BATCH_MS, maxsize: int = DB_QUEUE_MAX,
+                 durability: str = DB_DURABILITY, block: bool = True):
+        self.db_path = str(db_path)
+        self.init = init
+        self.max_rows = max(1, int(max_rows))
+        self.max_wait = max(0, int(max_ms)) / 1000.0
+        self.durability = durability if durability in _SYNC_PRAGMA else "normal"
+        self.block = block
+        self.error = None
+        self._q = queue.Queue(maxsize=maxsize)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0, "written": 0, "dropped": 0, "errors": 0,
+            "batches": 0, "queue_full": 0, "blocked_sec": 0.0,
+            "max_depth": 0, "last_batch_rows": 0, "last_commit_ms": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name=f"dbwriter:{Path(self.db_path).name}", daemon=True)
+        self._thread.start()
+
+    # ------------ producer tarafı ------------
+    def _put_blocking(self, item) -> bool:
+        """Kuyrukta yer açılana ya da yazıcı thread'i ölene kadar bekle."""
+        while self._thread.is_alive():
+            try:
+                self._q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def submit(self, sql: str, params) -> bool:
+        if not self._thread.is_alive():
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+                first = self._stats["dropped"] == 1
+            if first:  # her satır için değil, bir kez
+                logging.error(f"DB yazıcı çalışmıyor, satırlar düşürülüyor ({self.db_path}): "
+                              f"{self.error or 'kapatıldı'}")
+            return False
+        item = (sql, tuple(params))
+        try:
+            self._q.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["queue_full"] += 1
+            if not self.block:
+                with self._stats_lock:
+                    self._stats["dropped"] += 1
+                logging.warning(f"DB yazıcı kuyruğu dolu, satır düşürüldü ({self.db_path})")
+                return False
+            t0 = time.perf_counter()
+            ok = self._put_blocking(item)
+            with self._stats_lock:
+                self._stats["blocked_sec"] += time.perf_counter() - t0
+                if not ok:
+                    self._stats["dropped"] += 1
+            if not ok:
+                return False
+        depth = self._q.qsize()
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+            if depth > self._stats["max_depth"]:
+                self._stats["max_depth"] = depth
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Şu ana kadar kuyruğa girenlerin tamamı commit edilene kadar bekle."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        marker = _Flush()
+        if not self._put_blocking(marker):
+            return False
+        while True:
+            wait = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+            if wait <= 0:
+                return False
+            if marker.event.wait(wait):
+                return self.error is None
+            if not self._thread.is_alive():
+                return marker.event.is_set() and self.error is None
+
+    def close(self, timeout: float = 10.0):
+        if not self._thread.is_alive():
+            return
+        self._q.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = dict(self._stats)
+        out["depth"] = self._q.qsize()
+        out["durability"] = self.durability
+        return out
+
+    # ------------ yazıcı thread ------------
+    def _connect(self):
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute(f"PRAGMA synchronous={_SYNC_PRAGMA[self.durability]};")
+        conn.execute("PRAGMA busy_timeout=60000;")
+        if self.init is not None:
+            self.init(conn)
+        return conn
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self.error = e
+            logging.error(f"DB yazıcı başlatılamadı ({self.db_path}): {e}")
+            self._drain()
+            return
+        stop = False
+        while not stop:
+            try:
+                item = self._q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch, markers = [], []
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, _Flush):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_rows:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(conn, batch)
+            for m in markers:
+                m.event.set()
+
+        # Kapanışta kuyrukta kalanları da yaz
+        rest = self._drain()
+        if rest:
+            self._write(conn, rest)
+        conn.close()
+
+    def _drain(self) -> list:
+        """Kuyruğu boşalt: bekleyen flush'ları bırak, satırları döndür."""
+        rest = []
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _Flush):
+                item.event.set()
+            elif item is not _STOP:
+                rest.append(item)
+        if rest and self.error is not None:
+            with self._stats_lock:
+                self._stats["errors"] += len(rest)
+        return rest
+
+    def _write(self, conn, batch):
+        # Ardışık aynı SQL'leri grupla -> executemany
+        groups = []
+        for sql, params in batch:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+
+        t0 = time.perf_counter()
+        written = len(batch)
+        backoff = 0.2
+        for _ in range(10):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for sql, rows in groups:
+                    conn.executemany(sql, rows)
+                conn.execute("COMMIT")
+                break
+            except sqlite3.Error as e:
+                try: conn.execute("ROLLBACK")
+                except sqlite3.Error: pass
+                msg = str(e).lower()
+                if isinstance(e, sqlite3.OperationalError) and ("locked" in msg or "busy" in msg):
+                    time.sleep(backoff)
+                    backoff = min(backoff * 1.8, 3.0)
+                    continue
+                logging.error(f"Toplu yazma hatası ({self.db_path}): {e}")
+                written = self._write_rowwise(conn, groups)
+                break
+        else:
+            logging.error(f"DB kilitli kaldı, {len(batch)} satır yazılamadı ({self.db_path})")
+            with self._stats_lock:
+                self._stats["errors"] += len(batch)
+            return
+
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["written"] += written
+            self._stats["last_batch_rows"] = len(batch)
+            self._stats["last_commit_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+    def _write_rowwise(self, conn, groups):
+        """Hatalı satırı izole etmek için tek tek (autocommit) yaz."""
+        ok = 0
+        for sql, rows in groups:
+            for params in rows:
+                try:
+                    conn.execute(sql, params)
+                    ok += 1
+                except sqlite3.Error as e:
+                    logging.error(f"Satır yazılamadı: {e} {params}")
+                    with self._stats_lock:
+                        self._stats["errors"] += 1
+        return ok
+
+
+# --- Süreç genelinde DB başına tek yazıcı ---
+_WRITERS = {}
+_WRITERS_LOCK = threading.Lock()
+
+def get_writer(db_path: str, init=None) -> BatchWriter:
+    key = os.path.abspath(str(db_path))
+    with _WRITERS_LOCK:
+        w = _WRITERS.get(key)
+        if w is None:
+            w = BatchWriter(db_path, init=init)
+            _WRITERS[key] = w
+        return w
+
+def close_all(timeout: float = 10.0):
+    """Kapanışta tüm yazıcıları boşalt (atexit ile de çağrılır)."""
+    with _WRITERS_LOCK:
+        writers = list(_WRITERS.values())
+    for w in writers:
+        w.close(timeout)
+
+atexit.register(close_all)
@@ -0,0 +1,185 @@
+# ingest.py - Tek WebSocket bağlantısı ile tüm EPİAŞ GİP kanallarını dinleyen ingest daemon'u
+#
+# Tek CAS girişi + tek soket; gelen mesajlar `eventType` alanına göre kayıtlı
+# işleyicilere (handler) dağıtılır. Yeni bir kanal eklemek için:
+#     register_handler("KanalAdi", fonksiyon)   # fonksiyon(data: dict)
+import os
+import json
+import time
+import random
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import websocket
+
+from utils import get_fresh_ws_url, record_gap, setup_logger
+from wspipeline import MessagePipeline
+
+ROOT = Path(__file__).resolve().parent
+
+# Yeniden bağlanma: alt-saniyeden başlayan, jitter'lı üstel bekleme
+RECONNECT_BASE_SEC = float(os.getenv("RECONNECT_BASE_SEC", "0.5"))
+RECONNECT_MAX_SEC = float(os.getenv("RECONNECT_MAX_SEC", "60"))
+# Bu kadar süre ayakta kalan bağlantıdan sonra bekleme sıfırlanır
+RECONNECT_STABLE_SEC = float(os.getenv("RECONNECT_STABLE_SEC", "30"))
+
+# eventType -> handler(data: dict)
+HANDLERS = {}
+# Kesinti kaydedildikten sonra çağrılır (örn. backfill.schedule); hızlı dönmeli
+GAP_HOOKS = []
+# eventType -> [listener(data: dict)]: handler'dan SONRA aynı mesajla çağrılır (örn. alerts)
+LISTENERS = {}
+
+def register_handler(event_type: str, handler):
+    HANDLERS[event_type] = handler
+
+def register_gap_hook(hook):
+    if hook not in GAP_HOOKS:
+        GAP_HOOKS.append(hook)
+
+def register_listener(event_type: str, listener):
+    listeners = LISTENERS.setdefault(event_type, [])
+    if listener not in listeners:
+        listeners.append(listener)
+
+def register_default_handlers():
+    """Board ve trade kanallarını bağla (modüller burada yüklenir; döngüsel import olmasın)."""
+    from gunici_veri import handle_board
+    from tradehistory import handle_trade
+    register_handler("ContractBoardMessage", handle_board)
+    register_handler("TradeHistoryChannel", handle_trade)
+
+# ------------ DISPATCH ------------
+def dispatch(message):
+    """Worker thread'inde çalışır: tek JSON parse + eventType'a göre yönlendirme."""
+    logging.info(f"[MSG] {message[:180]} ...")
+    data = json.loads(message)
+    event_type = data.get("eventType")
+    handler = HANDLERS.get(event_type)
+    if handler is None:
+        return
+    handler(data)
+    for listener in LISTENERS.get(event_type, ()):
+        try:
+            listener(data)
+        except Exception as e:
+            logging.error(f"Listener hatası ({event_type}): {e}")
+
+# Alım thread'i sadece kuyruğa bırakır; sıralı işlem için varsayılan tek worker
+PIPELINE = MessagePipeline(dispatch, name="ingest")
+
+# ------------ WS HANDLERS ------------
+def on_message(ws, message):
+    PIPELINE.submit(message)
+
+def on_error(ws, error):
+    logging.error(f"WS error: {error}")
+
+def on_close(ws, close_status_code, close_msg):
+    logging.warning(f"WS closed: {close_status_code} {close_msg}")
+
+# Bağlantı durumu: kesinti pencerelerini (gap) kaydetmek için
+_CONN = {"channels": [], "connected_at": None, "down_since": None}
+
+def on_open(ws):
+    now = datetime.now()
+    _CONN["connected_at"] = time.monotonic()
+    down_since = _CONN["down_since"]
+    _CONN["down_since"] = None
+    logging.info(f"WS opened, kanallar: {', '.join(_CONN['channels'])}")
+    if down_since is not None:
+        try:
+            record_gap(down_since.isoformat(timespec="seconds"), now.isoformat(timespec="seconds"),
+                       _CONN["channels"])
+            logging.warning(f"Kesinti kaydedildi: {down_since:%H:%M:%S} - {now:%H:%M:%S} "
+                            f"({(now - down_since).total_seconds():.1f} sn)")
+        except Exception as e:
+            logging.error(f"Kesinti kaydedilemedi: {e}")
+        for hook in GAP_HOOKS:
+            try:
+                hook()
+            except Exception as e:
+                logging.error(f"Kesinti hook hatası: {e}")
+
+def ws_thread(ws_url):
+    """Bağlantı koparsa/timeout yerse/exception alırsa çıkar; üst döngü tekrar çağırır."""
+    websocket.enableTrace(False)
+    ws = websocket.WebSocketApp(
+        ws_url,
+        on_open=on_open,
+        on_message=on_message,
+        on_error=on_error,
+        on_close=on_close,
+    )
+    ws.run_forever(ping_interval=30, ping_timeout=10)
+
+# ------------ RUN LOOP ------------
+class Backoff:
+    """Jitter'lı üstel bekleme: base, 2*base, 4*base ... max'a kadar; her adım [d/2, d] arası rastgele."""
+
+    def __init__(self, base: float = RECONNECT_BASE_SEC, cap: float = RECONNECT_MAX_SEC):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+
+    def next_delay(self) -> float:
+        d = min(self.cap, self.base * (2 ** self.attempt))
+        self.attempt += 1
+        return random.uniform(d / 2, d)
+
+    def reset(self):
+        self.attempt = 0
+
+def run_forever(channels=None):
+    """Sonsuz döngü: koparsa veya TGT/JWT expire olursa tekrar bağlanır."""
+    channels = list(channels or HANDLERS)
+    _CONN["channels"] = channels
+    backoff = Backoff()
+    while True:
+        try:
+            ws_url = get_fresh_ws_url(channels)
+            if not ws_url:
+                delay = backoff.next_delay()
+                logging.warning(f"WS URL alınamadı, {delay:.1f} sn sonra tekrar denenecek...")
+                time.sleep(delay)
+                continue
+            logging.info(f"WS başlatılıyor ({', '.join(channels)})")
+            ws_thread(ws_url)
+        except Exception as e:
+            logging.error(f"Ana döngü hatası: {e}")
+
+        connected_at = _CONN["connected_at"]
+        if connected_at is not None:
+            # Bağlantı gerçekten açılmıştı: kesinti şimdi başladı
+            _CONN["connected_at"] = None
+            _CONN["down_since"] = datetime.now()
+            if time.monotonic() - connected_at >= RECONNECT_STABLE_SEC:
+                backoff.reset()
+        delay = backoff.next_delay()
+        logging.warning(f"Bağlantı koptu, {delay:.1f} sn sonra tekrar denenecek...")
+        time.sleep(delay)
+
+def main():
+    """python ingest.py: tüm kanallar + alarm motoru / SSE (ayarlıysa)."""
+    setup_logger(str(ROOT / "ingest_ws.log"))
+    register_default_handlers()
+    from tradehistory import ensure_db
+    ensure_db(reset=False)
+    import backfill
+    register_gap_hook(backfill.schedule)
+    backfill.schedule()  # önceki çalışmadan kalan kesintiler
+    import alerts
+    if alerts.ALERT_ENGINE:
+        alerts.install()
+    import push
+    if push.PUSH_ENABLED:
+        push.install()
+    print(f"GİP ingest başlıyor: {', '.join(HANDLERS)}")
+    run_forever()
+
+if __name__ == "__main__":
+    # Betik olarak çalışınca bu dosya `__main__` olur; alerts/push/tradehistory ise
+    # `ingest` modülüne kayıt yapar. Kayıt ve dispatch aynı modülde kalsın diye:
+    import ingest
+    ingest.main()
@@ -0,0 +1,224 @@
+# notify.py - Telegram için asenkron, havuzlu bildirim kuyruğu
+#
+# enqueue() hemen döner; mesajlar tek bir dağıtıcı thread'inde NOTIFY_COALESCE_SEC
+# pencere boyunca biriktirilip tek mesajda birleştirilir (aynı anahtar -> en sonuncu),
+# ardından kalıcı bir requests.Session (keep-alive) üzerinden tüm TELEGRAM_CHAT_IDS'e
+# thread havuzuyla eşzamanlı gönderilir. Sohbet başına en az NOTIFY_CHAT_MIN_INTERVAL
+# aralık korunur; 429'da Telegram'ın retry_after'ı, ağ/5xx hatalarında jitter'lı üstel
+# bekleme ile NOTIFY_MAX_RETRIES kadar tekrar denenir.
+import os
+import time
+import atexit
+import queue
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+NOTIFY_COALESCE_SEC = float(os.getenv("NOTIFY_COALESCE_SEC", "2.0"))
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+NOTIFY_QUEUE_MAX = int(os.getenv("NOTIFY_QUEUE_MAX", "1000"))
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "4"))
+NOTIFY_TIMEOUT_SEC = float(os.getenv("NOTIFY_TIMEOUT_SEC", "10"))
+# Telegram: aynı sohbete saniyede ~1 mesaj
+NOTIFY_CHAT_MIN_INTERVAL = float(os.getenv("NOTIFY_CHAT_MIN_INTERVAL", "1.0"))
+
+TELEGRAM_MAX_CHARS = 4096
+SEPARATOR = "\n\n──────────\n\n"
+
+_STOP = object()
+
+
+def telegram_config():
+    """Her gönderimde ortamdan okunur: dashboard'dan kaydedilen ayarlar da geçerli olur."""
+    token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
+    chat_ids = [int(x) for x in os.getenv("TELEGRAM_CHAT_IDS", "").split(",") if x.strip()]
+    return token, chat_ids
+
+
+def coalesce(items: list) -> list:
+    """
+    [(anahtar, metin)] -> Telegram sınırına sığan mesaj listesi.
+    Aynı anahtarın (örn. kontrat) pencere içindeki son metni kalır; sıra ilk görülüşe göre.
+    """
+    latest = {}
+    for n, (key, text) in enumerate(items):
+        latest[key if key is not None else ("#", n)] = text
+    out, cur = [], ""
+    for text in latest.values():
+        text = text[:TELEGRAM_MAX_CHARS]
+        if cur and len(cur) + len(SEPARATOR) + len(text) > TELEGRAM_MAX_CHARS:
+            out.append(cur)
+            cur = ""
+        cur = f"{cur}{SEPARATOR}{text}" if cur else text
+    if cur:
+        out.append(cur)
+    return out
+
+
+class Notifier:
+    def __init__(self, coalesce_sec: float = NOTIFY_COALESCE_SEC, workers: int = NOTIFY_WORKERS,
+                 maxsize: int = NOTIFY_QUEUE_MAX, config=telegram_config):
+        self.coalesce_sec = coalesce_sec
+        self.config = config
+        self._q = queue.Queue(maxsize=maxsize)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="notify-send")
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers))
+        self._session.mount("https://", adapter)
+        self._next_ok = {}      # {chat_id: monotonic} -> bu zamandan önce o sohbete gönderme
+        self._chat_locks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {"queued": 0, "dropped": 0, "messages": 0, "sent": 0, "failed": 0, "retries": 0}
+
+    # -- dışarıya açık --
+    def enqueue(self, text: str, key=None) -> bool:
+        """Bloklamaz. Kuyruk doluysa ya da Telegram ayarlı değilse False."""
+        token, chat_ids = self.config()
+        if not (token and chat_ids):
+            return False
+        self.start()
+        try:
+            self._q.put_nowait((key, text))
+        except queue.Full:
+            self._count("dropped")
+            logging.error("Bildirim kuyruğu dolu, mesaj düşürüldü")
+            return False
+        self._count("queued")
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, depth=self._q.qsize())
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="notify", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Bekleyenleri gönder ve dur."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._q.put(_STOP)
+        thread.join(timeout)
+        self._pool.shutdown(wait=True)
+
+    # -- dağıtıcı --
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.coalesce_sec
+            stop = False
+            while True:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=left)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: list):
+        token, chat_ids = self.config()
+        if not (token and chat_ids):
+            return
+        url = f"https://api.telegram.org/bot{token}/sendMessage"
+        texts = coalesce(batch)
+        self._count("messages", len(texts))
+        # Sohbetler paralel; bir sohbet içinde mesaj sırası korunur
+        futures = []
+        for chat_id in chat_ids:
+            try:
+                futures.append(self._pool.submit(self._send_chat, url, chat_id, texts))
+            except RuntimeError:
+                # Yorumlayıcı kapanıyor: havuz yeni iş almaz, kalanları burada gönder
+                self._send_chat(url, chat_id, texts)
+        for f in futures:
+            f.result()
+
+    def _chat_lock(self, chat_id) -> threading.Lock:
+        with self._lock:
+            return self._chat_locks.setdefault(chat_id, threading.Lock())
+
+    def _send_chat(self, url: str, chat_id, texts: list):
+        with self._chat_lock(chat_id):
+            for text in texts:
+                ok = self._send_one(url, chat_id, text)
+                self._count("sent" if ok else "failed")
+
+    def _send_one(self, url: str, chat_id, text: str) -> bool:
+        for attempt in range(NOTIFY_MAX_RETRIES + 1):
+            wait = self._next_ok.get(chat_id, 0) - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            retry_after = None
+            try:
+                r = self._session.post(url, data={"chat_id": chat_id, "text": text},
+                                       timeout=NOTIFY_TIMEOUT_SEC)
+                self._next_ok[chat_id] = time.monotonic() + NOTIFY_CHAT_MIN_INTERVAL
+                if r.status_code == 200:
+                    return True
+                if r.status_code == 429:
+                    try:
+                        retry_after = float(r.json().get("parameters", {}).get("retry_after", 1))
+                    except ValueError:
+                        retry_after = 1.0
+                elif r.status_code < 500:
+                    logging.error(f"Telegram {chat_id}: HTTP {r.status_code} {r.text[:200]}")
+                    return False  # 400/403 vb. tekrar denemekle düzelmez
+                else:
+                    logging.warning(f"Telegram {chat_id}: HTTP {r.status_code}")
+            except requests.RequestException as e:
+                logging.warning(f"Telegram {chat_id}: {e}")
+            if attempt == NOTIFY_MAX_RETRIES:
+                break
+            self._count("retries")
+            if retry_after is None:
+                d = min(30.0, 2 ** attempt)
+                retry_after = random.uniform(d / 2, d)
+            time.sleep(retry_after)
+        logging.error(f"Telegram {chat_id}: {NOTIFY_MAX_RETRIES + 1} denemede gönderilemedi")
+        return False
+
+
+_NOTIFIER = {"notifier": None}
+_NOTIFIER_LOCK = threading.Lock()
+
+def get_notifier() -> Notifier:
+    """Süreç başına tek kuyruk (dashboard oturumları ve alarm motoru paylaşır)."""
+    with _NOTIFIER_LOCK:
+        if _NOTIFIER["notifier"] is None:
+            _NOTIFIER["notifier"] = Notifier()
+        return _NOTIFIER["notifier"]
+
+def enqueue(text: str, key=None) -> bool:
+    return get_notifier().enqueue(text, key=key)
+
+def _close():
+    notifier = _NOTIFIER["notifier"]
+    if notifier is not None:
+        notifier.stop(timeout=5.0)
+
+atexit.register(_close)
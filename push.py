@@ -0,0 +1,320 @@
+# push.py - Kontrat tablosu için Server-Sent Events (SSE) canlı akışı
+#
+# Ingest içinde çalışır (PUSH_ENABLED=1): board / trade mesajlarından sonra yalnızca
+# etkilenen kontratın PTF, AOF (gün), son eşleşme ve GAP alanları güncellenir; değişen
+# alanlar "delta" olayı olarak bağlı istemcilere anında itilir. SQLite yoklaması yok.
+#
+#   GET /stream[?contracts=PH..,PH..]  -> text/event-stream (önce "snapshot", sonra "delta")
+#   GET /state                          -> anlık durum (JSON)
+#   GET /                               -> hücre bazlı güncellenen basit canlı tablo
+#
+# Kopan istemci Last-Event-ID ile bağlanırsa halka tampondaki kaçırdığı delta'lar tekrar
+# gönderilir; tampon yetmezse yeni snapshot alır.
+#
+# Gün AOF'u ve son eşleşme başlangıçta contract_stats'tan tohumlanır (install -> seed);
+# ingest gün ortasında yeniden başlasa da AOF dashboard'dakiyle aynı kalır.
+#
+# Kimlik doğrulama yoktur: varsayılan olarak yalnızca 127.0.0.1'i dinler. Başka
+# makinelerden erişim için PUSH_HOST=0.0.0.0 verin ve önüne kimlik doğrulamalı bir
+# reverse proxy koyun (nginx/Caddy; SSE için proxy_buffering kapalı).
+import os
+import json
+import queue
+import logging
+import sqlite3
+import threading
+from collections import deque
+from contextlib import closing
+from datetime import date, datetime
+from pathlib import Path
+
+from rolling import RollingStats
+from tradeparse import Trade
+
+ROOT = Path(__file__).resolve().parent
+DB_PATH = os.getenv("DB_PATH", str(ROOT / "data" / "gip_live.db"))
+
+PUSH_ENABLED = os.getenv("PUSH_ENABLED", "0").strip() == "1"
+PUSH_HOST = os.getenv("PUSH_HOST", "127.0.0.1")
+PUSH_PORT = int(os.getenv("PUSH_PORT", "8765"))
+PUSH_BUFFER = int(os.getenv("PUSH_BUFFER", "2000"))          # Last-Event-ID tekrar tamponu
+PUSH_CLIENT_QUEUE = int(os.getenv("PUSH_CLIENT_QUEUE", "1000"))
+PUSH_HEARTBEAT_SEC = float(os.getenv("PUSH_HEARTBEAT_SEC", "15"))
+
+FIELDS = ("ptf", "aof", "last", "gap", "aof_gap")
+
+_EPOCH_DAY = date(1970, 1, 1)
+
+
+def _num(v):
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return v if v == v else None
+
+
+def _round(v):
+    return None if v is None else round(v, 2)
+
+
+# ------------ DURUM + YAYIN ------------
+class ContractFeed:
+    """
+    Kontrat başına son alanlar + abonelere yayın. Abone başına sınırlı kuyruk: yavaş
+    istemci doldurursa bağlantısı kapatılır (ingest worker'ı asla beklemez).
+    """
+
+    def __init__(self, buffer: int = PUSH_BUFFER, client_queue: int = PUSH_CLIENT_QUEUE):
+        self.state = {}                         # {kontrat: {alan: değer}}
+        self.trades = RollingStats({"day": None})
+        self.seeded = {}                        # {kontrat: DB'deki son işlem zamanı}
+        self.seq = 0
+        self.recent = deque(maxlen=buffer)      # son delta olayları (Last-Event-ID için)
+        self.client_queue = client_queue
+        self._subs = set()
+        self._lock = threading.Lock()
+
+    # -- güncelleme --
+    def _apply(self, contract: str, ptf=None, aof=None, last=None):
+        with self._lock:
+            cur = self.state.get(contract) or dict.fromkeys(FIELDS)
+            new = dict(cur)
+            if ptf is not None:
+                new["ptf"] = ptf
+            if aof is not None:
+                new["aof"] = aof
+            if last is not None:
+                new["last"] = last
+            p = new["ptf"]
+            new["gap"] = _round(new["last"] - p) if (p is not None and new["last"] is not None) else None
+            new["aof_gap"] = _round(new["aof"] - p) if (p is not None and new["aof"] is not None) else None
+            delta = {k: new[k] for k in FIELDS if new[k] != cur[k]}
+            if not delta:
+                return None
+            self.state[contract] = new
+            self.seq += 1
+            event = {"id": self.seq, "contract": contract, **delta}
+            self.recent.append(event)
+            subs = list(self._subs)
+        for q in subs:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                self._drop(q)
+        return event
+
+    def handle_board(self, data: dict):
+        body = data.get("body") or {}
+        board = body.get("boardInformation")
+        cn = body.get("name")
+        if not board or not cn:
+            return None
+        # İşlem görülmemiş (ya da tohumlanmamış) kontratta board'un AOF'u / son fiyatı
+        cw = self.trades.get(cn)
+        aof = cw.aof("day") if cw is not None else None
+        last = _num(board.get("lastPrice")) if cw is None else None
+        return self._apply(cn, ptf=_round(_num(board.get("mcp"))),
+                           aof=_round(aof if aof is not None else _num(board.get("averagePrice"))),
+                           last=_round(last))
+
+    def handle_trade(self, data: dict):
+        tr = Trade.from_message(data.get("body") or {})
+        if tr is None:
+            return None
+        seen = self.seeded.get(tr.contractName)
+        if seen is not None and tr.time <= seen:
+            return None  # tohumdaki toplamlarda zaten var (WS'in yeniden gönderdiği işlem)
+        aof = self.trades.add(tr.contractName, tr.ts, tr.price, tr.quantity).aof("day")
+        return self._apply(tr.contractName, aof=_round(aof), last=_round(tr.price))
+
+    def seed(self, con, day: date = None) -> int:
+        """
+        Gün pencerelerini contract_stats toplamlarıyla, son eşleşmeyi last_trades ile
+        doldurur; AOF = sum_pq / sum_q, queries.daily_stats ile aynı. WS bağlanmadan
+        önce çağrılmalı. Tohumlanan kontrat sayısını döndürür.
+        """
+        import queries
+        day = day or datetime.now().date()
+        epoch_day = (day - _EPOCH_DAY).days  # rolling.DayWindow: ts // 86400
+        last = {r.contractName: r.last_trade
+                for r in queries.last_trades(con, day).itertuples(index=False)}
+        totals = queries.day_totals(con, day)
+        for r in totals.itertuples(index=False):
+            cw = self.trades.seed_day(r.contractName, epoch_day, r.sum_pq, r.sum_q, r.trade_count)
+            self.seeded[r.contractName] = r.last_trade
+            self._apply(r.contractName, aof=_round(cw.aof("day")),
+                        last=_round(_num(last.pop(r.contractName, None))))
+        for cn, price in last.items():  # bugün işlemi olmayan, dün işlem görmüş kontratlar
+            self._apply(cn, last=_round(_num(price)))
+        return len(totals)
+
+    # -- abonelik --
+    def subscribe(self, last_id: int = None):
+        """(kuyruk, ilk olaylar): tampon yetiyorsa kaçırılan delta'lar, aksi halde snapshot."""
+        q = queue.Queue(maxsize=self.client_queue)
+        with self._lock:
+            self._subs.add(q)
+            if (last_id is not None and last_id <= self.seq and self.recent
+                    and self.recent[0]["id"] <= last_id + 1):
+                first = [("delta", e) for e in self.recent if e["id"] > last_id]
+            else:
+                first = [("snapshot", {"id": self.seq, "contracts": dict(self.state)})]
+        return q, first
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subs.discard(q)
+
+    def _drop(self, q):
+        self.unsubscribe(q)
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+        q.put_nowait(None)  # akışı sonlandır; istemci Last-Event-ID ile yeniden bağlanır
+        logging.warning("SSE istemcisi yetişemiyor, bağlantı kapatıldı")
+
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"id: {data.get('id', '')}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# ------------ HTTP ------------
+LIVE_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>GİP canlı</title>
+<style>
+body{font-family:sans-serif;background:#111;color:#eee} table{border-collapse:collapse}
+td,th{padding:4px 10px;border-bottom:1px solid #333;text-align:right} td:first-child{text-align:left}
+.neg{color:#ff6b6b} .pos{color:#51cf66} .flash{background:#333}
+</style></head><body>
+<table><thead><tr><th>Kontrat</th><th>PTF</th><th>AOF</th><th>Son Eşleşme</th><th>GAP</th><th>AOF GAP</th></tr></thead>
+<tbody id="rows"></tbody></table>
+<script>
+const F = ["ptf", "aof", "last", "gap", "aof_gap"];
+const rows = document.getElementById("rows");
+function row(cn) {
+  let tr = document.getElementById("r-" + cn);
+  if (!tr) {
+    tr = document.createElement("tr"); tr.id = "r-" + cn;
+    const name = document.createElement("td"); name.textContent = cn; tr.appendChild(name);
+    for (const f of F) {
+      const td = document.createElement("td"); td.dataset.f = f; td.textContent = "-"; tr.appendChild(td);
+    }
+    const after = [...rows.children].find(r => r.id > tr.id);
+    rows.insertBefore(tr, after || null);
+  }
+  return tr;
+}
+function apply(cn, d) {
+  const tr = row(cn);
+  for (const f of F) {
+    if (!(f in d)) continue;
+    const td = tr.querySelector("[data-f='" + f + "']"), v = d[f];
+    td.textContent = v === null ? "-" : v.toFixed(2);
+    if (f.endsWith("gap")) td.className = v === null ? "" : (v < 0 ? "neg" : "pos");
+    td.classList.add("flash"); setTimeout(() => td.classList.remove("flash"), 300);
+  }
+}
+const es = new EventSource("stream" + location.search);
+es.addEventListener("snapshot", e => { rows.innerHTML = "";
+  const s = JSON.parse(e.data); for (const cn in s.contracts) apply(cn, s.contracts[cn]); });
+es.addEventListener("delta", e => { const d = JSON.parse(e.data); apply(d.contract, d); });
+</script></body></html>
+"""
+
+
+def create_app(feed: ContractFeed):
+    from flask import Flask, Response, jsonify, request
+
+    app = Flask(__name__)
+
+    @app.get("/")
+    def live_page():
+        return Response(LIVE_PAGE, mimetype="text/html")
+
+    @app.get("/state")
+    def state():
+        with feed._lock:
+            return jsonify({"id": feed.seq, "contracts": dict(feed.state)})
+
+    @app.get("/stream")
+    def stream():
+        wanted = {c.strip() for c in request.args.get("contracts", "").split(",") if c.strip()}
+        try:
+            last_id = int(request.headers.get("Last-Event-ID", ""))
+        except ValueError:
+            last_id = None
+        q, first = feed.subscribe(last_id)
+
+        def gen():
+            try:
+                yield "retry: 2000\n\n"
+                for event, data in first:
+                    if event == "snapshot" and wanted:
+                        data = dict(data, contracts={k: v for k, v in data["contracts"].items()
+                                                     if k in wanted})
+                    if event == "delta" and wanted and data["contract"] not in wanted:
+                        continue
+                    yield _sse(event, data)
+                while True:
+                    try:
+                        data = q.get(timeout=PUSH_HEARTBEAT_SEC)
+                    except queue.Empty:
+                        yield ": ping\n\n"  # proxy'ler boşta bağlantıyı kesmesin
+                        continue
+                    if data is None:
+                        return
+                    if wanted and data["contract"] not in wanted:
+                        continue
+                    yield _sse("delta", data)
+            finally:
+                feed.unsubscribe(q)
+
+        return Response(gen(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    return app
+
+
+_FEED = {"feed": None, "server": None}
+_FEED_LOCK = threading.Lock()
+
+def get_feed() -> ContractFeed:
+    with _FEED_LOCK:
+        if _FEED["feed"] is None:
+            _FEED["feed"] = ContractFeed()
+        return _FEED["feed"]
+
+def serve(feed: ContractFeed, host: str = PUSH_HOST, port: int = PUSH_PORT):
+    """Ayrı thread'de çok iş parçacıklı werkzeug sunucusu (her SSE istemcisi bir thread)."""
+    from werkzeug.serving import make_server
+    server = make_server(host, port, create_app(feed), threaded=True)
+    t = threading.Thread(target=server.serve_forever, name="push-http", daemon=True)
+    t.start()
+    return server
+
+def install(host: str = PUSH_HOST, port: int = PUSH_PORT, db_path: str = None) -> ContractFeed:
+    """Günü DB'den tohumla, ingest dispatch'ine bağla ve SSE sunucusunu başlat."""
+    from ingest import register_listener
+    feed = get_feed()
+    db_path = db_path or DB_PATH
+    try:
+        with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)) as con:
+            n = feed.seed(con)
+        logging.info(f"SSE: {n} kontratın gün AOF'u DB'den tohumlandı")
+    except Exception as e:
+        # Tohum yoksa işlem gelene kadar board averagePrice kullanılır
+        logging.warning(f"SSE tohumlama başarısız ({db_path}): {e}")
+    register_listener("ContractBoardMessage", feed.handle_board)
+    register_listener("TradeHistoryChannel", feed.handle_trade)
+    with _FEED_LOCK:
+        if _FEED["server"] is None:
+            _FEED["server"] = serve(feed, host, port)
+    logging.info(f"SSE canlı akış: http://{host}:{port}/stream")
+    return feed
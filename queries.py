@@ -0,0 +1,218 @@
+# queries.py - Dashboard'un trades / contract_stats okumaları (gip_live.db)
+#
+# Zaman filtreleri kolonu fonksiyona sarmadan (date(time), datetime(time)) ham ISO
+# string üzerinde aralık olarak yazılır; sınırlar Python'da hesaplanır. Böylece
+# SQLite indeksleri kullanabilir. `python queries.py` her sorgunun planını
+# EXPLAIN QUERY PLAN ile kontrol eder; tablo taraması (SCAN) varsa 1 ile çıkar.
+import sys
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+# trades.time biçimi: 'YYYY-MM-DDTHH:MM:SS' (localtime); sınırlar da aynı biçimde
+def iso_seconds(dt: datetime) -> str:
+    return dt.isoformat(timespec="seconds")
+
+def day_bounds(day: date):
+    """[gün, ertesi gün) aralığı: time >= ? AND time < ?"""
+    return day.isoformat(), (day + timedelta(days=1)).isoformat()
+
+def since_iso(seconds: float, now: datetime = None) -> str:
+    return iso_seconds((now or datetime.now()) - timedelta(seconds=seconds))
+
+# ------------ SQL ------------
+DAILY_STATS_SQL = """
+SELECT
+    contractName,
+    sum_pq/NULLIF(sum_q,0.0) AS aof,
+    trade_count,
+    first_trade,
+    last_trade
+FROM contract_stats
+WHERE day = ?
+"""
+
+# push.py'nin gün penceresini yeniden başlatmada tohumlamak için ham toplamlar
+DAY_TOTALS_SQL = """
+SELECT
+    contractName,
+    sum_pq,
+    sum_q,
+    trade_count,
+    last_trade
+FROM contract_stats
+WHERE day = ?
+"""
+
+# Kontratlar önceki gün de işlem görebilir: en son işlem günündeki satır
+# (SQLite'ta MAX() ile seçilen satırın diğer kolonları da o satırdan gelir)
+LAST_TRADES_SQL = """
+SELECT
+    contractName,
+    last_price AS last_trade,
+    last_quantity,
+    MAX(last_trade) AS trade_time
+FROM contract_stats
+WHERE day >= ?
+GROUP BY contractName
+"""
+
+FLOW_SQL = """
+SELECT
+    contractName,
+    SUM(quantity) AS flow_15m,
+    COUNT(*) as trade_count_15m,
+    MIN(price) as min_price_15m,
+    MAX(price) as max_price_15m
+FROM trades
+WHERE time >= ?
+GROUP BY +contractName  -- '+': planlayıcı GROUP BY için UNIQUE indeksi taramasın
+"""
+
+RECENT_TRADES_SQL = """
+SELECT
+    contractName,
+    time,
+    price,
+    quantity,
+    aof_1h
+FROM trades
+WHERE time >= ?
+ORDER BY time DESC
+LIMIT ?
+"""
+
+# Kayan pencere AOF'u (api.py /aof?window=5m|15m|1h)
+AOF_WINDOW_SQL = """
+SELECT
+    contractName,
+    SUM(price*quantity)/NULLIF(SUM(quantity),0.0) AS aof,
+    SUM(quantity) AS volume,
+    COUNT(*) AS trade_count
+FROM trades
+WHERE time >= ?
+GROUP BY +contractName
+"""
+
+# Tek kontratın işlemleri, yeniden eskiye; (time, id) anahtarıyla sayfalama (OFFSET yok)
+CONTRACT_TRADES_SQL = """
+SELECT
+    id,
+    time,
+    price,
+    quantity
+FROM trades
+WHERE contractName = ? AND time >= ? AND (time < ? OR (time = ? AND id < ?))
+ORDER BY time DESC, id DESC
+LIMIT ?
+"""
+# İlk sayfa için "imleç": tüm gerçek kayıtlardan büyük
+FIRST_PAGE = ("9999-12-31T23:59:59", 2 ** 63 - 1)
+
+# contract_stats olmayan eski DB'ler için (trades üzerinden)
+LEGACY_DAILY_STATS_SQL = """
+SELECT
+    contractName,
+    SUM(price*quantity)/NULLIF(SUM(quantity),0.0) AS aof,
+    COUNT(*) as trade_count,
+    MIN(time) as first_trade,
+    MAX(time) as last_trade
+FROM trades
+WHERE time >= ? AND time < ?
+GROUP BY contractName
+"""
+
+LEGACY_LAST_TRADES_SQL = """
+SELECT
+    t.contractName,
+    t.price AS last_trade,
+    t.quantity as last_quantity,
+    t.time as trade_time
+FROM trades t
+JOIN (
+    SELECT contractName, MAX(time) mt
+    FROM trades
+    WHERE time >= ?
+    GROUP BY contractName
+) x ON x.contractName=t.contractName AND x.mt=t.time
+"""
+
+# ------------ OKUMA ------------
+def daily_stats(con, day: date = None) -> pd.DataFrame:
+    day = day or datetime.now().date()
+    try:
+        return pd.read_sql_query(DAILY_STATS_SQL, con, params=(day.isoformat(),))
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return pd.read_sql_query(LEGACY_DAILY_STATS_SQL, con, params=day_bounds(day))
+
+def day_totals(con, day: date = None) -> pd.DataFrame:
+    """Günün kontrat başına sum_pq / sum_q toplamları; AOF = sum_pq / sum_q (daily_stats ile aynı)."""
+    return pd.read_sql_query(DAY_TOTALS_SQL, con, params=((day or datetime.now().date()).isoformat(),))
+
+def last_trades(con, day: date = None) -> pd.DataFrame:
+    since = ((day or datetime.now().date()) - timedelta(days=1)).isoformat()
+    try:
+        return pd.read_sql_query(LAST_TRADES_SQL, con, params=(since,))
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return pd.read_sql_query(LEGACY_LAST_TRADES_SQL, con, params=(since,))
+
+def flow(con, minutes: int = 15, now: datetime = None) -> pd.DataFrame:
+    return pd.read_sql_query(FLOW_SQL, con, params=(since_iso(minutes * 60, now),))
+
+def recent_trades(con, seconds: int = 60, limit: int = 200, now: datetime = None) -> pd.DataFrame:
+    return pd.read_sql_query(RECENT_TRADES_SQL, con, params=(since_iso(seconds, now), int(limit)))
+
+def aof_window(con, seconds: float = None, now: datetime = None) -> pd.DataFrame:
+    """seconds=None -> bugünün AOF'u (dashboard'daki AOF kolonu), aksi halde son `seconds` sn."""
+    if seconds is None:
+        return daily_stats(con, (now or datetime.now()).date())
+    return pd.read_sql_query(AOF_WINDOW_SQL, con, params=(since_iso(seconds, now),))
+
+def contract_trades(con, contract: str, since: str, before=FIRST_PAGE, limit: int = 500) -> pd.DataFrame:
+    """before=(time, id): bir önceki sayfanın son satırı."""
+    t, i = before
+    return pd.read_sql_query(CONTRACT_TRADES_SQL, con, params=(contract, since, t, t, int(i), int(limit)))
+
+# ------------ PLAN KONTROLÜ ------------
+# Dashboard'un her yenilemede (ve api.py'nin) çalıştırdığı sorgular ve örnek parametreleri
+DASHBOARD_QUERIES = {
+    "daily_stats": (DAILY_STATS_SQL, ("2025-01-01",)),
+    "last_trades": (LAST_TRADES_SQL, ("2025-01-01",)),
+    "flow": (FLOW_SQL, ("2025-01-01T00:00:00",)),
+    "recent_trades": (RECENT_TRADES_SQL, ("2025-01-01T00:00:00", 200)),
+    # api.py
+    "aof_window": (AOF_WINDOW_SQL, ("2025-01-01T00:00:00",)),
+    "contract_trades": (CONTRACT_TRADES_SQL, ("PH25010110", "2025-01-01", FIRST_PAGE[0],
+                                              FIRST_PAGE[0], FIRST_PAGE[1], 500)),
+    # push.py (başlangıçta bir kez)
+    "day_totals": (DAY_TOTALS_SQL, ("2025-01-01",)),
+}
+
+def query_plan(con, sql: str, params=()) -> list:
+    return [row[-1] for row in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+def check_plans(con, queries: dict = None) -> dict:
+    """{ad: [SCAN satırları]} -- boş sözlük her sorgunun indeksle aradığı anlamına gelir."""
+    bad = {}
+    for name, (sql, params) in (queries or DASHBOARD_QUERIES).items():
+        scans = [d for d in query_plan(con, sql, params) if d.startswith("SCAN")]
+        if scans:
+            bad[name] = scans
+    return bad
+
+if __name__ == "__main__":
+    # python queries.py            -> boş bellek içi şema üzerinde
+    # python queries.py data/gip_live.db
+    from tradehistory import _apply_schema
+    con = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else ":memory:")
+    _apply_schema(con)
+    for name, (sql, params) in DASHBOARD_QUERIES.items():
+        print(f"{name}:")
+        for detail in query_plan(con, sql, params):
+            print(f"    {detail}")
+    bad = check_plans(con)
+    if bad:
+        print(f"Tablo taraması: {bad}")
+        sys.exit(1)
+    print("OK: tüm dashboard / API sorguları indeks kullanıyor")
@@ -0,0 +1,196 @@
+# render.py - Kontrat tablosunun vektörel HTML üretimi
+#
+# Kontrat adları bir kez kapanış zamanına çevrilir; kalan süre / ilerleme NumPy ile
+# tüm satırlar için birlikte hesaplanır. Satır HTML'i şablondan üretilir ve girdileri
+# aynı kalan satırlar (süreç genelinde, oturumlar arası) önbellekten yeniden kullanılır.
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from contracts import get_contract
+
+ROW_CACHE_MAX = 4096
+
+_SEC = np.timedelta64(1, "s")
+
+# ------------ KONTRAT ZAMANLARI ------------
+def contract_cutoffs(names) -> np.ndarray:
+    """Kontrat adları -> datetime64[ns] kapı kapanışı dizisi; çözülemeyen ad NaT (bkz. contracts.py)."""
+    out = []
+    for cn in names:
+        c = get_contract(str(cn))
+        out.append(c.gate_closure if c is not None and c.gate_closure is not None else None)
+    return np.array(out, dtype="datetime64[ns]")
+
+def remaining(cutoffs: np.ndarray, now: datetime = None):
+    """
+    Kalan süre etiketi, gün içi ilerleme yüzdesi ve bar sınıfı (eski hücre fonksiyonlarıyla aynı kurallar).
+    Dönüş: (label listesi, pct int64 dizisi, bar listesi)
+    """
+    now64 = np.datetime64(now or datetime.now(), "ns")
+    co = cutoffs
+    is_open = ~np.isnat(co) & (now64 < co)
+
+    day0 = co.astype("datetime64[D]").astype("datetime64[ns]")
+    total = (co - day0) / _SEC
+    elapsed = (now64 - day0) / _SEC
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = np.where(total > 0, np.clip(elapsed / total * 100, 0, 100), 0)
+    pct = np.where(is_open, np.nan_to_num(pct), 100).astype(np.int64)
+    rem = np.where(is_open, (co - now64) / _SEC, 0.0)
+    hh = (rem // 3600).astype(np.int64)
+    mm = ((rem % 3600) // 60).astype(np.int64)
+
+    label = [("Kapalı" if not o else f"{h}sa {m}dk kaldı" if h > 0 else f"{m}dk kaldı")
+             for o, h, m in zip(is_open.tolist(), hh.tolist(), mm.tolist())]
+    bar = np.where(is_open, np.where(rem > 3600, "bar-green", "bar-orange"), "bar-black").tolist()
+    return label, pct, bar
+
+def open_mask(names: pd.Series, now: datetime = None) -> np.ndarray:
+    """Kapı kapanışı henüz gelmemiş kontratlar (show_closed=False filtresi)."""
+    co = contract_cutoffs(names)
+    return ~np.isnat(co) & (np.datetime64(now or datetime.now(), "ns") <= co)
+
+# ------------ HÜCRE BİÇİMLERİ ------------
+PTF_STYLE = "background-color: #dc3545; color: white; padding: 2px 6px; border-radius: 3px; font-weight: bold;"
+MIN_STYLE = "background-color: #28a745; color: white; padding: 2px 6px; border-radius: 3px; font-weight: bold;"
+MAX_STYLE = "background-color: #fd7e14; color: white; padding: 2px 6px; border-radius: 3px; font-weight: bold;"
+
+def _num(values: pd.Series) -> np.ndarray:
+    try:
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    except (TypeError, ValueError):
+        return pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+
+def _fixed(values: np.ndarray, fmt: str) -> list:
+    return ["-" if v != v else fmt % v for v in values.tolist()]
+
+def _plain_floats(values: np.ndarray) -> list:
+    """DataFrame.to_html'in float kolon biçimi: ortak ondalık sayısı (en az 1, en çok 6)."""
+    finite = values[np.isfinite(values)]
+    decimals = 1
+    for d in range(1, 7):
+        decimals = d
+        if finite.size == 0 or np.all(np.round(finite, d) == finite):
+            break
+    fmt = f"%.{decimals}f"
+    return ["NaN" if v != v else fmt % v for v in values.tolist()]
+
+def _flags(values: pd.Series) -> list:
+    out = []
+    for v in values.tolist():
+        if v is None or (isinstance(v, float) and v != v):
+            out.append(None)
+        else:
+            out.append(bool(v))
+    return out
+
+# ------------ SATIR ŞABLONU ------------
+_ROW_CACHE = OrderedDict()
+_ROW_LOCK = threading.Lock()
+
+def _gap_cell(g: str, neg: bool) -> str:
+    if g == "-":
+        return "-"
+    return f"<span class='gap-neg'>{g}</span>" if neg else f"<span class='gap-pos'>{g}</span>"
+
+def _flag_cell(flag) -> str:
+    if flag is None:
+        return "-"
+    return "<span class='yes'>✅</span>" if flag else "<span class='no'>✖</span>"
+
+def _render_row(key: tuple) -> str:
+    (cn, label, pct, bar, ptf, aof, aof_gt, gap, gap_neg, last, last_gap, last_gap_neg,
+     last_gt, min_p, max_p, has_gap, has_last) = key
+    cells = [
+        f"<div class='cnwrap'><div class='cnhead'><span class='cnname'>{cn}</span>"
+        f"<span class='cntimer'>{label}</span></div><div class='barwrap'>"
+        f"<div class='barfill {bar}' style='width:{pct}%'></div></div></div>",
+        "-" if ptf == "-" else f"<span style='{PTF_STYLE}'>{ptf}</span>",
+        aof,
+    ]
+    if has_gap:
+        cells += [_flag_cell(aof_gt), _gap_cell(gap, gap_neg)]
+    if has_last:
+        cells += [last, _gap_cell(last_gap, last_gap_neg), _flag_cell(last_gt)]
+    if min_p is not None:
+        cells.append("-" if min_p == "-" else f"<span style='{MIN_STYLE}'>{min_p}</span>")
+    if max_p is not None:
+        cells.append("-" if max_p == "-" else f"<span style='{MAX_STYLE}'>{max_p}</span>")
+    return "    <tr>\n" + "".join(f"      <td>{c}</td>\n" for c in cells) + "    </tr>\n"
+
+def _row_html(key: tuple) -> str:
+    with _ROW_LOCK:
+        html = _ROW_CACHE.get(key)
+        if html is not None:
+            _ROW_CACHE.move_to_end(key)
+            return html
+    html = _render_row(key)
+    with _ROW_LOCK:
+        _ROW_CACHE[key] = html
+        if len(_ROW_CACHE) > ROW_CACHE_MAX:
+            _ROW_CACHE.popitem(last=False)
+    return html
+
+# ------------ TABLO ------------
+def render_contract_table(dash: pd.DataFrame, now: datetime = None) -> str:
+    """
+    dash (kontrat başına tek satır, PTF_show/aof_show/gap/... kolonları) -> HTML tablo.
+    Kolon düzeni ve biçimler eski Series.apply + DataFrame.to_html çıktısıyla aynıdır.
+    """
+    n = len(dash)
+    names = dash["contractName"].astype(str).tolist()
+    label, pct, bar = remaining(contract_cutoffs(names), now)
+
+    ptf = _fixed(_num(dash["PTF_show"]), "%.2f")
+    aof = _fixed(_num(dash["aof_show"]), "%.2f")
+    has_gap = "gap" in dash.columns
+    has_last = "last_effective" in dash.columns
+    has_min = "minPrice" in dash.columns and "maxPrice" in dash.columns
+
+    headers = ["Kontrat", "PTF", "AOF"]
+    if has_gap:
+        gap_v = _num(dash["gap"])
+        gap, gap_neg = _fixed(gap_v, "%.0f"), (gap_v < 0).tolist()
+        aof_gt = _flags(dash["aof_gt"])
+        headers += ["AOF > PTF", "GAP"]
+    else:
+        gap, gap_neg, aof_gt = [None] * n, [False] * n, [None] * n
+    if has_last:
+        last = _plain_floats(_num(dash["last_effective"]))
+        lgap_v = _num(dash["last_gap"])
+        last_gap, last_gap_neg = _fixed(lgap_v, "%.0f"), (lgap_v < 0).tolist()
+        last_gt = _flags(dash["last_gt"])
+        headers += ["Son Eşleşme", "Son Eşleşme GAP", "Son Eşleşme > PTF"]
+    else:
+        last, last_gap, last_gap_neg, last_gt = [None] * n, [None] * n, [False] * n, [None] * n
+    if has_min:
+        # 0 da "-" gösterilir
+        min_v, max_v = _num(dash["minPrice"]), _num(dash["maxPrice"])
+        min_p = _fixed(np.where(min_v == 0, np.nan, min_v), "%.2f")
+        max_p = _fixed(np.where(max_v == 0, np.nan, max_v), "%.2f")
+        headers += ["Min Fiyat", "Max Fiyat"]
+    else:
+        min_p = max_p = [None] * n
+
+    rows = [
+        _row_html((cn, lb, pc, br, pt, ao, ag, gp, gn, ls, lg, lgn, lt, mn, mx,
+                   has_gap, has_last))
+        for cn, lb, pc, br, pt, ao, ag, gp, gn, ls, lg, lgn, lt, mn, mx in zip(
+            names, label, pct.tolist(), bar, ptf, aof, aof_gt, gap, gap_neg,
+            last, last_gap, last_gap_neg, last_gt, min_p, max_p)
+    ]
+    head = "".join(f"      <th>{h}</th>\n" for h in headers)
+    return ('<table border="1" class="dataframe">\n'
+            '  <thead>\n'
+            '    <tr style="text-align: right;">\n'
+            f'{head}'
+            '    </tr>\n'
+            '  </thead>\n'
+            '  <tbody>\n'
+            f'{"".join(rows)}'
+            '  </tbody>\n'
+            '</table>')
@@ -0,0 +1,175 @@
+# rolling.py - Kontrat bazlı kayan pencere akümülatörleri (AOF / hacim / adet)
+#
+# Her işlem O(1) amortize maliyetle eklenir: deque'nin sağına konur, toplamlar
+# güncellenir, pencereden çıkanlar soldan atılıp toplamlardan düşülür.
+# Zaman damgaları saniye cinsinden epoch (float). Saat dilimsiz zamanlar UTC gibi
+# çevrilmelidir (calendar.timegm / naive pd.Timestamp.timestamp()); böylece
+# `ts // 86400` duvar saatindeki günü verir.
+from collections import deque
+
+# Varsayılan pencereler (saniye); "day" takvim günü bazında sıfırlanır
+WINDOWS = {"5m": 300, "15m": 900, "1h": 3600, "day": None}
+
+
+class RollingWindow:
+    """Son `span` saniyedeki işlemler için hareketli toplamlar."""
+    __slots__ = ("span", "_items", "sum_pq", "sum_q", "count", "last_ts")
+
+    def __init__(self, span: float):
+        self.span = float(span)
+        self._items = deque()
+        self.sum_pq = 0.0
+        self.sum_q = 0.0
+        self.count = 0
+        self.last_ts = None
+
+    def add(self, ts: float, price: float, qty: float):
+        self._items.append((ts, price, qty))
+        self.sum_pq += price * qty
+        self.sum_q += qty
+        self.count += 1
+        # Sıra dışı (geç gelen) işlemler pencereyi geri sarmaz
+        if self.last_ts is None or ts > self.last_ts:
+            self.last_ts = ts
+        self.evict(self.last_ts)
+
+    def evict(self, now: float):
+        cutoff = now - self.span
+        items = self._items
+        while items and items[0][0] < cutoff:
+            _, p, q = items.popleft()
+            self.sum_pq -= p * q
+            self.sum_q -= q
+            self.count -= 1
+        if not items:
+            # Kayan nokta birikimini sıfırla
+            self.sum_pq = self.sum_q = 0.0
+
+    @property
+    def aof(self):
+        return (self.sum_pq / self.sum_q) if self.sum_q else None
+
+    @property
+    def volume(self) -> float:
+        return self.sum_q
+
+
+class DayWindow:
+    """Takvim günü boyunca biriken toplamlar; gün değişince sıfırlanır."""
+    __slots__ = ("day", "sum_pq", "sum_q", "count", "last_ts")
+
+    def __init__(self):
+        self.day = None
+        self.sum_pq = 0.0
+        self.sum_q = 0.0
+        self.count = 0
+        self.last_ts = None
+
+    def add(self, ts: float, price: float, qty: float):
+        day = int(ts // 86400)
+        if self.day is None or day > self.day:
+            self.day = day
+            self.sum_pq = self.sum_q = 0.0
+            self.count = 0
+        elif day < self.day:
+            return  # önceki güne ait geç işlem
+        self.sum_pq += price * qty
+        self.sum_q += qty
+        self.count += 1
+        if self.last_ts is None or ts > self.last_ts:
+            self.last_ts = ts
+
+    def seed(self, day: int, sum_pq: float, sum_q: float, count: int, last_ts: float = None):
+        """Günün önceden biriken toplamlarıyla başlat (örn. yeniden başlatmada DB'den)."""
+        self.day = day
+        self.sum_pq = float(sum_pq)
+        self.sum_q = float(sum_q)
+        self.count = int(count)
+        self.last_ts = last_ts
+
+    def evict(self, now: float):
+        if self.day is not None and int(now // 86400) > self.day:
+            self.day = None
+            self.sum_pq = self.sum_q = 0.0
+            self.count = 0
+
+    @property
+    def aof(self):
+        return (self.sum_pq / self.sum_q) if self.sum_q else None
+
+    @property
+    def volume(self) -> float:
+        return self.sum_q
+
+
+class ContractWindows:
+    """Bir kontrat için aynı anda birden çok pencere."""
+    __slots__ = ("windows",)
+
+    def __init__(self, spans: dict = None):
+        spans = WINDOWS if spans is None else spans
+        self.windows = {name: (DayWindow() if span is None else RollingWindow(span))
+                        for name, span in spans.items()}
+
+    def add(self, ts: float, price: float, qty: float):
+        for w in self.windows.values():
+            w.add(ts, price, qty)
+
+    def evict(self, now: float):
+        for w in self.windows.values():
+            w.evict(now)
+
+    def aof(self, name: str):
+        return self.windows[name].aof
+
+    def snapshot(self) -> dict:
+        """{pencere: {"aof", "volume", "count"}}"""
+        return {name: {"aof": w.aof, "volume": w.volume, "count": w.count}
+                for name, w in self.windows.items()}
+
+
+class RollingStats:
+    """Tüm kontratlar için kayan pencereler: {contractName: ContractWindows}"""
+
+    def __init__(self, spans: dict = None):
+        self.spans = WINDOWS if spans is None else spans
+        self._by_contract = {}
+
+    def add(self, contract: str, ts: float, price: float, qty: float) -> ContractWindows:
+        cw = self._by_contract.get(contract)
+        if cw is None:
+            cw = ContractWindows(self.spans)
+            self._by_contract[contract] = cw
+        cw.add(ts, price, qty)
+        return cw
+
+    def seed_day(self, contract: str, day: int, sum_pq: float, sum_q: float, count: int,
+                 last_ts: float = None) -> ContractWindows:
+        """Kontratın "day" penceresini hazır toplamlarla doldurur (day = epoch gün numarası)."""
+        cw = self._by_contract.get(contract)
+        if cw is None:
+            cw = ContractWindows(self.spans)
+            self._by_contract[contract] = cw
+        cw.windows["day"].seed(day, sum_pq, sum_q, count, last_ts)
+        return cw
+
+    def add_many(self, rows):
+        """(contract, ts, price, qty) dizisi; örn. dashboard'da DB'den okunan işlemler."""
+        for contract, ts, price, qty in rows:
+            self.add(contract, ts, price, qty)
+
+    def get(self, contract: str):
+        return self._by_contract.get(contract)
+
+    def evict(self, now: float):
+        for cw in self._by_contract.values():
+            cw.evict(now)
+
+    def snapshot(self) -> dict:
+        return {cn: cw.snapshot() for cn, cw in self._by_contract.items()}
+
+    def __contains__(self, contract):
+        return contract in self._by_contract
+
+    def __len__(self):
+        return len(self._by_contract)
@@ -0,0 +1,250 @@
+# snapshot.py - Tüm dashboard oturumlarının paylaştığı veri anlık görüntüsü
+#
+# Streamlit her sekme için scripti saniyede bir baştan çalıştırır. Board okuma,
+# trade sorguları ve kontrat bazlı birleştirme burada süreç başına TEK arka plan
+# thread'inde sabit aralıkla yapılır; oturumlar yalnızca hazır Snapshot'ı alıp
+# kendi filtrelerini uygular ve çizer. Modül sys.modules'ta kaldığı için
+# get_service() tüm oturumlara aynı nesneyi döndürür.
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+import queries
+from boardstore import load_board, price_range
+from utils import BOARDINFO_BACKEND, BOARDINFO_CSV, get_db_path
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.getenv("DB_PATH", os.path.join(ROOT, "data", "gip_live.db"))
+SNAPSHOT_INTERVAL_SEC = float(os.getenv("SNAPSHOT_INTERVAL_SEC", "1.0"))
+SNAPSHOT_BOARD_ROWS = int(os.getenv("SNAPSHOT_BOARD_ROWS", "1000"))
+# Veri değişmese de kayan pencereler (15dk akış, son 60 sn, bugün) için en geç bu kadar sürede yeniden üret
+SNAPSHOT_MAX_AGE_SEC = float(os.getenv("SNAPSHOT_MAX_AGE_SEC", "10"))
+
+
+class Snapshot:
+    """
+    Tek bir yenilemenin sonucu. Oturumlar arasında paylaşılır: DataFrame'ler
+    değiştirilmemeli, gerekiyorsa .copy() alınmalı.
+    """
+    __slots__ = ("version", "fingerprint", "data_changed_at", "built_at", "build_ms", "df_board",
+                 "aof_df", "last_df", "flow15_df", "last_min_df", "dash", "last_csv_time",
+                 "last_db_snap", "errors")
+
+    def __init__(self, version: int, built_at: datetime, build_ms: float, df_board, aof_df,
+                 last_df, flow15_df, last_min_df, dash, last_csv_time, last_db_snap, errors,
+                 fingerprint=None, data_changed_at: float = None):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.data_changed_at = data_changed_at if data_changed_at is not None else time.time()
+        self.built_at = built_at
+        self.build_ms = build_ms
+        self.df_board = df_board
+        self.aof_df = aof_df
+        self.last_df = last_df
+        self.flow15_df = flow15_df
+        self.last_min_df = last_min_df
+        self.dash = dash
+        self.last_csv_time = last_csv_time
+        self.last_db_snap = last_db_snap
+        self.errors = errors
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"Snapshot salt okunur: {name}")
+        object.__setattr__(self, name, value)
+
+
+# ------------ DATA VERSION ------------
+def _stat_key(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+def data_fingerprint(db_path: str = DB_PATH) -> tuple:
+    """
+    Ucuz veri sürümü: yalnızca os.stat. WAL modunda her commit -wal dosyasının
+    boyutunu/mtime'ını değiştirir; checkpoint ana dosyayı değiştirir.
+    """
+    paths = [db_path, db_path + "-wal"]
+    if BOARDINFO_BACKEND == "sqlite":
+        board_db = get_db_path()
+        paths += [board_db, board_db + "-wal"]
+    else:
+        paths.append(BOARDINFO_CSV)
+    return tuple(_stat_key(p) for p in paths)
+
+
+# ------------ BUILD ------------
+def build_dash(df_board: pd.DataFrame, aof_df: pd.DataFrame, last_df: pd.DataFrame) -> pd.DataFrame:
+    """Kontrat başına son board satırı + gerçek işlemlerden AOF / son eşleşme ve GAP'ler."""
+    if df_board.empty:
+        return pd.DataFrame(columns=['contractName'])
+
+    # Get latest data for each contract FIRST
+    latest_data = df_board.sort_values('time').groupby('contractName').last().reset_index()
+
+    dash = latest_data.copy()
+
+    # Convert main metrics
+    dash['PTF_show'] = pd.to_numeric(dash['mcp'], errors='coerce')
+
+    # Use real trade data for AOF and last trade instead of board info
+    if not aof_df.empty:
+        aof_dict = aof_df.set_index('contractName')['aof'].to_dict()
+        dash['aof_show'] = dash['contractName'].map(aof_dict).fillna(0)
+    else:
+        dash['aof_show'] = pd.to_numeric(dash['averagePrice'], errors='coerce')  # Fallback to board data
+
+    if not last_df.empty:
+        last_dict = last_df.set_index('contractName')['last_trade'].to_dict()
+        dash['last_effective'] = dash['contractName'].map(last_dict).fillna(0)
+    else:
+        dash['last_effective'] = pd.to_numeric(dash['lastPrice'], errors='coerce')  # Fallback to board data
+
+    # Calculate gaps with proper float conversion
+    dash['gap'] = (dash['aof_show'] - dash['PTF_show']).fillna(0)
+    dash['last_gap'] = (dash['last_effective'] - dash['PTF_show']).fillna(0)
+
+    # Calculate comparison indicators safely
+    dash['aof_gt'] = (pd.to_numeric(dash['aof_show'], errors='coerce') > pd.to_numeric(dash['PTF_show'], errors='coerce')).fillna(False)
+    dash['last_gt'] = (pd.to_numeric(dash['last_effective'], errors='coerce') > pd.to_numeric(dash['PTF_show'], errors='coerce')).fillna(False)
+
+    # Min/Max Fiyat: board geçmişindeki bant içi fiyatlardan; bant içi fiyatı olmayan
+    # kontrat board'daki son minPrice/maxPrice'ı korur
+    if "minPrice" in dash.columns and "maxPrice" in dash.columns:
+        rng = price_range(df_board)
+        dash = dash.merge(rng, on='contractName', how='left', suffixes=('', '_band'))
+        dash['minPrice'] = dash['minPrice_band'].fillna(dash['minPrice'])
+        dash['maxPrice'] = dash['maxPrice_band'].fillna(dash['maxPrice'])
+        dash = dash.drop(columns=['minPrice_band', 'maxPrice_band'])
+    return dash
+
+
+def build_snapshot(version: int = 0, db_path: str = DB_PATH, fingerprint=None,
+                   data_changed_at: float = None) -> Snapshot:
+    t0 = time.perf_counter()
+    errors = {}
+
+    df_board = pd.DataFrame()
+    last_csv_time = None
+    try:
+        df_board = load_board(max_rows=SNAPSHOT_BOARD_ROWS)
+        if "time" in df_board.columns:
+            valid_times = df_board["time"].dropna()
+            if not valid_times.empty:
+                last_csv_time = valid_times.max()
+    except Exception as e:
+        errors["board"] = f"Board okuma hatası: {e}"
+        df_board = pd.DataFrame()
+
+    aof_df = last_df = flow15_df = last_min_df = pd.DataFrame()
+    last_db_snap = None
+    try:
+        with sqlite3.connect(db_path) as con:
+            aof_df = queries.daily_stats(con)
+            last_df = queries.last_trades(con)
+            flow15_df = queries.flow(con, minutes=15)
+            last_min_df = queries.recent_trades(con, seconds=60, limit=200)
+            last_db_snap = datetime.now()
+    except Exception as e:
+        errors["trades"] = f"Error loading trade data: {str(e)}"
+
+    dash = build_dash(df_board, aof_df, last_df)
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    return Snapshot(version, datetime.now(), build_ms, df_board, aof_df, last_df, flow15_df,
+                    last_min_df, dash, last_csv_time, last_db_snap, errors,
+                    fingerprint=fingerprint, data_changed_at=data_changed_at)
+
+
+# ------------ SERVICE ------------
+class SnapshotService:
+    """
+    Süreç başına tek yenileyici thread; current() her zaman en son Snapshot'ı verir.
+    Her turda önce data_fingerprint() bakılır; değişmediyse ve görüntü SNAPSHOT_MAX_AGE_SEC'ten
+    genç ise yeniden üretilmez (version aynı kalır).
+    """
+
+    def __init__(self, interval: float = SNAPSHOT_INTERVAL_SEC, db_path: str = DB_PATH,
+                 max_age: float = SNAPSHOT_MAX_AGE_SEC):
+        self.interval = interval
+        self.db_path = db_path
+        self.max_age = max_age
+        self._snap = None
+        self._version = 0
+        self._built_mono = 0.0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self.skipped = 0
+
+    def _refresh(self, force: bool = False):
+        fp = data_fingerprint(self.db_path)
+        prev = self._snap
+        if (not force and prev is not None and fp == prev.fingerprint
+                and time.monotonic() - self._built_mono < self.max_age):
+            self.skipped += 1
+            return prev
+        with self._lock:
+            self._version += 1
+            version = self._version
+        changed_at = prev.data_changed_at if (prev is not None and fp == prev.fingerprint) else None
+        t_mono = time.monotonic()
+        snap = build_snapshot(version, self.db_path, fingerprint=fp, data_changed_at=changed_at)
+        self._built_mono = t_mono
+        self._snap = snap  # tek referans ataması; okuyucular kilitsiz alır
+        self._ready.set()
+        return snap
+
+    def idle_seconds(self) -> float:
+        """Son veri değişikliğinden bu yana geçen süre (dashboard yenileme aralığı için)."""
+        snap = self._snap
+        return (time.time() - snap.data_changed_at) if snap is not None else 0.0
+
+    def _run(self):
+        while True:
+            t0 = time.monotonic()
+            try:
+                self._refresh()
+            except Exception as e:
+                logging.error(f"Snapshot yenileme hatası: {e}")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - t0)))
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="dash-snapshot", daemon=True)
+            self._thread.start()
+
+    def current(self, timeout: float = 30.0) -> Snapshot:
+        """En son Snapshot; ilk çağrıda ilk yenileme bitene kadar bekler."""
+        if self._thread is None:
+            self.start()
+        snap = self._snap
+        if snap is None:
+            self._ready.wait(timeout)
+            snap = self._snap
+        if snap is None:
+            # Arka plan henüz üretemedi: bu oturum için senkron üret
+            snap = build_snapshot(0, self.db_path)
+        return snap
+
+
+_SERVICES = {}
+_SERVICES_LOCK = threading.Lock()
+
+
+def get_service(db_path: str = DB_PATH) -> SnapshotService:
+    with _SERVICES_LOCK:
+        svc = _SERVICES.get(db_path)
+        if svc is None:
+            svc = SnapshotService(db_path=db_path)
+            _SERVICES[db_path] = svc
+        return svc
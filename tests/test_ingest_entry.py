@@ -0,0 +1,76 @@
+# `python ingest.py` giriş noktası: betik `__main__` olarak yüklenirken alerts/push
+# listener'larını `ingest` modülüne kaydeder. Dispatch de aynı modülden yapılmalı,
+# yoksa listener'lar hiç çağrılmaz. WS ve disk sahte; giriş noktası gerçek.
+import json
+import runpy
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+BOARD_MSG = {
+    "eventType": "ContractBoardMessage",
+    "body": {"name": "PH26101722",
+             "boardInformation": {"mcp": 2000.0, "averagePrice": 2001.5, "lastPrice": 2010.0}},
+}
+
+
+class _Stop(BaseException):
+    """run_forever'ın sonsuz döngüsünden çıkış (except Exception yakalamaz)."""
+
+
+class FakeWebSocketApp:
+    def __init__(self, url, on_open=None, on_message=None, on_error=None, on_close=None):
+        self.on_open = on_open
+        self.on_message = on_message
+
+    def run_forever(self, **kwargs):
+        self.on_open(self)
+        self.on_message(self, json.dumps(BOARD_MSG))
+        raise _Stop
+
+
+def test_entry_point_dispatch_reaches_push_listener(monkeypatch, tmp_path):
+    # gunici_veri import sırasında çalışma dizinine log/klasör yazar
+    monkeypatch.chdir(tmp_path)
+    import websocket
+    import utils
+    import ingest
+    import alerts
+    import backfill
+    import gunici_veri
+    import push
+    import tradehistory
+
+    handled = []
+    monkeypatch.setattr(ingest, "HANDLERS", {})
+    monkeypatch.setattr(ingest, "LISTENERS", {})
+    monkeypatch.setattr(ingest, "GAP_HOOKS", [])
+    for mod in (utils, ingest):
+        monkeypatch.setattr(mod, "setup_logger", lambda *a, **k: None)
+        monkeypatch.setattr(mod, "get_fresh_ws_url", lambda channels: "ws://test")
+    monkeypatch.setattr(websocket, "WebSocketApp", FakeWebSocketApp)
+    monkeypatch.setattr(gunici_veri, "handle_board", handled.append)
+    monkeypatch.setattr(tradehistory, "handle_trade", handled.append)
+    monkeypatch.setattr(tradehistory, "ensure_db", lambda reset=False: None)
+    monkeypatch.setattr(backfill, "schedule", lambda *a, **k: None)
+    monkeypatch.setattr(alerts, "ALERT_ENGINE", False)
+    monkeypatch.setattr(push, "PUSH_ENABLED", True)
+    monkeypatch.setattr(push, "DB_PATH", str(tmp_path / "gip_live.db"))
+    monkeypatch.setattr(push, "serve", lambda feed, host=None, port=None: object())
+    monkeypatch.setitem(push._FEED, "feed", None)
+    monkeypatch.setitem(push._FEED, "server", None)
+
+    with pytest.raises(_Stop):
+        runpy.run_path(str(ROOT / "ingest.py"), run_name="__main__")
+
+    feed = push.get_feed()
+    deadline = time.monotonic() + 5
+    while "PH26101722" not in feed.state and time.monotonic() < deadline:
+        time.sleep(0.01)  # dispatch worker thread'inde
+    assert handled and handled[0]["eventType"] == "ContractBoardMessage"
+    assert feed.state["PH26101722"]["ptf"] == 2000.0
+    assert feed.state["PH26101722"]["last"] == 2010.0
+    assert feed.state["PH26101722"]["aof"] == 2001.5
@@ -0,0 +1,110 @@
+# Ingest gün ortasında yeniden başlarsa SSE akışının gün AOF'u, dashboard'un
+# contract_stats'tan okuduğu AOF'la (queries.daily_stats) aynı kalmalı.
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import ingest
+import push
+import queries
+from tradehistory import INSERT_TRADE_SQL, _apply_schema
+
+TODAY = datetime.now().date()
+YESTERDAY = TODAY - timedelta(days=1)
+CN = "PH26101722"
+
+# Önceki çalışmadan kalan işlemler: (kontrat, zaman, fiyat, miktar)
+EXISTING = [
+    (CN, f"{TODAY}T00:05:00", 2000.0, 10.0),
+    (CN, f"{TODAY}T00:06:30", 2012.5, 3.0),
+    (CN, f"{TODAY}T00:07:00", 1995.25, 7.5),
+    ("PH26101723", f"{TODAY}T00:08:00", 2100.0, 1.0),
+    ("PH26101701", f"{YESTERDAY}T23:00:00", 1800.0, 2.0),
+]
+
+
+def insert(con, cn, time, price, qty):
+    con.execute(INSERT_TRADE_SQL, (cn, time, price, qty, None, time, None))
+    con.commit()
+
+
+def daily_aof(con, cn):
+    df = queries.daily_stats(con, TODAY)
+    return round(float(df.set_index("contractName").loc[cn, "aof"]), 2)
+
+
+def trade_msg(cn, time, price, qty):
+    return {"eventType": "TradeHistoryChannel",
+            "body": {"contractName": cn, "time": time, "price": price, "quantity": qty}}
+
+
+def board_msg(cn, mcp, avg, last):
+    return {"eventType": "ContractBoardMessage",
+            "body": {"name": cn, "boardInformation": {"mcp": mcp, "averagePrice": avg, "lastPrice": last}}}
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "gip_live.db"
+    con = sqlite3.connect(path)
+    _apply_schema(con)
+    for row in EXISTING:
+        insert(con, *row)
+    yield path, con
+    con.close()
+
+
+@pytest.fixture
+def feed(db, monkeypatch):
+    """Yeniden başlayan ingest: yeni ContractFeed, install() ile DB'den tohumlanır."""
+    monkeypatch.setattr(ingest, "LISTENERS", {})
+    monkeypatch.setattr(push, "serve", lambda feed, host=None, port=None: object())
+    monkeypatch.setitem(push._FEED, "feed", None)
+    monkeypatch.setitem(push._FEED, "server", None)
+    return push.install(db_path=str(db[0]))
+
+
+def test_restart_aof_matches_daily_stats(db, feed):
+    _, con = db
+    assert feed.state[CN]["aof"] == daily_aof(con, CN)
+    assert feed.state[CN]["last"] == 1995.25
+    assert feed.state["PH26101701"]["last"] == 1800.0  # dün işlem görmüş
+
+    # Board'un AOF'u / son fiyatı tohumlanmış değerleri ezmemeli
+    feed.handle_board(board_msg(CN, 2005.0, 1990.0, 1990.0))
+    assert feed.state[CN]["aof"] == daily_aof(con, CN)
+    assert feed.state[CN]["last"] == 1995.25
+    assert feed.state[CN]["aof_gap"] == round(daily_aof(con, CN) - 2005.0, 2)
+
+    # Yeni işlem: ingest DB'ye yazar, feed kendi penceresine ekler
+    new = (CN, f"{TODAY}T00:09:15", 2030.0, 4.0)
+    insert(con, *new)
+    feed.handle_trade(trade_msg(*new))
+    assert feed.state[CN]["aof"] == daily_aof(con, CN)
+    assert feed.state[CN]["last"] == 2030.0
+
+
+def test_replayed_trade_is_not_counted_twice(db, feed):
+    _, con = db
+    before = feed.state[CN]["aof"]
+    assert feed.handle_trade(trade_msg(*EXISTING[1])) is None
+    assert feed.state[CN]["aof"] == before == daily_aof(con, CN)
+
+
+def test_board_fallback_for_unseeded_contract(feed):
+    feed.handle_board(board_msg("PH26101805", 2200.0, 2201.5, 2210.0))
+    state = feed.state["PH26101805"]
+    assert (state["ptf"], state["aof"], state["last"]) == (2200.0, 2201.5, 2210.0)
+    assert state["gap"] == 10.0
+
+
+def test_missing_db_falls_back_to_board(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "LISTENERS", {})
+    monkeypatch.setattr(push, "serve", lambda feed, host=None, port=None: object())
+    monkeypatch.setitem(push._FEED, "feed", None)
+    monkeypatch.setitem(push._FEED, "server", None)
+    feed = push.install(db_path=str(tmp_path / "yok.db"))
+    assert feed.state == {}
+    feed.handle_board(board_msg(CN, 2000.0, 2001.5, 2010.0))
+    assert feed.state[CN]["aof"] == 2001.5
@@ -0,0 +1,35 @@
+# Dashboard / API sorgularının indeks kullandığını EXPLAIN QUERY PLAN ile doğrular
+# (bkz. queries.check_plans). Bir indeks ya da sorgu değişip tablo taramasına
+# düşerse bu test kırılır.
+import sqlite3
+
+import pytest
+
+import queries
+from tradehistory import _apply_schema
+
+
+@pytest.fixture
+def con():
+    con = sqlite3.connect(":memory:")
+    _apply_schema(con)
+    yield con
+    con.close()
+
+
+def test_dashboard_queries_use_indexes(con):
+    assert queries.check_plans(con) == {}
+
+
+@pytest.mark.parametrize("name", sorted(queries.DASHBOARD_QUERIES))
+def test_no_trades_scan(con, name):
+    sql, params = queries.DASHBOARD_QUERIES[name]
+    plan = queries.query_plan(con, sql, params)
+    assert not [d for d in plan if d.startswith("SCAN trades")], plan
+
+
+def test_check_plans_reports_scan(con):
+    # Kontrolün kendisi: indekssiz kolona filtre tarama olarak yakalanmalı
+    bad = queries.check_plans(con, {"by_price": ("SELECT * FROM trades WHERE price > ?", (0,))})
+    assert list(bad) == ["by_price"]
+    assert bad["by_price"][0].startswith("SCAN trades")
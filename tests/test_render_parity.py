@@ -0,0 +1,186 @@
+# render.render_contract_table, eski dashboard yolunun (hücre başına Series.apply +
+# DataFrame.to_html) birebir aynısını üretmeli. Eski yol aşağıda referans olarak
+# duruyor; yalnızca datetime.now() yerine `now` parametresi alıyor.
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from render import render_contract_table
+
+
+# ------------ ESKİ YOL (dashboard_fixed.py, render.py öncesi) ------------
+def parse_cn_datetime(cn: str):
+    try:
+        if cn.startswith("PH") and len(cn) >= 10 and cn[2:10].isdigit():
+            yy = int(cn[2:4]); mm = int(cn[4:6]); dd = int(cn[6:8]); hh = int(cn[8:10])
+            return datetime(2000+yy, mm, dd), hh
+    except Exception:
+        pass
+    return None, None
+
+def contract_cutoff(cn: str):
+    d, hh = parse_cn_datetime(cn)
+    if d is None:
+        return None
+    cutoff_hour = max(0, hh - 1)
+    return datetime(d.year, d.month, d.day, cutoff_hour, 0, 0)
+
+def remaining_info(cn: str, now: datetime):
+    co = contract_cutoff(cn)
+    if co is None or now >= co:
+        return ("Kapalı", 100, "bar-black")
+    day0 = datetime(co.year, co.month, co.day, 0, 0, 0)
+    total = (co - day0).total_seconds()
+    elapsed = (now - day0).total_seconds()
+    pct = int(np.clip((elapsed/total)*100, 0, 100)) if total > 0 else 0
+    rem = (co - now).total_seconds()
+    hh = int(rem // 3600); mm = int((rem % 3600)//60)
+    lbl = f"{hh}sa {mm}dk kaldı" if hh > 0 else f"{mm}dk kaldı"
+    bar_cls = "bar-green" if rem > 3600 else "bar-orange"
+    return (lbl, pct, bar_cls)
+
+def render_contract_cell(cn: str, now: datetime) -> str:
+    label, pct, barcls = remaining_info(cn, now)
+    bar = f"<div class='barwrap'><div class='barfill {barcls}' style='width:{pct}%'></div></div>"
+    return f"<div class='cnwrap'><div class='cnhead'><span class='cnname'>{cn}</span><span class='cntimer'>{label}</span></div>{bar}</div>"
+
+def yes_no_html(flag):
+    if flag is None or (isinstance(flag, float) and np.isnan(flag)):
+        return "-"
+    return "<span class='yes'>✅</span>" if flag else "<span class='no'>✖</span>"
+
+def format_aof(val):
+    if pd.isna(val):
+        return "-"
+    return f"{val:.2f}"
+
+def color_gap(val):
+    if pd.isna(val): return "-"
+    return f"<span class='gap-pos'>{val:.0f}</span>" if val >= 0 else f"<span class='gap-neg'>{val:.0f}</span>"
+
+def color_ptf(val):
+    if pd.isna(val):
+        return "-"
+    return f"<span style='background-color: #dc3545; color: white; padding: 2px 6px; border-radius: 3px; font-weight: bold;'>{val:.2f}</span>"
+
+def format_min_price(val):
+    if pd.isna(val) or val == 0:
+        return "-"
+    return f"<span style='background-color: #28a745; color: white; padding: 2px 6px; border-radius: 3px; font-weight: bold;'>{val:.2f}</span>"
+
+def format_max_price(val):
+    if pd.isna(val) or val == 0:
+        return "-"
+    return f"<span style='background-color: #fd7e14; color: white; padding: 2px 6px; border-radius: 3px; font-weight: bold;'>{val:.2f}</span>"
+
+def legacy_table(dash: pd.DataFrame, now: datetime) -> str:
+    dash = dash.copy()
+    dash["cn_html"] = dash["contractName"].astype(str).apply(lambda cn: render_contract_cell(cn, now))
+    dash["gap_html"] = dash["gap"].apply(color_gap)
+    dash["last_gap_html"] = dash["last_gap"].apply(color_gap)
+    dash["aof_gt_icon"] = dash["aof_gt"].apply(yes_no_html)
+    dash["last_gt_icon"] = dash["last_gt"].apply(yes_no_html)
+    dash["ptf_html"] = dash["PTF_show"].apply(color_ptf)
+    dash["aof_html"] = dash["aof_show"].apply(format_aof)
+    if "minPrice" in dash.columns and "maxPrice" in dash.columns:
+        dash["min_price_html"] = dash["minPrice"].apply(format_min_price)
+        dash["max_price_html"] = dash["maxPrice"].apply(format_max_price)
+
+    display_cols = ["cn_html", "ptf_html", "aof_html"]
+    if "gap_html" in dash.columns:
+        display_cols.extend(["aof_gt_icon", "gap_html"])
+    if "last_effective" in dash.columns:
+        display_cols.extend(["last_effective", "last_gap_html", "last_gt_icon"])
+    if "min_price_html" in dash.columns:
+        display_cols.append("min_price_html")
+    if "max_price_html" in dash.columns:
+        display_cols.append("max_price_html")
+    available_cols = [col for col in display_cols if col in dash.columns]
+    df_show = dash[available_cols].copy()
+    col_names = ["Kontrat", "PTF", "AOF"]
+    if "gap_html" in available_cols:
+        col_names.extend(["AOF > PTF", "GAP"])
+    if "last_effective" in available_cols:
+        col_names.extend(["Son Eşleşme", "Son Eşleşme GAP", "Son Eşleşme > PTF"])
+    if "min_price_html" in available_cols:
+        col_names.append("Min Fiyat")
+    if "max_price_html" in available_cols:
+        col_names.append("Max Fiyat")
+    df_show.columns = col_names[:len(df_show.columns)]
+    return df_show.to_html(escape=False, index=False)
+
+
+# ------------ ÖRNEK ÇERÇEVELER ------------
+NOW = datetime(2026, 3, 14, 10, 27, 45)
+
+def make_dash(names, ptf, aof, last, min_p, max_p) -> pd.DataFrame:
+    ptf = np.asarray(ptf, dtype=float)
+    aof = np.asarray(aof, dtype=float)
+    last = np.asarray(last, dtype=float)
+    with np.errstate(invalid="ignore"):
+        aof_gt = [np.nan if (a != a or p != p) else bool(a > p) for a, p in zip(aof, ptf)]
+        last_gt = [np.nan if (l != l or p != p) else bool(l > p) for l, p in zip(last, ptf)]
+    return pd.DataFrame({
+        "contractName": names,
+        "PTF_show": ptf,
+        "aof_show": aof,
+        "gap": aof - ptf,
+        "aof_gt": aof_gt,
+        "last_effective": last,
+        "last_gap": last - ptf,
+        "last_gt": last_gt,
+        "minPrice": np.asarray(min_p, dtype=float),
+        "maxPrice": np.asarray(max_p, dtype=float),
+    }).sort_values("contractName").reset_index(drop=True)
+
+def sample_dash(seed: int = 3) -> pd.DataFrame:
+    """Bugün + yarın tüm saatler: kapalı / son saatteki / açık kontratlar karışık."""
+    rng = np.random.default_rng(seed)
+    names = [f"PH{NOW.date() + timedelta(days=d):%y%m%d}{h:02d}" for d in range(2) for h in range(24)]
+    n = len(names)
+    ptf = np.round(rng.uniform(1500, 3500, n), 2)
+    aof = np.round(ptf + rng.normal(0, 6, n), 2)
+    last = np.round(ptf + rng.normal(0, 8, n), 2)
+    return make_dash(names, ptf, aof, last, np.round(ptf - 20, 2), np.round(ptf + 20, 2))
+
+EDGE_NAMES = ["PH26031400", "PH26031401", "PH26031411", "PH26031412", "PH26031509",
+              "PHXXYYZZ10", "PH2603", "XYZ", "ph26031415"]
+
+def edge_dash(last) -> pd.DataFrame:
+    n = len(EDGE_NAMES)
+    ptf = [2000.0, np.nan, 0.0, 1999.999, 2500.5, 3000.0, np.nan, 1.0, 2100.0][:n]
+    aof = [np.nan, 2000.0, 0.0, 2001.004, 2500.0, 3000.4, np.nan, -1.0, 2099.5][:n]
+    min_p = [0.0, np.nan, 1900.0, 0.0, 2400.0, np.nan, 0.0, 5.0, 2000.0][:n]
+    max_p = [np.nan, 0.0, 2100.0, 2100.0, 0.0, 3100.0, 0.0, 9.0, 2200.0][:n]
+    return make_dash(EDGE_NAMES, ptf, aof, last, min_p, max_p)
+
+EDGE_LAST = {
+    "mixed": [2010.0, np.nan, 0.0, 2000.5, 2500.25, 2999.6, np.nan, -3.0, 2100.125],
+    "int_valued": [2010.0, 2000.0, 0.0, 2001.0, 2500.0, 3000.0, 1.0, -3.0, 2100.0],
+    "all_nan": [np.nan] * len(EDGE_NAMES),
+    "long_decimals": [2000 + 1 / 3, 2000.1, 0.0, 1999.5, 2500.0, 3000.0, np.nan, 2.0, 2100.0],
+}
+
+
+# ------------ TESTLER ------------
+def test_sample_frame_matches_legacy():
+    dash = sample_dash()
+    assert render_contract_table(dash, now=NOW) == legacy_table(dash, NOW)
+
+@pytest.mark.parametrize("case", sorted(EDGE_LAST))
+def test_edge_frames_match_legacy(case):
+    dash = edge_dash(EDGE_LAST[case])
+    assert render_contract_table(dash, now=NOW) == legacy_table(dash, NOW)
+
+def test_without_min_max_columns():
+    dash = sample_dash(seed=9).drop(columns=["minPrice", "maxPrice"])
+    assert render_contract_table(dash, now=NOW) == legacy_table(dash, NOW)
+
+def test_row_cache_does_not_leak_between_times():
+    # Aynı değerler, farklı an: kalan süre etiketi önbellekten eski haliyle gelmemeli
+    dash = sample_dash()
+    later = NOW + timedelta(minutes=7)
+    render_contract_table(dash, now=NOW)
+    assert render_contract_table(dash, now=later) == legacy_table(dash, later)
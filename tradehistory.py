@@ -1,16 +1,18 @@
 # -*- coding: utf-8 -*-
 import os
-import json
-import time
 import csv
 import sqlite3
 import logging
 from datetime import datetime
 from pathlib import Path
 
-import pandas as pd
-import requests
-import websocket
+from alerts import apply_schema as apply_alerts_schema
+from dbwriter import get_writer
+from ingest import register_gap_hook, register_handler, run_forever
+from contracts import apply_schema as apply_contracts_schema, persist_to, register as register_contract
+from rolling import RollingStats
+from tradeparse import Trade
+from utils import setup_logger
 
 # ------------ PATHS / ENV ------------
 ROOT = Path(__file__).resolve().parent
@@ -23,22 +25,16 @@ load_dotenv(ROOT / ".env")
 DB_PATH = os.getenv("DB_PATH", str(DATA_DIR / "gip_live.db"))
 TRADEHISTORY_CSV = os.getenv("TRADEHISTORY_CSV", str(ROOT / "tradehistory_channel.csv"))
 
-EPIAS_USER = os.getenv("EPIAS_USER", "BTHNLGNMOSEDAS")
-EPIAS_PASS = os.getenv("EPIAS_PASS", "Bb250512.")
-
-CAS_URL = "https://cas.epias.com.tr/cas/v1/tickets?format=text"
-GUNICI_API_URL = "https://gunici.epias.com.tr/gunici-service/rest/v1/user/info"
 ALL_CHANNELS = ["TradeHistoryChannel"]
 
 # ------------ LOG ------------
-logging.basicConfig(
-    filename=str(ROOT / "tradehistory_ws.log"),
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-)
+# Yalnızca tek başına çalışırken (bkz. __main__); import eden (ingest, queries, testler)
+# kendi log ayarını yapar.
+TRADEHISTORY_LOG = str(ROOT / "tradehistory_ws.log")
 
 # ------------ STATE ------------
-trade_history = {}  # {contract: [(ts, price, qty), ...]}  (yalnızca son 1 saat)
+# {contract: ContractWindows} -> 5dk / 15dk / 1s / gün kayan pencereleri (bkz. rolling.py)
+trade_history = RollingStats()
 CSV_HEADER = ["contractName", "time", "price", "quantity", "region", "AOF_last_1h"]
 
 # ------------ DB INIT ------------
@@ -57,6 +53,99 @@ CREATE TABLE IF NOT EXISTS trades (
 """
 IDX1 = "CREATE INDEX IF NOT EXISTS idx_trades_cn_time ON trades(contractName, time);"
 IDX2 = "CREATE INDEX IF NOT EXISTS idx_trades_snap ON trades(snapshot_ts);"
+# Dashboard'un zaman aralığı sorguları için kapsayan indeks (bkz. queries.py)
+IDX3 = "CREATE INDEX IF NOT EXISTS idx_trades_time_cover ON trades(time, contractName, price, quantity);"
+
+# Kontrat x gün özet tablosu: dashboard'un günlük AOF / son işlemi tek indeksli
+# okumayla alması için. trades'e her gerçek INSERT'te trigger ile güncellenir; böylece
+# UNIQUE ile yutulan yinelenenler sayılmaz, backfill ile gelen işlemler de dahil olur.
+DDL_CONTRACT_STATS = """
+CREATE TABLE IF NOT EXISTS contract_stats (
+  day TEXT NOT NULL,            -- işlem günü (time'ın ilk 10 karakteri, localtime)
+  contractName TEXT NOT NULL,
+  sum_pq REAL NOT NULL DEFAULT 0,  -- SUM(price*quantity); AOF = sum_pq / sum_q
+  sum_q REAL NOT NULL DEFAULT 0,
+  trade_count INTEGER NOT NULL DEFAULT 0,
+  first_trade TEXT,
+  last_trade TEXT,
+  last_price REAL,
+  last_quantity REAL,
+  PRIMARY KEY(day, contractName)
+);
+"""
+TRG_CONTRACT_STATS = """
+CREATE TRIGGER IF NOT EXISTS trg_trades_contract_stats
+AFTER INSERT ON trades
+WHEN NEW.time IS NOT NULL
+BEGIN
+  INSERT INTO contract_stats
+    (day, contractName, sum_pq, sum_q, trade_count, first_trade, last_trade,
+     last_price, last_quantity)
+  VALUES
+    (substr(NEW.time, 1, 10), NEW.contractName, NEW.price * NEW.quantity, NEW.quantity, 1,
+     NEW.time, NEW.time, NEW.price, NEW.quantity)
+  ON CONFLICT(day, contractName) DO UPDATE SET
+    sum_pq = sum_pq + excluded.sum_pq,
+    sum_q = sum_q + excluded.sum_q,
+    trade_count = trade_count + 1,
+    first_trade = min(first_trade, excluded.first_trade),
+    last_price = CASE WHEN excluded.last_trade >= last_trade THEN excluded.last_price ELSE last_price END,
+    last_quantity = CASE WHEN excluded.last_trade >= last_trade THEN excluded.last_quantity ELSE last_quantity END,
+    last_trade = max(last_trade, excluded.last_trade);
+END;
+"""
+# Tablo ilk kez oluşturulurken mevcut işlemlerden doldurulur
+BACKFILL_CONTRACT_STATS = """
+INSERT INTO contract_stats
+  (day, contractName, sum_pq, sum_q, trade_count, first_trade, last_trade,
+   last_price, last_quantity)
+SELECT day, contractName, sum_pq, sum_q, trade_count, first_trade, last_trade,
+       price, quantity
+FROM (
+  SELECT substr(time, 1, 10) AS day, contractName, price, quantity, time,
+         SUM(price * quantity) OVER w AS sum_pq,
+         SUM(quantity) OVER w AS sum_q,
+         COUNT(*) OVER w AS trade_count,
+         MIN(time) OVER w AS first_trade,
+         MAX(time) OVER w AS last_trade,
+         ROW_NUMBER() OVER (PARTITION BY substr(time, 1, 10), contractName
+                            ORDER BY time DESC, id DESC) AS rn
+  FROM trades
+  WHERE time IS NOT NULL
+  WINDOW w AS (PARTITION BY substr(time, 1, 10), contractName)
+)
+WHERE rn = 1
+"""
+
+def _apply_contract_stats(con):
+    """Özet tablo + trigger; tablo yeni oluşuyorsa aynı transaction'da geçmişten doldur."""
+    con.execute("SAVEPOINT contract_stats_init")
+    try:
+        exists = con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='contract_stats'").fetchone()
+        con.execute(DDL_CONTRACT_STATS)
+        if not exists:
+            con.execute(BACKFILL_CONTRACT_STATS)
+        # Tanım değiştiyse eski DB'de de güncel olsun (eski tablodaki min/max kolonları atıl kalır)
+        con.execute("DROP TRIGGER IF EXISTS trg_trades_contract_stats")
+        con.execute(TRG_CONTRACT_STATS)
+        con.execute("RELEASE contract_stats_init")
+    except Exception:
+        con.execute("ROLLBACK TO contract_stats_init")
+        con.execute("RELEASE contract_stats_init")
+        raise
+
+def _apply_schema(con):
+    con.execute(DDL_TRADES)
+    con.execute(IDX1)
+    con.execute(IDX2)
+    con.execute(IDX3)
+    _apply_contract_stats(con)
+    apply_contracts_schema(con)
+    apply_alerts_schema(con)
+
+# Ingest'in gördüğü yeni kontrat adları aynı DB'nin contracts tablosuna (bkz. contracts.py)
+persist_to(DB_PATH, init=_apply_schema)
 
 def ensure_db(reset: bool = False):
     if reset and os.path.exists(DB_PATH):
@@ -65,9 +154,7 @@ def ensure_db(reset: bool = False):
     try:
         con.execute("PRAGMA journal_mode=WAL;")
         con.execute("PRAGMA synchronous=NORMAL;")
-        con.execute(DDL_TRADES)
-        con.execute(IDX1)
-        con.execute(IDX2)
+        _apply_schema(con)
         con.commit()
     finally:
         con.close()
@@ -78,190 +165,102 @@ def ensure_csv_header(path: str):
         with open(path, "w", newline="", encoding="utf-8") as f:
             csv.writer(f).writerow(CSV_HEADER)
 
-def append_trade_csv(trade: dict, aof_1h: float):
+def append_trade_csv(trade: Trade, aof_1h: float):
     ensure_csv_header(TRADEHISTORY_CSV)
     with open(TRADEHISTORY_CSV, "a", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow([
-            trade.get("contractName"),
-            trade.get("time"),
-            trade.get("price"),
-            trade.get("quantity"),
-            trade.get("region"),
+            trade.contractName,
+            trade.time,
+            trade.price,
+            trade.quantity,
+            trade.region,
             round(aof_1h, 2) if aof_1h is not None else ""
         ])
 
 # ------------ DB WRITE ------------
-def insert_trade_db(trade: dict, aof_1h: float | None):
+INSERT_TRADE_SQL = """
+INSERT OR IGNORE INTO trades
+(contractName, time, price, quantity, region, snapshot_ts, aof_1h)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+def insert_trade_db(trade: Trade, aof_1h: float | None):
     """
     UPSERT (IGNORE) ile yinelenen mesajları yutuyoruz.
     Unique anahtar: (contractName, time, price, quantity)
+    Satır arka plan yazıcısına bırakılır; commit toplu yapılır (bkz. dbwriter).
     """
     snapshot_ts = datetime.now().isoformat(timespec="seconds")
-    with sqlite3.connect(DB_PATH, timeout=30) as con:
-        con.execute(
-            """
-            INSERT OR IGNORE INTO trades
-            (contractName, time, price, quantity, region, snapshot_ts, aof_1h)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                trade.get("contractName"),
-                trade.get("time"),
-                float(trade.get("price")),
-                float(trade.get("quantity")),
-                trade.get("region"),
-                snapshot_ts,
-                float(aof_1h) if aof_1h is not None else None,
-            ),
-        )
-        con.commit()
+    get_writer(DB_PATH, init=_apply_schema).submit(
+        INSERT_TRADE_SQL,
+        (
+            trade.contractName,
+            trade.time,
+            trade.price,
+            trade.quantity,
+            trade.region,
+            snapshot_ts,
+            float(aof_1h) if aof_1h is not None else None,
+        ),
+    )
 
 # ------------ AOF(1h) HESAP ------------
-def update_last_hour_memory(contract: str, ts: pd.Timestamp, price: float, qty: float) -> float:
+def update_last_hour_memory(contract: str, ts: float, price: float, qty: float) -> float:
     """
-    Bellekte sadece son 1 saatin işlemlerini tutar ve AOF(1h) döndürür.
+    İşlemi kontratın kayan pencerelerine ekler ve AOF(1h) döndürür.
+    Toplamlar artımlı tutulur; pencereden çıkanlar soldan atılır (işlem başına O(1)).
+    ts: epoch saniye (bkz. tradeparse.parse_time)
     """
-    arr = trade_history.get(contract, [])
-    arr.append((ts, price, qty))
-    # sadece son 1 saat
-    cutoff = ts - pd.Timedelta(hours=1)
-    arr = [(t, p, q) for (t, p, q) in arr if t >= cutoff]
-    trade_history[contract] = arr
-
-    tot_amt = sum(p * q for (_, p, q) in arr)
-    tot_q = sum(q for (_, _, q) in arr)
-    return (tot_amt / tot_q) if tot_q else price
+    cw = trade_history.add(contract, ts, price, qty)
+    aof = cw.aof("1h")
+    return aof if aof is not None else price
 
 # ------------ WS HANDLERS ------------
-def append_trade(trade: dict):
+def process_trade(trade: Trade) -> float:
     """
-    Bir TradeHistoryChannel mesajını işler:
-    - time parse
+    Ayrıştırılmış bir işlemi işler:
     - 1h AOF hesap
     - CSV yaz
     - DB yaz (UPSERT)
     """
-    contract = trade.get("contractName")
-    tstr = trade.get("time")
-    price = float(trade.get("price"))
-    quantity = float(trade.get("quantity"))
-
-    ts = pd.to_datetime(tstr, errors="coerce")
-    if pd.isna(ts):
-        # Zaman bozuksa ingest zamanını uygula (yine de DB unique çatışmasını azaltır)
-        ts = pd.Timestamp.now()
-        trade["time"] = ts.isoformat(timespec="seconds")
-    else:
-        # normalize ISO string
-        trade["time"] = ts.isoformat(timespec="seconds")
-
-    aof_1h = update_last_hour_memory(contract, ts, price, quantity)
+    register_contract(trade.contractName)
+    aof_1h = update_last_hour_memory(trade.contractName, trade.ts, trade.price, trade.quantity)
 
     # CSV
     append_trade_csv(trade, aof_1h)
     # DB
     insert_trade_db(trade, aof_1h)
+    return aof_1h
 
-def on_message(ws, message):
+def append_trade(trade: dict):
+    """
+    Bir TradeHistoryChannel gövdesini işler (zaman parse -> AOF -> CSV -> DB).
+    Zorunlu alanlar eksik ya da sayısal değilse atlanır.
+    """
+    rec = Trade.from_message(trade)
+    if rec is None:
+        return
+    process_trade(rec)
+
+def handle_trade(data: dict):
+    """TradeHistoryChannel işleyicisi (ingest dispatch'i parse edilmiş mesajı verir)."""
     try:
-        logging.info(f"[MSG] {message[:180]} ...")
-        data = json.loads(message)
         if data.get("eventType") == "TradeHistoryChannel":
-            trade = data.get("body", {})
-            # zorunlu alanlar
-            if not all(k in trade for k in ("contractName", "time", "price", "quantity")):
-                return
-            # tip dönüşümleri
-            try:
-                trade["price"] = float(trade["price"])
-                trade["quantity"] = float(trade["quantity"])
-            except Exception:
-                return
-            append_trade(trade)
+            append_trade(data.get("body") or {})
     except Exception as e:
         logging.error(f"on_message error: {e}")
 
-def on_error(ws, error):
-    logging.error(f"WS error: {error}")
-
-def on_close(ws, close_status_code, close_msg):
-    logging.warning(f"WS closed: {close_status_code} {close_msg}")
-
-def on_open(ws):
-    logging.info("WS opened and listening...")
-
-def ws_thread(ws_url):
-    websocket.enableTrace(False)
-    ws = websocket.WebSocketApp(
-        ws_url,
-        on_open=on_open,
-        on_message=on_message,
-        on_error=on_error,
-        on_close=on_close,
-    )
-    ws.run_forever(ping_interval=30, ping_timeout=10)
-
-# ------------ EPİAŞ AUTH / WS URL ------------
-def get_tgt():
-    data = {"username": EPIAS_USER, "password": EPIAS_PASS}
-    try:
-        resp = requests.post(CAS_URL, data=data, timeout=10)
-        if resp.status_code == 201:
-            logging.info("TGT alındı.")
-            return resp.text
-        logging.error(f"TGT alınamadı: {resp.text}")
-        return None
-    except Exception as e:
-        logging.error(f"TGT hata: {e}")
-        return None
-
-def get_websocket_url_and_jwt(tgt):
-    headers = {"TGT": tgt, "Accept": "application/json"}
-    try:
-        resp = requests.get(GUNICI_API_URL, headers=headers, timeout=10)
-        if resp.status_code == 200:
-            data = resp.json()
-            ws_url_raw = data["body"]["content"]["webSocketDto"]["url"]
-            if not ws_url_raw.startswith("/gunici-service"):
-                ws_url_raw = "/gunici-service" + ws_url_raw
-            return ws_url_raw
-        logging.error(f"JWT/WS URL alınamadı: {resp.text}")
-        return None
-    except Exception as e:
-        logging.error(f"JWT/WS hata: {e}")
-        return None
-
-def get_fresh_ws_url():
-    tgt = get_tgt()
-    if not tgt:
-        return None
-    ws_url_raw = get_websocket_url_and_jwt(tgt)
-    if not ws_url_raw:
-        return None
-    event_params = "".join([f"&event={c}" for c in ALL_CHANNELS])
-    if "?" in ws_url_raw:
-        return f"wss://gunici.epias.com.tr{ws_url_raw}{event_params}"
-    else:
-        return f"wss://gunici.epias.com.tr{ws_url_raw}?{event_params[1:]}"
-
 # ------------ RUN LOOP ------------
 def keep_running():
-    while True:
-        try:
-            ws_url = get_fresh_ws_url()
-            if not ws_url:
-                logging.warning("WS URL alınamadı, 60 sn bekleniyor...")
-                time.sleep(60)
-                continue
-            logging.info(f"WS başlatılıyor: {ws_url}")
-            ws_thread(ws_url)
-        except Exception as e:
-            logging.error(f"Ana döngü hatası: {e}")
-        logging.warning("Bağlantı koptu, 60 sn sonra tekrar denenecek...")
-        time.sleep(60)
+    """Sadece trade kanalını dinler. Tüm kanallar tek bağlantıdan: python ingest.py"""
+    import backfill
+    register_handler("TradeHistoryChannel", handle_trade)
+    register_gap_hook(backfill.schedule)
+    run_forever(ALL_CHANNELS)
 
 if __name__ == "__main__":
+    setup_logger(TRADEHISTORY_LOG)
     # İlk çalıştırmada yeni, temiz DB istersen:
     # ensure_db(reset=True)
     ensure_db(reset=False)
@@ -0,0 +1,60 @@
+# tradeparse.py - pandas'sız işlem ayrıştırma (ingest hot path)
+#
+# WS'ten gelen işlemlerde aynı saniye damgası defalarca tekrarlanır; ISO parse
+# sonucu LRU önbellekte tutulur. İşlemler __slots__'lu küçük kayıtlarla taşınır.
+from datetime import datetime
+from functools import lru_cache
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+@lru_cache(maxsize=65536)
+def parse_time(tstr: str):
+    """
+    ISO-8601 zaman -> (saniye hassasiyetli ISO string, epoch saniye) ya da None.
+    Epoch duvar saatinden hesaplanır (saat dilimi yok sayılır, UTC gibi); rolling.py ile aynı kural.
+    """
+    try:
+        dt = datetime.fromisoformat(tstr.replace("Z", "+00:00") if tstr.endswith("Z") else tstr)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    wall = dt.replace(tzinfo=None) if dt.tzinfo is not None else dt
+    return dt.isoformat(timespec="seconds"), (wall - _EPOCH).total_seconds()
+
+
+def now_time():
+    """Zamanı bozuk işlemler için ingest zamanı: (ISO, epoch)."""
+    now = datetime.now()
+    return now.isoformat(timespec="seconds"), (now - _EPOCH).total_seconds()
+
+
+class Trade:
+    """Tek bir GİP işlemi; dict yerine sabit alanlı hafif kayıt."""
+    __slots__ = ("contractName", "time", "ts", "price", "quantity", "region")
+
+    def __init__(self, contractName: str, time: str, ts: float, price: float, quantity: float,
+                 region=None):
+        self.contractName = contractName
+        self.time = time
+        self.ts = ts
+        self.price = price
+        self.quantity = quantity
+        self.region = region
+
+    @classmethod
+    def from_message(cls, body: dict):
+        """TradeHistoryChannel gövdesinden kayıt; zorunlu alan/tip hatasında None."""
+        try:
+            cn = body["contractName"]
+            tstr = body["time"]
+            price = float(body["price"])
+            qty = float(body["quantity"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        # Zaman bozuksa ingest zamanını uygula (yine de DB unique çatışmasını azaltır)
+        parsed = parse_time(tstr) or now_time()
+        return cls(cn, parsed[0], parsed[1], price, qty, body.get("region"))
+
+    def __repr__(self):
+        return (f"Trade({self.contractName!r}, {self.time!r}, price={self.price}, "
+                f"quantity={self.quantity})")
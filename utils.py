@@ -1,4 +1,5 @@
 import os
+import time
 import sqlite3
 import threading
 import requests
@@ -6,6 +7,8 @@ import logging
 from pathlib import Path
 from dotenv import load_dotenv
 
+from dbwriter import get_writer
+
 # .env yükle
 ENV_CANDIDATES = [os.path.join(os.getcwd(), ".env"),
                   os.path.join(os.path.dirname(__file__), ".env")]
@@ -15,8 +18,10 @@ for _p in ENV_CANDIDATES:
         break
 
 # Kimlik ve yollar
-EKYS_USERNAME = os.getenv("EKYS_USERNAME") or os.getenv("EPYS_USER") or os.getenv("EKYS_USER")
-EKYS_PASSWORD = os.getenv("EKYS_PASSWORD") or os.getenv("EPYS_PASS") or os.getenv("EPYS_PASSWORD")
+EKYS_USERNAME = (os.getenv("EKYS_USERNAME") or os.getenv("EPYS_USER") or os.getenv("EKYS_USER")
+                 or os.getenv("EPIAS_USER"))
+EKYS_PASSWORD = (os.getenv("EKYS_PASSWORD") or os.getenv("EPYS_PASS") or os.getenv("EPYS_PASSWORD")
+                 or os.getenv("EPIAS_PASS"))
 CAS_URL = "https://cas.epias.com.tr/cas/v1/tickets?format=text"
 GUNICI_API_URL = "https://gunici.epias.com.tr/gunici-service/rest/v1/user/info"
 
@@ -24,14 +29,55 @@ DATA_DIR = Path(os.getenv("DATA_DIR", "data"))
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 DB_PATH = os.getenv("DB_PATH", str(DATA_DIR / "epias_gip.db"))
 
+# Board verisi deposu: "csv" (eski boardinfo_history.csv) veya "sqlite" (boardinfo tablosu)
+BOARDINFO_BACKEND = os.getenv("BOARDINFO_BACKEND", "csv").strip().lower()
+BOARDINFO_CSV = os.getenv("BOARDINFO_CSV", str(Path(__file__).resolve().parent / "boardinfo_history.csv"))
+# sqlite modunda CSV'yi eski araçlar için yine de besle (legacy export)
+BOARDINFO_CSV_EXPORT = os.getenv("BOARDINFO_CSV_EXPORT", "0").strip() == "1"
+
 def setup_logger(filename: str, level=logging.INFO):
     logging.basicConfig(filename=filename, level=level,
-                        format="%(asctime)s [%(levelname)s] %(message)s")
+                        format="%(asctime)s [%(levelname)s] %(message)s", force=True)
 
 # --- SQLite (tek bağlantı + kilit güvenli) ---
 _DB_LOCK = threading.Lock()
 _DB_CONN = None
 
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS boardinfo (
+  contractName TEXT NOT NULL,
+  time         TEXT NOT NULL,
+  averagePrice REAL, minPrice REAL, maxPrice REAL,
+  mcp REAL, lastPrice REAL, total REAL, volume REAL,
+  bestBuyPrice REAL, bestSellPrice REAL,
+  PRIMARY KEY(contractName, time)
+);
+CREATE INDEX IF NOT EXISTS ix_boardinfo_time ON boardinfo(time);
+
+CREATE TABLE IF NOT EXISTS trades (
+  contractName TEXT NOT NULL,
+  time         TEXT NOT NULL,
+  tradeId      TEXT,
+  price        REAL,
+  quantity     REAL,
+  region       TEXT,
+  PRIMARY KEY(contractName, time, tradeId)
+);
+CREATE INDEX IF NOT EXISTS ix_trades_cn_time ON trades(contractName, time);
+
+CREATE TABLE IF NOT EXISTS ws_gaps (
+  id         INTEGER PRIMARY KEY AUTOINCREMENT,
+  channels   TEXT,
+  start_ts   TEXT NOT NULL,   -- bağlantının koptuğu an (localtime ISO)
+  end_ts     TEXT NOT NULL,   -- yeniden bağlanılan an
+  backfilled INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_ws_gaps_pending ON ws_gaps(backfilled, start_ts);
+"""
+
+def _init_schema(conn):
+    conn.executescript(_SCHEMA_SQL)
+
 def _open_db():
     global _DB_CONN
     if _DB_CONN is None:
@@ -40,34 +86,21 @@ def _open_db():
         conn.execute("PRAGMA journal_mode=WAL;")
         conn.execute("PRAGMA synchronous=NORMAL;")
         conn.execute("PRAGMA busy_timeout=60000;")
-        conn.executescript("""
-        CREATE TABLE IF NOT EXISTS boardinfo (
-          contractName TEXT NOT NULL,
-          time         TEXT NOT NULL,
-          averagePrice REAL, minPrice REAL, maxPrice REAL,
-          mcp REAL, lastPrice REAL, total REAL, volume REAL,
-          bestBuyPrice REAL, bestSellPrice REAL,
-          PRIMARY KEY(contractName, time)
-        );
-        CREATE INDEX IF NOT EXISTS ix_boardinfo_time ON boardinfo(time);
-
-        CREATE TABLE IF NOT EXISTS trades (
-          contractName TEXT NOT NULL,
-          time         TEXT NOT NULL,
-          tradeId      TEXT,
-          price        REAL,
-          quantity     REAL,
-          region       TEXT,
-          PRIMARY KEY(contractName, time, tradeId)
-        );
-        CREATE INDEX IF NOT EXISTS ix_trades_cn_time ON trades(contractName, time);
-        """)
+        _init_schema(conn)
         _DB_CONN = conn
     return _DB_CONN
 
 def get_db_path() -> str:
     return DB_PATH
 
+def _get_writer():
+    # Yazmalar arka plan yazıcısında toplanıp tek transaction'da commit edilir
+    return get_writer(DB_PATH, init=_init_schema)
+
+def flush_db(timeout: float = None) -> bool:
+    """Kuyrukta bekleyen upsert/insert'lerin diske yazılmasını bekle."""
+    return _get_writer().flush(timeout)
+
 # --- Upsert / Insert ---
 def upsert_boardinfo(contractName: str, time_iso: str,
                      averagePrice=None, minPrice=None, maxPrice=None,
@@ -94,52 +127,41 @@ def upsert_boardinfo(contractName: str, time_iso: str,
     """
     vals = (contractName, time_iso, averagePrice, minPrice, maxPrice, mcp,
             lastPrice, total, volume, bestBuyPrice, bestSellPrice)
-
-    with _DB_LOCK:
-        conn = _open_db()
-        backoff = 0.2
-        for _ in range(10):
-            try:
-                conn.execute(sql, vals)   # BEGIN kullanma
-                conn.commit()
-                break
-            except sqlite3.OperationalError as e:
-                msg = str(e).lower()
-                if "locked" in msg or "transaction" in msg:
-                    try: conn.rollback()
-                    except: pass
-                    import time as _t
-                    _t.sleep(backoff)
-                    backoff = min(backoff * 1.8, 3.0)
-                    continue
-                raise
+    _get_writer().submit(sql, vals)
 
 
 
 def insert_trade(contractName: str, time_iso: str, price, quantity, region=None, tradeId=None):
     sql = "INSERT OR IGNORE INTO trades (contractName,time,tradeId,price,quantity,region) VALUES (?,?,?,?,?,?)"
     vals = (contractName, time_iso, tradeId, price, quantity, region)
+    _get_writer().submit(sql, vals)
+
+# --- WS kesinti pencereleri (sonradan REST ile doldurmak için) ---
+def record_gap(start_iso: str, end_iso: str, channels=None) -> int:
+    with _DB_LOCK:
+        conn = _open_db()
+        cur = conn.execute("INSERT INTO ws_gaps (channels, start_ts, end_ts) VALUES (?,?,?)",
+                           (",".join(channels or []), start_iso, end_iso))
+        return cur.lastrowid
 
+def pending_gaps():
+    """Henüz doldurulmamış kesintiler: [(id, channels, start_ts, end_ts), ...]"""
     with _DB_LOCK:
         conn = _open_db()
-        backoff = 0.2
-        for _ in range(10):
-            try:
-                conn.execute(sql, vals)
-                conn.commit()
-                break
-            except sqlite3.OperationalError as e:
-                msg = str(e).lower()
-                if "locked" in msg or "transaction" in msg:
-                    try: conn.rollback()
-                    except: pass
-                    import time as _t
-                    _t.sleep(backoff)
-                    backoff = min(backoff * 1.8, 3.0)
-                    continue
-                raise
+        return conn.execute(
+            "SELECT id, channels, start_ts, end_ts FROM ws_gaps WHERE backfilled=0 ORDER BY start_ts"
+        ).fetchall()
+
+def mark_gap_backfilled(gap_id: int):
+    with _DB_LOCK:
+        _open_db().execute("UPDATE ws_gaps SET backfilled=1 WHERE id=?", (gap_id,))
 
 # --- CAS / WS URL ---
+# TGT her bağlantıda yeniden alınmaz; süresi dolana ya da user/info reddedene kadar kullanılır
+TGT_TTL_SEC = int(os.getenv("TGT_TTL_SEC", "7200"))
+_TGT_LOCK = threading.Lock()
+_TGT_CACHE = {"value": None, "expires": 0.0}
+
 def get_tgt():
     data = {"username": EKYS_USERNAME, "password": EKYS_PASSWORD}
     try:
@@ -150,24 +172,54 @@ def get_tgt():
         logging.error(f"TGT alınırken hata: {e}")
         return None
 
-def get_websocket_url_and_jwt(tgt):
+def get_cached_tgt(force: bool = False):
+    """Önbellekteki TGT'yi döndür; yoksa, süresi dolduysa ya da force ise CAS'a tekrar giriş yap."""
+    with _TGT_LOCK:
+        now = time.time()
+        if force or not _TGT_CACHE["value"] or now >= _TGT_CACHE["expires"]:
+            tgt = get_tgt()
+            # Süre bitmeden biraz önce yenile
+            _TGT_CACHE["value"] = tgt
+            _TGT_CACHE["expires"] = now + max(60, TGT_TTL_SEC - 300) if tgt else 0.0
+            if tgt:
+                logging.info("CAS girişi yapıldı, yeni TGT alındı.")
+        return _TGT_CACHE["value"]
+
+def invalidate_tgt():
+    with _TGT_LOCK:
+        _TGT_CACHE["value"] = None
+        _TGT_CACHE["expires"] = 0.0
+
+def _ws_url_for(tgt):
+    """(ws_url_raw, reddedildi_mi) döndürür; 401/403 TGT'nin geçersiz olduğunu gösterir."""
     headers = {"TGT": tgt, "Accept": "application/json"}
     try:
         resp = requests.get(GUNICI_API_URL, headers=headers, timeout=20)
+        if resp.status_code in (401, 403):
+            logging.warning(f"user/info TGT'yi reddetti ({resp.status_code})")
+            return None, True
         resp.raise_for_status()
         data = resp.json()
         ws_url_raw = data["body"]["content"]["webSocketDto"]["url"]
         if not ws_url_raw.startswith("/gunici-service"):
             ws_url_raw = "/gunici-service" + ws_url_raw
-        return ws_url_raw
+        return ws_url_raw, False
     except Exception as e:
         logging.error(f"JWT/Websocket URL alınırken hata: {e}")
-        return None
+        return None, False
+
+def get_websocket_url_and_jwt(tgt):
+    return _ws_url_for(tgt)[0]
 
 def get_fresh_ws_url(ALL_CHANNELS):
-    tgt = get_tgt()
+    tgt = get_cached_tgt()
     if not tgt: return None
-    ws_url_raw = get_websocket_url_and_jwt(tgt)
+    ws_url_raw, rejected = _ws_url_for(tgt)
+    if rejected:
+        # Sadece reddedilince CAS'a yeniden giriş
+        tgt = get_cached_tgt(force=True)
+        if not tgt: return None
+        ws_url_raw, rejected = _ws_url_for(tgt)
     if not ws_url_raw: return None
     event_params = "".join([f"&event={c}" for c in ALL_CHANNELS])
     if event_params:
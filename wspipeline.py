@@ -0,0 +1,136 @@
+# wspipeline.py - WebSocket alım -> kuyruk -> işleyici (worker) hattı
+#
+# websocket-client'ın alım thread'i yalnızca ham mesajı kuyruğa bırakır; JSON parse,
+# log, CSV ve DB yazımı worker thread(ler)inde yapılır. Böylece yavaş disk soketi
+# bekletmez ve ping/pong zamanında cevaplanır.
+import os
+import time
+import queue
+import logging
+import threading
+
+WS_QUEUE_MAX = int(os.getenv("WS_QUEUE_MAX", "100000"))
+WS_WORKERS = int(os.getenv("WS_WORKERS", "1"))
+WS_STATS_INTERVAL = float(os.getenv("WS_STATS_INTERVAL", "60"))
+
+_STOP = object()
+
+
+class MessagePipeline:
+    """
+    Ham WS mesajları için sınırlı kuyruk + worker havuzu.
+
+    Not: Kontrat bazlı sıralama (örn. 1 saatlik AOF penceresi) önemliyse
+    workers=1 kalmalı; birden fazla worker mesajları paralel işler.
+    """
+
+    def __init__(self, handler, workers: int = WS_WORKERS, maxsize: int = WS_QUEUE_MAX,
+                 name: str = "ws", stats_interval: float = WS_STATS_INTERVAL):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.name = name
+        self.stats_interval = stats_interval
+        self._q = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "received": 0, "processed": 0, "errors": 0, "dropped": 0, "max_depth": 0,
+            "wait_ms_avg": 0.0, "wait_ms_max": 0.0,
+            "proc_ms_avg": 0.0, "proc_ms_max": 0.0,
+        }
+        self._last_report = time.monotonic()
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"{self.name}-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout: float = 10.0):
+        """Kuyruktakiler işlendikten sonra worker'ları durdur."""
+        threads, self._threads = self._threads, []
+        for _ in threads:
+            self._q.put(_STOP)
+        for t in threads:
+            t.join(timeout)
+
+    # ------------ socket thread ------------
+    def submit(self, raw) -> bool:
+        """Alım thread'inden çağrılır; asla bloklamaz."""
+        if not self._threads:
+            self.start()
+        try:
+            self._q.put_nowait((raw, time.perf_counter()))
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+            logging.warning(f"[{self.name}] kuyruk dolu, mesaj düşürüldü")
+            return False
+        depth = self._q.qsize()
+        with self._stats_lock:
+            self._stats["received"] += 1
+            if depth > self._stats["max_depth"]:
+                self._stats["max_depth"] = depth
+        return True
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = dict(self._stats)
+        out["depth"] = self._q.qsize()
+        return out
+
+    # ------------ workers ------------
+    def _record(self, wait_ms: float, proc_ms: float, ok: bool):
+        with self._stats_lock:
+            s = self._stats
+            s["processed"] += 1
+            if not ok:
+                s["errors"] += 1
+            # Üstel hareketli ortalama (son ~100 mesaj)
+            s["wait_ms_avg"] += (wait_ms - s["wait_ms_avg"]) * 0.01
+            s["proc_ms_avg"] += (proc_ms - s["proc_ms_avg"]) * 0.01
+            s["wait_ms_max"] = max(s["wait_ms_max"], wait_ms)
+            s["proc_ms_max"] = max(s["proc_ms_max"], proc_ms)
+
+    def _maybe_report(self):
+        now = time.monotonic()
+        if now - self._last_report < self.stats_interval:
+            return
+        self._last_report = now
+        st = self.stats()
+        logging.info(
+            f"[{self.name}] depth={st['depth']} max_depth={st['max_depth']} "
+            f"recv={st['received']} done={st['processed']} err={st['errors']} drop={st['dropped']} "
+            f"wait_ms(avg/max)={st['wait_ms_avg']:.2f}/{st['wait_ms_max']:.2f} "
+            f"proc_ms(avg/max)={st['proc_ms_avg']:.2f}/{st['proc_ms_max']:.2f}"
+        )
+        with self._stats_lock:
+            # Maksimumlar rapor aralığı bazında tutulur
+            self._stats["wait_ms_max"] = 0.0
+            self._stats["proc_ms_max"] = 0.0
+            self._stats["max_depth"] = 0
+
+    def _run(self):
+        while True:
+            try:
+                item = self._q.get(timeout=1.0)
+            except queue.Empty:
+                self._maybe_report()
+                continue
+            if item is _STOP:
+                break
+            raw, t_recv = item
+            t0 = time.perf_counter()
+            ok = True
+            try:
+                self.handler(raw)
+            except Exception as e:
+                ok = False
+                logging.error(f"[{self.name}] mesaj işleme hatası: {e}")
+            t1 = time.perf_counter()
+            self._record((t0 - t_recv) * 1000.0, (t1 - t0) * 1000.0, ok)
+            self._maybe_report()